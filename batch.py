@@ -0,0 +1,239 @@
+import os
+import csv
+import json
+import argparse
+import datetime
+import traceback
+
+from excel_processor import find_excel_file, load_case_records
+from main import run_case, run_case_record
+from scheduler import run_parallel
+from image_cache import evict_cache
+from converter import get_converter
+from instrumentation import RunRecorder, aggregate_reports
+from preflight import PreflightError, preflight_case, preflight_cases, print_report
+from config import OUTPUT_DIR
+
+
+def is_case_folder(folder: str) -> bool:
+    """資料夾內含有 Excel 檔案（不含 Office 暫存檔）者即視為一個案件。"""
+    return any(
+        f.lower().endswith((".xlsx", ".xls")) and not f.startswith("~$")
+        for f in os.listdir(folder)
+    )
+
+
+def discover_cases(root_dir: str, supervisor_image: str = None, district_image: str = None) -> list:
+    """
+    掃描 root_dir 下的每個子資料夾，含有 Excel 檔案者即視為一個案件。
+    所有案件共用同一組簽名圖片。
+    """
+    cases = []
+    for entry in sorted(os.scandir(root_dir), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        if is_case_folder(entry.path):
+            cases.append({
+                "case_folder": entry.path,
+                "supervisor_image": supervisor_image,
+                "district_image": district_image,
+            })
+    return cases
+
+
+def load_manifest(manifest_path: str, supervisor_image: str = None, district_image: str = None) -> list:
+    """
+    讀取案件清單（.csv 或 .json），欄位為 case_folder、supervisor_image、district_image。
+    相對路徑以清單檔所在資料夾為基準；未填簽名圖片時使用命令列預設值。
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    if manifest_path.lower().endswith(".json"):
+        with open(manifest_path, encoding="utf-8") as f:
+            rows = json.load(f)
+    else:
+        with open(manifest_path, encoding="utf-8-sig", newline="") as f:
+            rows = list(csv.DictReader(f))
+
+    def resolve(path):
+        if not path:
+            return None
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    cases = []
+    for row in rows:
+        cases.append({
+            "case_folder": resolve(row.get("case_folder")),
+            "supervisor_image": resolve(row.get("supervisor_image")) or supervisor_image,
+            "district_image": resolve(row.get("district_image")) or district_image,
+        })
+    return cases
+
+
+def load_master_cases(excel_file_path: str, cases_root: str = None,
+                      supervisor_image: str = None, district_image: str = None) -> list:
+    """
+    由多案件總表一次讀出所有案件，每列對應一個案件資料夾，之後不再逐案讀取 Excel。
+    """
+    cases = []
+    for record in load_case_records(excel_file_path, cases_root):
+        cases.append({
+            "case_folder": record["case_folder"],
+            "record": record,
+            "supervisor_image": supervisor_image,
+            "district_image": district_image,
+        })
+    return cases
+
+
+def run_batch_case(case: dict, workers: int = None, recorder: RunRecorder = None, preflight: bool = True,
+                   evict: bool = True) -> dict:
+    """
+    以無 GUI 方式執行單一案件，並回傳該案件的執行結果摘要。
+    可傳入 recorder（例如設定了 on_stage 以追蹤進度）；未傳入時自行建立。
+    preflight 為 True 時先執行預檢，有錯誤就不產生任何頁面。
+    evict 為 False 時不整理圖片快取（平行執行多個案件時由主行程於全部完成後整理）。
+    """
+    result = {
+        "case_folder": case["case_folder"],
+        "status": "failed",
+        "output_pdf": None,
+        "error": None,
+        "error_type": None,
+    }
+    print(f"========== 開始處理：{case['case_folder']} ==========")
+    recorder = recorder or RunRecorder()
+    start = datetime.datetime.now()
+    try:
+        # 未指定簽名圖片時依監工名稱與區處取用已登錄的簽名，批次模式不開啟 GUI
+        for key in ("supervisor_image", "district_image"):
+            if case.get(key) and not os.path.isfile(case[key]):
+                raise FileNotFoundError(f"找不到簽名圖片：{case[key]}")
+        if preflight:
+            with recorder.stage("preflight"):
+                check = preflight_case(case["case_folder"], case.get("record"), case.get("supervisor_image"),
+                                       case.get("district_image"))
+            print_report(check)
+            result["preflight"] = check["issues"]
+            if not check["ok"]:
+                raise PreflightError(check)
+        if case.get("record"):
+            final_pdf = run_case_record(case["record"], case["case_folder"], case["supervisor_image"],
+                                        case["district_image"], workers, recorder, interactive=False, evict=evict)
+        else:
+            excel_file_path = find_excel_file(case["case_folder"])
+            final_pdf = run_case(excel_file_path, case["supervisor_image"], case["district_image"],
+                                 workers, recorder, interactive=False, evict=evict)
+        if final_pdf is None:
+            raise ValueError("找不到任何圖片")
+        result["status"] = "success"
+        result["output_pdf"] = final_pdf
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["error_type"] = type(e).__name__
+        recorder.finish("failed", result["error"])
+        traceback.print_exc()
+    result["seconds"] = round((datetime.datetime.now() - start).total_seconds(), 2)
+    recorder.case_id = recorder.case_id or os.path.basename(os.path.normpath(case["case_folder"]))
+    recorder.write_jsonl()
+    result["report"] = recorder.to_dict()
+    return result
+
+
+def write_summary(results: list, summary_path: str) -> None:
+    """將每個案件的成功／失敗結果寫入 JSON 摘要檔，並列印統計。"""
+    summary_dir = os.path.dirname(summary_path)
+    if summary_dir and not os.path.exists(summary_dir):
+        os.makedirs(summary_dir)
+    succeeded = [r for r in results if r["status"] == "success"]
+    failed = [r for r in results if r["status"] != "success"]
+    summary = {
+        "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "total": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(failed),
+        "aggregate": aggregate_reports([r["report"] for r in results if r.get("report")]),
+        "cases": results,
+    }
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print("========== 批次執行摘要 ==========")
+    for r in results:
+        mark = "成功" if r["status"] == "success" else "失敗"
+        detail = r["output_pdf"] if r["status"] == "success" else r["error"]
+        print(f"[{mark}] {r['case_folder']} -> {detail}")
+    print(f"共 {len(results)} 件，成功 {len(succeeded)} 件，失敗 {len(failed)} 件。")
+    print(f"摘要已寫入：{summary_path}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="批次產生自主查核表（無 GUI）")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--root", help="案件根目錄，每個含 Excel 的子資料夾視為一個案件")
+    source.add_argument("--manifest", help="案件清單 .csv 或 .json（case_folder, supervisor_image, district_image）")
+    source.add_argument("--master-excel", help="多案件總表，每列一個案號，對應 <cases-root>/<案號> 資料夾")
+    parser.add_argument("--cases-root", help="總表模式下案件資料夾的根目錄（預設為總表所在資料夾）")
+    parser.add_argument("--supervisor-image", help="預設監工簽名圖片（未指定時依監工名稱取用已登錄的簽名）")
+    parser.add_argument("--district-image", help="預設營業處簽名圖片（未指定時依區處取用已登錄的簽名）")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="同時處理的案件數（0 表示使用全部 CPU 核心，預設使用 config.MAX_WORKERS）")
+    parser.add_argument("--summary", help="摘要輸出路徑（預設為 output/batch_summary_<時間>.json）")
+    preflight = parser.add_mutually_exclusive_group()
+    preflight.add_argument("--preflight-only", action="store_true", help="只執行預檢並列出所有問題，不產生報告")
+    preflight.add_argument("--skip-preflight", action="store_true", help="略過預檢")
+    return parser.parse_args(argv)
+
+
+def _preflight_failure(case: dict, check: dict) -> dict:
+    """預檢未通過的案件不執行，直接以失敗結果列入摘要。"""
+    return {
+        "case_folder": case["case_folder"],
+        "status": "failed",
+        "output_pdf": None,
+        "error": f"PreflightError: {PreflightError(check)}",
+        "error_type": "PreflightError",
+        "preflight": check["issues"],
+        "seconds": 0,
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.root:
+        cases = discover_cases(args.root, args.supervisor_image, args.district_image)
+    elif args.master_excel:
+        cases = load_master_cases(args.master_excel, args.cases_root, args.supervisor_image, args.district_image)
+    else:
+        cases = load_manifest(args.manifest, args.supervisor_image, args.district_image)
+    print(f"共找到 {len(cases)} 個案件。")
+
+    # 先平行預檢所有案件並一次列出問題，未通過的案件不進入產生流程
+    checks = [None] * len(cases)
+    if not args.skip_preflight:
+        checks = preflight_cases(cases, args.workers)
+        for check in checks:
+            print_report(check)
+        failed = sum(1 for check in checks if not check["ok"])
+        print(f"預檢：{len(cases) - failed} 個案件通過，{failed} 個未通過。")
+        if args.preflight_only:
+            return 1 if failed else 0
+    runnable = [case for case, check in zip(cases, checks) if check is None or check["ok"]]
+
+    # 先啟動轉檔後端，讓所有工作行程共用同一個常駐轉檔行程
+    get_converter()
+    # 案件層級平行時，各案件內部的平面圖組與照片頁改為依序處理
+    # 圖片快取由各工作行程共用，全部案件完成後才在主行程整理一次，避免刪除其他案件正在使用的檔案
+    run_results = iter(run_parallel(run_batch_case, [(case, args.workers, None, False, False) for case in runnable],
+                                    args.workers))
+    results = [next(run_results) if check is None or check["ok"] else _preflight_failure(case, check)
+               for case, check in zip(cases, checks)]
+    evict_cache()
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    summary_path = args.summary or os.path.join(OUTPUT_DIR, f"batch_summary_{timestamp}.json")
+    write_summary(results, summary_path)
+    return 0 if all(r["status"] == "success" for r in results) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,289 @@
+import io
+import os
+import json
+import time
+import shutil
+import argparse
+import contextlib
+import datetime
+import tempfile
+import tracemalloc
+
+import pandas as pd
+from PIL import Image
+
+from excel_processor import COLUMN_MAPPING, process_excel_pandas
+from doc_generator import render_records_docx
+from doc_image_processor import (get_image_files, insert_images_in_template, plan_9x3_pages,
+                                 fill_9x3_page, convert_words_to_pdfs)
+from photo_page_renderer import render_planned_pages
+from pdf_assembler import PdfAssembler
+from utils import cleanup_temp_files, process_folder, process_sorted_folder
+from signature_stamps import stamp_cover
+from config import TEMPLATE_TABLE
+
+PHOTO_FOLDERS = ["平面圖", "埋深照", "銑鋪照", "測量照", "讀數照"]
+
+
+def _synthetic_image(path: str, size: tuple, seed: int) -> None:
+    """產生帶雜訊與漸層的 JPEG，壓縮後的大小接近實際相機照片。"""
+    w, h = size
+    noise = Image.effect_noise((w, h), 40 + seed % 20)
+    gradient = Image.linear_gradient("L").resize((w, h))
+    img = Image.merge("RGB", (noise, gradient, noise.transpose(Image.FLIP_LEFT_RIGHT)))
+    img.save(path, format="JPEG", quality=90)
+
+
+def _synthetic_signature(path: str, size: tuple) -> None:
+    img = Image.new("RGBA", size, (255, 255, 255, 0))
+    img.paste((0, 0, 160, 255), (size[0] // 4, size[1] // 3, size[0] * 3 // 4, size[1] * 2 // 3))
+    img.save(path, format="PNG")
+
+
+def generate_case_fixture(root: str, images_per_folder: int, image_size: tuple, case_number: str = "BENCH-0001") -> dict:
+    """
+    於 root 建立一個合成案件資料夾：含 column_mapping 全部欄位的 Excel，
+    以及平面圖／埋深照／銑鋪照／測量照／讀數照各 images_per_folder 張圖片。
+    回傳案件資料夾、Excel 與簽名圖片路徑。
+    """
+    case_folder = os.path.join(root, case_number)
+    os.makedirs(case_folder, exist_ok=True)
+
+    row = {column: f"{column}測試" for column in COLUMN_MAPPING}
+    row.update({
+        "案號": case_number,
+        "施測日期": datetime.date(2024, 1, 15),
+        "施測方式": 1234,
+        "施測儀器": 12,
+        "管線點位": 120,
+        "孔蓋點位": 8,
+        "設施物點位": 3,
+    })
+    excel_path = os.path.join(case_folder, f"{case_number}.xlsx")
+    pd.DataFrame([row]).to_excel(excel_path, index=False)
+
+    seed = 0
+    for folder in PHOTO_FOLDERS:
+        folder_path = os.path.join(case_folder, folder)
+        os.makedirs(folder_path, exist_ok=True)
+        for i in range(1, images_per_folder + 1):
+            name = f"app_{i}.jpg" if folder == "讀數照" else f"{i:03d}.jpg"
+            _synthetic_image(os.path.join(folder_path, name), image_size, seed)
+            seed += 1
+
+    supervisor_image = os.path.join(root, "監工.png")
+    district_image = os.path.join(root, "營業處.png")
+    _synthetic_signature(supervisor_image, (177, 52))
+    _synthetic_signature(district_image, (277, 181))
+    return {
+        "case_folder": case_folder,
+        "excel_path": excel_path,
+        "supervisor_image": supervisor_image,
+        "district_image": district_image,
+    }
+
+
+class StageTimer:
+    """
+    依序量測各階段的牆鐘時間與 CPU 時間。trace_memory 為 True 時另以 tracemalloc 量測
+    Python 記憶體峰值；追蹤會讓配置頻繁的階段慢上數倍，因此只用於單獨的記憶體量測，
+    計時用的執行不開啟追蹤，改記錄各階段結束時的行程 RSS 峰值。
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    def run(self, name: str, func, *args, items: int = 0):
+        if self.trace_memory:
+            tracemalloc.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            return func(*args)
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            stage = {
+                "stage": name,
+                "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(cpu, 4),
+                "items": items,
+                "items_per_second": round(items / wall, 2) if items and wall > 0 else None,
+            }
+            if self.trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                stage["peak_python_mb"] = round(peak / 1024 ** 2, 2)
+                print(f"[{name}] Python 記憶體峰值 {peak / 1024 ** 2:.1f} MB")
+            else:
+                stage["peak_rss_mb"] = _peak_rss_mb()
+                print(f"[{name}] {wall:.3f}s（CPU {cpu:.3f}s）")
+            self.stages.append(stage)
+
+
+def _peak_rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 為單位，macOS 以 bytes 為單位
+    return round(rss / 1024 / (1024 if os.uname().sysname == "Darwin" else 1), 1)
+
+
+@contextlib.contextmanager
+def isolated_caches(cache_root: str):
+    """
+    將圖片快取與建置快取暫時指向 cache_root（每次執行使用新的空資料夾），
+    量測結果不受正式快取影響，也不會寫入正式快取。
+    """
+    import image_cache
+    import build_manifest
+    saved = image_cache.IMAGE_CACHE_DIR, build_manifest.BUILD_CACHE_DIR
+    image_cache.IMAGE_CACHE_DIR = os.path.join(cache_root, "images")
+    build_manifest.BUILD_CACHE_DIR = os.path.join(cache_root, "builds")
+    image_cache._hash_memo.clear()
+    try:
+        yield
+    finally:
+        image_cache.IMAGE_CACHE_DIR, build_manifest.BUILD_CACHE_DIR = saved
+
+
+def run_benchmark(fixture: dict, work_dir: str, renderer: str = "pdf", convert: bool = True,
+                  trace_memory: bool = False) -> dict:
+    """
+    依管線各階段分別計時一個合成案件，回傳報告字典。
+    trace_memory 為 True 時改為量測各階段的 Python 記憶體峰值（此時的時間不具參考價值）。
+    """
+    timer = StageTimer(trace_memory)
+    out_dir = os.path.join(work_dir, "output")
+    os.makedirs(out_dir, exist_ok=True)
+    case_folder = fixture["case_folder"]
+
+    df = timer.run("excel_load", process_excel_pandas, fixture["excel_path"], items=1)
+    record = df.to_dict(orient="records")[0]
+
+    cover_docx = timer.run("cover_render", render_records_docx, record, out_dir, items=1)
+
+    plan_images = get_image_files(os.path.join(case_folder, "平面圖"))
+    plan_groups = [plan_images[i:i + 2] for i in range(0, len(plan_images), 2)]
+    plan_docx = [os.path.join(out_dir, f"temp_modified_template_group_{i}.docx") for i in range(1, len(plan_groups) + 1)]
+
+    def build_plans():
+        for group, word_path in zip(plan_groups, plan_docx):
+            insert_images_in_template(TEMPLATE_TABLE, group, word_path)
+    timer.run("plan_docx_build", build_plans, items=len(plan_groups))
+
+    images = []
+    images.extend(process_folder(case_folder, "埋深照", "埋深照"))
+    images.extend(process_folder(case_folder, "銑鋪照", "銑鋪照"))
+    images.extend(process_sorted_folder(case_folder, "測量照", "測量照"))
+    images.extend(process_sorted_folder(case_folder, "讀數照", "讀數照"))
+    pages = plan_9x3_pages(images)
+
+    photo_docx = []
+    photo_buffer = io.BytesIO()
+    if renderer == "pdf":
+        timer.run("photo_9x3_fill", render_planned_pages, pages, photo_buffer, items=len(pages))
+    else:
+        def fill_pages():
+            for page_idx, (group, new_categories) in enumerate(pages, start=1):
+                word_file = os.path.join(out_dir, f"temp_photo_{page_idx}.docx")
+                photo_docx.append(fill_9x3_page(TEMPLATE_TABLE, group, new_categories, word_file))
+        timer.run("photo_9x3_fill", fill_pages, items=len(pages))
+
+    cover_pdf = plan_pdfs = photo_pdfs = None
+    if convert:
+        all_docx = [cover_docx] + plan_docx + photo_docx
+        pdfs = timer.run("conversion", convert_words_to_pdfs, all_docx, items=len(all_docx))
+        cover_pdf = pdfs[0]
+        plan_pdfs = pdfs[1:1 + len(plan_docx)]
+        photo_pdfs = pdfs[1 + len(plan_docx):]
+
+    final_pdf = os.path.join(out_dir, "benchmark_自主查核表.pdf")
+
+    def merge():
+        assembler = PdfAssembler(["cover", "plans", "photos"])
+        if cover_pdf:
+            assembler.add(stamp_cover(cover_pdf, fixture["supervisor_image"], fixture["district_image"], "benchmark"),
+                          "cover")
+        for pdf in plan_pdfs or []:
+            assembler.add(pdf, "plans")
+        if renderer == "pdf":
+            assembler.add(photo_buffer, "photos")
+        for pdf in photo_pdfs or []:
+            assembler.add(pdf, "photos")
+        return assembler.write(final_pdf)
+    page_count = timer.run("merge", merge)
+
+    def cleanup():
+        cleanup_temp_files(out_dir, "temp*")
+    timer.run("cleanup", cleanup)
+
+    total_wall = sum(s["wall_seconds"] for s in timer.stages)
+    return {
+        "renderer": renderer,
+        "converted": convert,
+        "images": len(images) + len(plan_images),
+        "pages": page_count,
+        "total_wall_seconds": round(total_wall, 4),
+        "pages_per_second": round(page_count / total_wall, 2) if total_wall > 0 else None,
+        "final_pdf_mb": round(os.path.getsize(final_pdf) / 1024 ** 2, 2),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": timer.stages,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="以合成案件量測自主查核表產生流程各階段的效能")
+    parser.add_argument("--images", type=int, default=8, help="每個照片資料夾的圖片數（預設 8）")
+    parser.add_argument("--image-size", default="4000x3000", help="合成圖片尺寸，寬x高（預設 4000x3000）")
+    parser.add_argument("--renderer", choices=["pdf", "docx"], default="pdf", help="照片頁產生方式")
+    parser.add_argument("--skip-convert", action="store_true", help="略過 Word 轉 PDF（無轉檔後端時使用）")
+    parser.add_argument("--repeat", type=int, default=1, help="重複次數（每次使用全新的快取）")
+    parser.add_argument("--skip-memory", action="store_true",
+                        help="略過另外執行一次、以 tracemalloc 量測各階段記憶體峰值")
+    parser.add_argument("--output", help="將報告寫入 JSON 檔")
+    parser.add_argument("--keep", action="store_true", help="保留合成案件與輸出檔案")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    width, height = (int(v) for v in args.image_size.lower().split("x"))
+    work_dir = tempfile.mkdtemp(prefix="report_bench_")
+    try:
+        print(f"產生合成案件：每資料夾 {args.images} 張，{width}x{height}")
+        fixture = generate_case_fixture(os.path.join(work_dir, "cases"), args.images, (width, height))
+        runs = []
+        for i in range(1, args.repeat + 1):
+            print(f"========== 第 {i}/{args.repeat} 次 ==========")
+            with isolated_caches(tempfile.mkdtemp(prefix="cache_", dir=work_dir)):
+                runs.append(run_benchmark(fixture, work_dir, args.renderer, not args.skip_convert))
+        report = {
+            "generated_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "images_per_folder": args.images,
+            "image_size": [width, height],
+            "runs": runs,
+        }
+        if not args.skip_memory:
+            print("========== 記憶體量測 ==========")
+            with isolated_caches(tempfile.mkdtemp(prefix="cache_", dir=work_dir)):
+                memory_run = run_benchmark(fixture, work_dir, args.renderer, not args.skip_convert, trace_memory=True)
+            report["memory"] = {s["stage"]: s["peak_python_mb"] for s in memory_run["stages"]}
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"報告已寫入：{args.output}")
+    finally:
+        if args.keep:
+            print(f"保留工作資料夾：{work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,94 @@
+import os
+import json
+import shutil
+import hashlib
+from config import BUILD_CACHE_DIR
+from image_cache import file_digest, is_blank_image
+
+
+class BuildManifest:
+    """
+    記錄單一案件每個產出單元（首頁、各平面圖組、各照片頁）的輸入雜湊與對應的 PDF，
+    重新執行時只重建輸入有變動的單元，其餘直接沿用先前的 PDF。
+    on_store(單元名稱) 於每個單元的 PDF 存入後呼叫（例如工作佇列記錄已完成的頁面）。
+    """
+
+    def __init__(self, case_number: str, cache_dir: str = None, on_store=None):
+        self.on_store = on_store
+        self.folder = os.path.join(cache_dir or BUILD_CACHE_DIR, str(case_number))
+        self.path = os.path.join(self.folder, "manifest.json")
+        os.makedirs(self.folder, exist_ok=True)
+        self.units = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.units = json.load(f).get("units", {})
+            except (OSError, ValueError):
+                print(f"建置清單損毀，將全部重建：{self.path}")
+        self._touched = set()
+
+    @staticmethod
+    def input_key(values=None, files=()) -> str:
+        """
+        計算單元輸入的雜湊：values 為可 JSON 序列化的資料（如 Excel 列），
+        files 為相關檔案（模板、圖片），只以內容雜湊計入；檔名若會影響輸出，應放在 values 中。
+        """
+        h = hashlib.sha256()
+        h.update(json.dumps(values, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+        for path in files:
+            if is_blank_image(path):
+                h.update(b"<blank>")
+            else:
+                h.update(file_digest(path).encode() if path and os.path.exists(path) else b"<missing>")
+        return h.hexdigest()
+
+    def artifact_path(self, unit: str) -> str:
+        return os.path.join(self.folder, f"{unit}.pdf")
+
+    def lookup(self, unit: str, key: str) -> str:
+        """輸入未變動且 PDF 仍存在時回傳其路徑，否則回傳 None。"""
+        self._touched.add(unit)
+        entry = self.units.get(unit)
+        path = self.artifact_path(unit)
+        if entry and entry.get("key") == key and os.path.exists(path):
+            return path
+        return None
+
+    def store(self, unit: str, key: str, source) -> str:
+        """
+        儲存單元的 PDF 並更新清單，回傳儲存後的路徑。
+
+        :param source: PDF 路徑（會被複製）、bytes 或檔案物件
+        """
+        self._touched.add(unit)
+        path = self.artifact_path(unit)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        if isinstance(source, str):
+            shutil.copyfile(source, tmp_path)
+        else:
+            data = source if isinstance(source, (bytes, bytearray)) else source.getvalue()
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+        os.replace(tmp_path, path)
+        self.units[unit] = {"key": key}
+        # 每完成一個單元就寫回清單，中途當掉時重新執行可從已完成的單元接續
+        self._write()
+        if self.on_store:
+            self.on_store(unit)
+        return path
+
+    def save(self) -> None:
+        """寫回清單，並移除本次執行未使用到的單元（例如照片減少後多出的頁）。"""
+        for unit in set(self.units) - self._touched:
+            del self.units[unit]
+            try:
+                os.remove(self.artifact_path(unit))
+            except OSError:
+                pass
+        self._write()
+
+    def _write(self) -> None:
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"units": self.units}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
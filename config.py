@@ -11,3 +11,93 @@ OUTPUT_DIR = "output"
 # 圖片相關
 IMAGE_DIR = "images"
 VALID_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff"]
+# 同一行程內保留圖片清單（含 stat 結果）的案件數；常駐服務超過時淘汰最久未使用的案件
+IMAGE_INVENTORY_MAX_CASES = 32
+
+# 平行處理
+# 同時執行的工作行程數；1 表示依序執行，0 表示使用全部 CPU 核心
+MAX_WORKERS = 1
+
+# Word 轉 PDF 後端："auto"（Windows/macOS 使用 Word，其他平台使用 LibreOffice）、"docx2pdf"、"libreoffice"
+CONVERTER_BACKEND = "auto"
+# LibreOffice 後端的 unoserver 位址；UNOSERVER_PORT 為 None 時自行啟動一個常駐 unoserver
+UNOSERVER_EXECUTABLE = "unoserver"
+UNOSERVER_HOST = "127.0.0.1"
+UNOSERVER_PORT = None
+UNOSERVER_START_TIMEOUT = 60
+
+# 照片頁產生方式："pdf" 直接以 ReportLab 繪製 PDF；"docx" 經由 Word 模板再轉檔
+PHOTO_PAGE_RENDERER = "pdf"
+# 標楷體字型檔；找不到時改用 ReportLab 內建的中文字型
+KAIU_FONT_PATH = r"C:\Windows\Fonts\kaiu.ttf"
+# 自動繪製平面圖時找不到標楷體的替代中文字型（依序嘗試第一個存在的檔案）
+CJK_FALLBACK_FONT_PATHS = [
+    r"C:\Windows\Fonts\mingliu.ttc",
+    r"C:\Windows\Fonts\msjh.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+]
+
+# 圖片前置處理快取（依內容雜湊縮圖與重新壓縮）
+IMAGE_CACHE_DIR = os.path.join("cache", "images")
+IMAGE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# 淘汰快取時保留最近這段時間內使用過的檔案（可能剛交給其他行程嵌入）
+IMAGE_CACHE_EVICT_GRACE_SECONDS = 10 * 60
+IMAGE_DPI = 200
+IMAGE_JPEG_QUALITY = 85
+
+# 增量重建：各案件已產生頁面的 PDF 與建置清單（manifest）存放位置
+BUILD_CACHE_DIR = os.path.join("cache", "builds")
+
+# 執行報告（各階段耗時與資源使用）輸出位置
+REPORT_DIR = "reports"
+# 指定階段名稱時，以 cProfile 分析該階段並輸出 .prof 檔（亦可用環境變數 REPORT_PROFILE_STAGE）
+PROFILE_STAGE = None
+
+# 多案件總表中指定案件圖片資料夾的欄位；沒有此欄時以案號作為資料夾名稱
+CASE_FOLDER_COLUMN = "資料夾"
+
+# GML 與 Excel 測量點比對的容許誤差（公尺）
+GML_MATCH_TOLERANCE = 0.05
+GML_MATCH_TOLERANCE_Z = 0.05
+
+# 案件資料夾內有 GML 時，是否將比對差異表附於最終 PDF 之後（CSV 一律輸出）
+ATTACH_GML_DISCREPANCY = True
+
+# 平面圖資料夾沒有圖片時，由測量點座標自動繪製竣工平面圖；每張分圖最多標註的點數
+AUTO_PLAN_IMAGES = True
+PLAN_POINTS_PER_SHEET = 60
+
+# 非同步管線：首頁、平面圖、照片頁的建置與轉檔重疊進行；各階段之間佇列的長度上限
+ASYNC_PIPELINE = True
+PIPELINE_QUEUE_SIZE = 4
+
+# 每次執行的暫存工作區（中間的 docx、轉檔 PDF、自動繪製的平面圖），結束後整個刪除
+# None 時優先使用記憶體檔案系統 /dev/shm，沒有時使用系統暫存資料夾；也可指定 RAM disk 等路徑
+SCRATCH_DIR = None
+# 建立工作區時，順便刪除超過此時數仍未清除的工作區（前次執行中斷時留下）
+SCRATCH_STALE_HOURS = 24
+
+# 簽名章登錄資料夾：<SIGNATURE_DIR>/監工/<監工名稱>.png、<SIGNATURE_DIR>/營業處/<區處>.png
+# 依 Excel 的「監工名稱」與「區處」欄位自動取用，找不到時才以 GUI 選取並登錄
+SIGNATURE_DIR = "signatures"
+
+# 常駐模式（daemon.py）：預先載入套件、模板與轉檔後端，經由本機 socket 接收案件
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+
+# 監看模式（watcher.py）：案件資料夾內容連續 WATCH_SETTLE_SECONDS 秒沒有變動才視為上傳完成
+WATCH_SETTLE_SECONDS = 30
+# 輪詢間隔；沒有安裝 watchdog（inotify 等檔案系統事件）時改為定期掃描整個根目錄
+WATCH_POLL_SECONDS = 5
+# 記錄各案件已產生報告時的資料夾狀態，重新啟動後不會重複產生
+WATCH_STATE_PATH = os.path.join("cache", "watch_state.json")
+
+# 工作佇列（job_queue.py）：SQLite 資料庫位置、失敗重試次數與間隔（每次加倍）
+JOB_DB_PATH = os.path.join("cache", "jobs.sqlite3")
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_SECONDS = 30
+# 執行中的工作超過此秒數沒有進度時，視為工作行程已當掉，交由其他工作行程接手
+JOB_LEASE_SECONDS = 30 * 60
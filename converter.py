@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import atexit
+import shutil
+import socket
+import tempfile
+import subprocess
+from abc import ABC, abstractmethod
+from typing import List, Tuple
+from config import (CONVERTER_BACKEND, UNOSERVER_EXECUTABLE, UNOSERVER_HOST,
+                    UNOSERVER_PORT, UNOSERVER_START_TIMEOUT)
+
+# 子行程沿用父行程已啟動的 unoserver 時所使用的環境變數
+_PORT_ENV = "REPORT_UNOSERVER_PORT"
+
+_default_converter = None
+
+
+class DocxConverter(ABC):
+    """
+    Word 轉 PDF 後端的共同介面。
+    後端於 start() 啟動一次，整個執行期間重複使用，於 close() 時釋放。
+    """
+
+    def start(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def convert(self, docx_path: str, pdf_path: str) -> str:
+        """將單一 Word 文件轉為 pdf_path，回傳 PDF 路徑。"""
+
+    def convert_many(self, pairs: List[Tuple[str, str]]) -> List[str]:
+        """轉換 [(docx 路徑, pdf 路徑)]，回傳依輸入順序排列的 PDF 路徑。"""
+        return [self.convert(docx_path, pdf_path) for docx_path, pdf_path in pairs]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Docx2PdfConverter(DocxConverter):
+    """透過 docx2pdf 呼叫 Microsoft Word（僅限 Windows/macOS）。"""
+
+    def convert(self, docx_path: str, pdf_path: str) -> str:
+        from docx2pdf import convert
+        try:
+            convert(docx_path, pdf_path)
+            print(f"已生成 PDF 文件：{pdf_path}")
+        except AttributeError as e:
+            if "Word.Application.Quit" in str(e):
+                print(f"遇到 Word.Application.Quit 錯誤於 {docx_path}，忽略並繼續。")
+            else:
+                raise e
+        return pdf_path
+
+    def convert_many(self, pairs: List[Tuple[str, str]]) -> List[str]:
+        """
+        將所有檔案複製到暫存資料夾後以資料夾模式轉換，
+        整批只開啟一次 Word。
+        """
+        if len(pairs) <= 1:
+            return super().convert_many(pairs)
+        from docx2pdf import convert
+        with tempfile.TemporaryDirectory(prefix="docx2pdf_") as tmp_dir:
+            in_dir = os.path.join(tmp_dir, "in")
+            out_dir = os.path.join(tmp_dir, "out")
+            os.makedirs(in_dir)
+            os.makedirs(out_dir)
+            for idx, (docx_path, _) in enumerate(pairs):
+                shutil.copyfile(docx_path, os.path.join(in_dir, f"{idx:05d}.docx"))
+            try:
+                convert(in_dir, out_dir)
+            except AttributeError as e:
+                if "Word.Application.Quit" in str(e):
+                    print("遇到 Word.Application.Quit 錯誤，忽略並繼續。")
+                else:
+                    raise e
+            for idx, (_, pdf_path) in enumerate(pairs):
+                shutil.move(os.path.join(out_dir, f"{idx:05d}.pdf"), pdf_path)
+                print(f"已生成 PDF 文件：{pdf_path}")
+        return [pdf_path for _, pdf_path in pairs]
+
+
+class LibreOfficeConverter(DocxConverter):
+    """
+    透過常駐的 unoserver（無介面 LibreOffice）轉檔。
+    未指定 port 時於 start() 自行啟動一個 unoserver，之後每份文件只是一次本機 RPC，
+    不再重新啟動 Office。
+    """
+
+    def __init__(self, host: str = UNOSERVER_HOST, port: int = None):
+        self.host = host
+        self.port = port
+        self._process = None
+        self._client = None
+
+    def start(self) -> None:
+        if self._client is not None:
+            return
+        from unoserver.client import UnoClient
+
+        if self.port is None:
+            self.port = _find_free_port()
+            uno_port = _find_free_port()
+            self._process = subprocess.Popen(
+                [UNOSERVER_EXECUTABLE, "--interface", self.host,
+                 "--port", str(self.port), "--uno-port", str(uno_port)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            self._wait_until_ready()
+            # 讓之後由此行程建立的工作行程共用同一個 unoserver
+            os.environ[_PORT_ENV] = str(self.port)
+            print(f"已啟動 unoserver：{self.host}:{self.port}")
+        self._client = UnoClient(server=self.host, port=str(self.port))
+
+    def _wait_until_ready(self) -> None:
+        deadline = time.monotonic() + UNOSERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"unoserver 啟動失敗，結束代碼 {self._process.returncode}")
+            try:
+                with socket.create_connection((self.host, self.port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        self.close()
+        raise TimeoutError(f"unoserver 未在 {UNOSERVER_START_TIMEOUT} 秒內就緒")
+
+    def close(self) -> None:
+        self._client = None
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+            if os.environ.get(_PORT_ENV) == str(self.port):
+                del os.environ[_PORT_ENV]
+            self._process = None
+            self.port = None
+
+    def convert(self, docx_path: str, pdf_path: str) -> str:
+        self.start()
+        self._client.convert(
+            inpath=os.path.abspath(docx_path),
+            outpath=os.path.abspath(pdf_path),
+            convert_to="pdf",
+        )
+        print(f"已生成 PDF 文件：{pdf_path}")
+        return pdf_path
+
+
+def _find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((UNOSERVER_HOST, 0))
+        return s.getsockname()[1]
+
+
+def create_converter(backend: str = None) -> DocxConverter:
+    """依名稱建立轉檔後端（尚未啟動）。"""
+    backend = backend or CONVERTER_BACKEND
+    if backend == "auto":
+        backend = "docx2pdf" if sys.platform in ("win32", "darwin") else "libreoffice"
+    if backend == "docx2pdf":
+        return Docx2PdfConverter()
+    if backend == "libreoffice":
+        port = UNOSERVER_PORT or os.environ.get(_PORT_ENV)
+        return LibreOfficeConverter(UNOSERVER_HOST, int(port) if port else None)
+    raise ValueError(f"未知的轉檔後端：{backend}")
+
+
+def get_converter() -> DocxConverter:
+    """
+    取得本行程共用的轉檔後端，第一次呼叫時啟動，程式結束時自動關閉。
+    """
+    global _default_converter
+    if _default_converter is None:
+        _default_converter = create_converter()
+        _default_converter.start()
+        atexit.register(_default_converter.close)
+    return _default_converter
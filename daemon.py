@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+from config import DAEMON_HOST, DAEMON_PORT
+
+# submit／ping／stop 只用到標準函式庫；serve 才載入產生報告所需的套件
+WARM_MODULES = ("batch", "excel_processor", "doc_generator", "doc_image_processor", "photo_page_renderer",
+                "pipeline", "plan_renderer", "gml_validation", "signature_stamps", "pdf_assembler")
+
+
+class _Handler:
+    """每個連線讀取一行 JSON 請求，回傳一行 JSON 結果；請求依序處理，不會同時執行兩個案件。"""
+
+    server = None
+    started = time.time()
+    jobs = 0
+
+    @classmethod
+    def handle(cls, request: dict) -> dict:
+        action = request.get("action")
+        if action == "ping":
+            return {"status": "ok", "pid": os.getpid(), "uptime_seconds": round(time.time() - cls.started, 1),
+                    "jobs": cls.jobs}
+        if action == "stop":
+            import threading
+            # serve_forever 所在的執行緒無法自行呼叫 shutdown
+            threading.Thread(target=cls.server.shutdown, daemon=True).start()
+            return {"status": "ok"}
+        if action == "submit":
+            from batch import run_batch_case
+            case = {
+                "case_folder": request["case_folder"],
+                "supervisor_image": request.get("supervisor_image"),
+                "district_image": request.get("district_image"),
+            }
+            cls.jobs += 1
+            return run_batch_case(case, request.get("workers"))
+        return {"status": "failed", "error": f"未知的指令：{action}"}
+
+
+def warm_up() -> None:
+    """載入產生流程用到的套件，解析模板並啟動轉檔後端，之後的案件不必再等待冷啟動。"""
+    import importlib
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+    from template_cache import load_document
+    from converter import get_converter
+    from config import TEMPLATE_MAIN, TEMPLATE_TABLE
+    for template_path in (TEMPLATE_MAIN, TEMPLATE_TABLE):
+        load_document(template_path)
+    get_converter()
+
+
+def serve(host: str = DAEMON_HOST, port: int = DAEMON_PORT) -> None:
+    """啟動常駐行程，僅接受本機連線，直到收到 stop 指令或 Ctrl+C。"""
+    import socketserver
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                response = _Handler.handle(json.loads(self.rfile.readline().decode("utf-8")))
+            except Exception as e:
+                response = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response, ensure_ascii=False, default=str).encode("utf-8") + b"\n")
+
+    start = time.perf_counter()
+    warm_up()
+    socketserver.TCPServer.allow_reuse_address = True
+    with socketserver.TCPServer((host, port), RequestHandler) as server:
+        _Handler.server = server
+        print(f"常駐行程已就緒（預熱 {time.perf_counter() - start:.1f}s），監聽 {host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    print("常駐行程已結束。")
+
+
+def send(request: dict, host: str = DAEMON_HOST, port: int = DAEMON_PORT, timeout: float = None) -> dict:
+    """送出一個請求並等待結果；常駐行程未啟動時拋出 ConnectionError。"""
+    with socket.create_connection((host, port), timeout=timeout) as conn:
+        conn.sendall(json.dumps(request, ensure_ascii=False).encode("utf-8") + b"\n")
+        with conn.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise ConnectionError("常駐行程未回傳結果")
+    return json.loads(line.decode("utf-8"))
+
+
+def submit(case_folder: str, supervisor_image: str = None, district_image: str = None,
+           workers: int = None, host: str = DAEMON_HOST, port: int = DAEMON_PORT) -> dict:
+    """將一個案件資料夾交給常駐行程處理，回傳與 batch.run_batch_case 相同格式的結果。"""
+    def absolute(path):
+        return os.path.abspath(path) if path else None
+    return send({
+        "action": "submit",
+        "case_folder": absolute(case_folder),
+        "supervisor_image": absolute(supervisor_image),
+        "district_image": absolute(district_image),
+        "workers": workers,
+    }, host, port)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="自主查核表常駐行程：預先載入後經由本機 socket 接收案件")
+    parser.add_argument("--host", default=DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=DAEMON_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("serve", help="啟動常駐行程")
+    submit_parser = commands.add_parser("submit", help="送出案件資料夾（可多個，依序處理）")
+    submit_parser.add_argument("case_folders", nargs="+")
+    submit_parser.add_argument("--supervisor-image", help="監工簽名圖片（未指定時依監工名稱取用已登錄的簽名）")
+    submit_parser.add_argument("--district-image", help="營業處簽名圖片（未指定時依區處取用已登錄的簽名）")
+    submit_parser.add_argument("--workers", type=int, default=None, help="案件內平面圖組與照片頁的工作行程數")
+    commands.add_parser("ping", help="確認常駐行程是否在執行")
+    commands.add_parser("stop", help="結束常駐行程")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.command == "serve":
+        serve(args.host, args.port)
+        return 0
+    try:
+        if args.command == "submit":
+            failed = 0
+            for case_folder in args.case_folders:
+                result = submit(case_folder, args.supervisor_image, args.district_image, args.workers,
+                                args.host, args.port)
+                detail = result.get("output_pdf") if result["status"] == "success" else result.get("error")
+                print(f"[{result['status']}] {case_folder}（{result.get('seconds')}s）{detail}")
+                failed += result["status"] != "success"
+            return 1 if failed else 0
+        print(json.dumps(send({"action": args.command}, args.host, args.port), ensure_ascii=False))
+        return 0
+    except ConnectionError as e:
+        print(f"無法連線至常駐行程 {args.host}:{args.port}：{e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
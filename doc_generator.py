@@ -1,9 +1,24 @@
 import os
-from docxtpl import DocxTemplate
-from docx2pdf import convert
+from template_cache import load_docx_template
+from converter import get_converter
 from config import TEMPLATE_MAIN
 
 
+def render_records_docx(record: dict, output_folder: str) -> str:
+    """
+    使用模板產生首頁 Word 文件（不轉檔），回傳 Word 檔案路徑。
+
+    :param record: 填入模板的資料字典
+    :param output_folder: 輸出資料夾路徑
+    :return: 產生的 Word 檔案路徑
+    """
+    doc = load_docx_template(TEMPLATE_MAIN)
+    doc.render(record)
+    docx_path = os.path.join(output_folder, "temp_自主查核表首頁.docx")
+    doc.save(docx_path)
+    return docx_path
+
+
 def generate_records_doc(record: dict, output_folder: str) -> str:
     """
     使用模板產生 Word 文件，並轉換為 PDF。
@@ -12,13 +27,9 @@ def generate_records_doc(record: dict, output_folder: str) -> str:
     :param output_folder: 輸出資料夾路徑
     :return: 產生的 PDF 檔案路徑
     """
-    doc = DocxTemplate(TEMPLATE_MAIN)
-    doc.render(record)
-    docx_path = os.path.join(output_folder, "temp_自主查核表首頁.docx")
+    docx_path = render_records_docx(record, output_folder)
     pdf_path = os.path.join(output_folder, "temp_自主查核表首頁.pdf")
-
-    doc.save(docx_path)
-    convert(docx_path, pdf_path)
+    get_converter().convert(docx_path, pdf_path)
 
     print(f"Records PDF 已產生：{pdf_path}")
     return pdf_path
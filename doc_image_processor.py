@@ -1,13 +1,18 @@
 import os
 import docx
+from functools import partial
 from docx.shared import Cm
 from docx.enum.table import WD_CELL_VERTICAL_ALIGNMENT
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx2pdf import convert
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
-from PyPDF2 import PdfMerger
 from typing import List
+from scheduler import run_parallel
+from converter import get_converter
+from image_cache import is_blank_image, prepare_image
+from image_inventory import get_inventory
+from pdf_assembler import PdfAssembler
+from table_fill import load_table_document, fill_text, fill_picture, set_top_border
 
 def set_vertical_text_alternative(cell: docx.table._Cell, text: str) -> None:
     """
@@ -27,12 +32,29 @@ def set_vertical_text_alternative(cell: docx.table._Cell, text: str) -> None:
 
 def get_image_files(plane_folder: str) -> List[str]:
     """
-    取得指定資料夾中所有圖片檔案（依副檔名過濾）。
+    取得指定資料夾中所有圖片檔案（依 config.VALID_EXTENSIONS 過濾、檔名自然排序），
+    查詢案件資料夾的圖片清單，不另外讀取資料夾。
     """
-    valid_extensions = [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff"]
-    return [os.path.join(plane_folder, f)
-            for f in os.listdir(plane_folder)
-            if os.path.splitext(f)[1].lower() in valid_extensions]
+    plane_folder = os.path.abspath(plane_folder)
+    return get_inventory(os.path.dirname(plane_folder)).images(os.path.basename(plane_folder))
+
+
+# 平面圖模板中兩張圖片各自合併的範圍（左上角, 右下角）
+PLAN_PICTURE_AREAS = (((1, 1), (4, 2)), ((5, 1), (8, 2)))
+
+
+def merge_plan_template(doc, picture_count: int) -> None:
+    """
+    預先合併平面圖模板：前 picture_count 個圖片範圍合併並垂直置中，
+    第一欄第2~9行合併後以垂直排列方式寫入固定文字。每個行程、每種張數只執行一次。
+    """
+    table = doc.tables[0]
+    for top_left, bottom_right in PLAN_PICTURE_AREAS[:picture_count]:
+        merged_cell = table.cell(*top_left).merge(table.cell(*bottom_right))
+        merged_cell.text = ""
+        merged_cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
+    merged_text_cell = table.cell(1, 0).merge(table.cell(8, 0))
+    set_vertical_text_alternative(merged_text_cell, "一、竣工平面圖")
 
 
 def insert_images_in_template(template_path: str, image_group: List[str], output_file: str) -> None:
@@ -41,33 +63,15 @@ def insert_images_in_template(template_path: str, image_group: List[str], output
       - 第一張圖片放在第2~5行、第2~3欄合併儲存格內（垂直置中）。
       - 第二張圖片放在第6~9行、第2~3欄合併儲存格內（垂直置中）。
       - 合併第一欄第2~9行儲存格，並以垂直排列方式插入固定文字。
-      
+    儲存格合併與固定文字使用預先處理好的模板副本，每組只需放入圖片。
+
     產生的 Word 文件將儲存至 output_file。
     """
-    doc = docx.Document(template_path)
-    table = doc.tables[0]
-
-    # 第一張圖片（若存在）
-    if len(image_group) >= 1:
-        merged_cell = table.cell(1, 1).merge(table.cell(4, 2))
-        merged_cell.text = ""
-        paragraph = merged_cell.paragraphs[0]
-        run = paragraph.add_run()
-        run.add_picture(image_group[0], width=Cm(15.91))
-        merged_cell.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-
-    # 第二張圖片（若存在）
-    if len(image_group) >= 2:
-        merged_cell2 = table.cell(5, 1).merge(table.cell(8, 2))
-        merged_cell2.text = ""
-        paragraph2 = merged_cell2.paragraphs[0]
-        run2 = paragraph2.add_run()
-        run2.add_picture(image_group[1], width=Cm(15.91))
-        merged_cell2.vertical_alignment = WD_CELL_VERTICAL_ALIGNMENT.CENTER
-
-    # 合併第一欄第2~9行，插入垂直排列文字
-    merged_text_cell = table.cell(1, 0).merge(table.cell(8, 0))
-    set_vertical_text_alternative(merged_text_cell, "一、竣工平面圖")
+    count = min(len(image_group), len(PLAN_PICTURE_AREAS))
+    doc, grid = load_table_document(template_path, f"plan_{count}", partial(merge_plan_template, picture_count=count))
+    for (top_left, _), img in zip(PLAN_PICTURE_AREAS, image_group):
+        paragraph = grid.cell(*top_left).paragraphs[0]
+        paragraph.add_run().add_picture(prepare_image(img, width_cm=15.91), width=Cm(15.91))
 
     doc.save(output_file)
     print(f"已儲存 Word 文件：{output_file}")
@@ -75,16 +79,18 @@ def insert_images_in_template(template_path: str, image_group: List[str], output
 
 def convert_word_to_pdf(word_path: str, pdf_path: str) -> None:
     """
-    將指定的 Word 文件轉換成 PDF。
+    將指定的 Word 文件轉換成 PDF（使用本行程共用的轉檔後端）。
+    """
+    get_converter().convert(word_path, pdf_path)
+
+
+def convert_words_to_pdfs(word_paths: List[str]) -> List[str]:
+    """
+    將多個 Word 文件一次交給轉檔後端轉換，PDF 與 Word 檔同名同資料夾，
+    回傳依輸入順序排列的 PDF 路徑。
     """
-    try:
-        convert(word_path, pdf_path)
-        print(f"已生成 PDF 文件：{pdf_path}")
-    except AttributeError as e:
-        if "Word.Application.Quit" in str(e):
-            print(f"遇到 Word.Application.Quit 錯誤於 {word_path}，忽略並繼續。")
-        else:
-            raise e
+    pairs = [(word_path, os.path.splitext(word_path)[0] + ".pdf") for word_path in word_paths]
+    return get_converter().convert_many(pairs)
 
 
 def merge_pdfs(pdf_folder: str, output_pdf: str) -> None:
@@ -95,42 +101,56 @@ def merge_pdfs(pdf_folder: str, output_pdf: str) -> None:
     pdf_files = [os.path.join(pdf_folder, f)
                  for f in os.listdir(pdf_folder)
                  if f.endswith('.pdf') and f.startswith("temp_modified_template_group_")]
-    pdf_files.sort()
+    # 依組別編號排序，避免 group_10 排在 group_2 之前
+    pdf_files.sort(key=lambda p: int(os.path.splitext(p)[0].rsplit("_", 1)[1]))
     if pdf_files:
-        merger = PdfMerger()
-        for pdf in pdf_files:
-            merger.append(pdf)
-        merger.write(output_pdf)
-        merger.close()
-        print(f"已合併所有 PDF 至：{output_pdf}")
+        merge_pdfs_from_list(pdf_files, output_pdf)
 
 
 def merge_pdfs_from_list(pdf_list: List[str], output_pdf: str) -> None:
     """
-    合併 pdf_list 中所有 PDF 檔案，並輸出至 output_pdf。
+    合併 pdf_list 中所有 PDF 檔案，並輸出至 output_pdf（重複的字型等資源只寫入一次）。
     """
-    merger = PdfMerger()
+    assembler = PdfAssembler()
     for pdf in pdf_list:
-        merger.append(pdf)
-    merger.write(output_pdf)
-    merger.close()
-    print(f"合併完成：{output_pdf}")
+        assembler.add(pdf)
+    assembler.write(output_pdf)
+
+
+def plan_group_key(manifest, template_path: str, group: List[str]) -> str:
+    """一組平面圖（至多兩張）的建置輸入雜湊。"""
+    return manifest.input_key({"unit": "plan"}, [template_path] + group)
+
 
+def photo_page_key(manifest, template_path: str, group: list, new_categories: list, renderer: str) -> str:
+    """一頁照片的建置輸入雜湊：圖片內容、標題文字、首次出現的類別與產生方式。"""
+    return manifest.input_key(
+        {
+            "renderer": renderer,
+            "captions": [(image_caption(img, c), c) for img, c in group],
+            "new": new_categories,
+        },
+        [template_path] + [img for img, _ in group],
+    )
 
-def process_documents(main_folder: str, template_path: str, output_folder: str, case_number: str) -> None:
+
+def process_documents(main_folder: str, template_path: str, output_folder: str, case_number: str,
+                      workers: int = None, assembler=None, manifest=None, images: List[str] = None) -> None:
     """
     核心流程：
-      1. 從 main_folder 下的「平面圖」資料夾取得所有圖片。
-      2. 每兩張圖片一組，根據模板產生對應的 Word 文件並轉換為 PDF。
-      3. 合併所有 PDF 至一份。
+      1. 從 main_folder 下的「平面圖」資料夾取得所有圖片（有傳入 images 時直接使用，例如自動繪製的平面圖）。
+      2. 每兩張圖片一組，根據模板產生對應的 Word 文件（可平行處理）。
+      3. 將所有 Word 文件一次轉換為 PDF，並依組別順序合併至一份；
+         有傳入 assembler（PdfAssembler）時改為直接加入其 "plans" 段落，不另寫合併檔。
+    有傳入 manifest（BuildManifest）時，模板與圖片皆未變動的組別直接沿用先前的 PDF。
     """
-    plane_folder = os.path.join(main_folder, "平面圖")
-    if not os.path.isdir(plane_folder):
-        print(f"找不到資料夾：{plane_folder}")
-        return
-
-    images = get_image_files(plane_folder)
-    print(f"平面圖資料夾中共有 {len(images)} 張圖片。")
+    if images is None:
+        plane_folder = os.path.join(main_folder, "平面圖")
+        if not get_inventory(main_folder).has_folder("平面圖"):
+            print(f"找不到資料夾：{plane_folder}")
+            return
+        images = get_image_files(plane_folder)
+        print(f"平面圖資料夾中共有 {len(images)} 張圖片。")
     if not images:
         print("沒有找到任何圖片，程式終止。")
         return
@@ -138,17 +158,39 @@ def process_documents(main_folder: str, template_path: str, output_folder: str,
     groups = [images[i:i+2] for i in range(0, len(images), 2)]
     print(f"總共分成 {len(groups)} 組。")
 
+    pdf_files = [None] * len(groups)
+    keys = [None] * len(groups)
+    tasks = []
+    word_paths = []
+    stale = []
     for idx, group in enumerate(groups, start=1):
+        if manifest is not None:
+            keys[idx - 1] = plan_group_key(manifest, template_path, group)
+            cached_pdf = manifest.lookup(f"plan_{idx}", keys[idx - 1])
+            if cached_pdf:
+                pdf_files[idx - 1] = cached_pdf
+                continue
         word_filename = f"temp_modified_template_group_{idx}.docx"
         word_path = os.path.join(output_folder, word_filename)
-        pdf_filename = f"temp_modified_template_group_{idx}.pdf"
-        pdf_path = os.path.join(output_folder, pdf_filename)
-
-        insert_images_in_template(template_path, group, word_path)
-        convert_word_to_pdf(word_path, pdf_path)
+        tasks.append((template_path, group, word_path))
+        word_paths.append(word_path)
+        stale.append(idx)
+    if manifest is not None:
+        print(f"平面圖共 {len(groups)} 組，需重建 {len(stale)} 組。")
+
+    run_parallel(insert_images_in_template, tasks, workers)
+    for idx, pdf in zip(stale, convert_words_to_pdfs(word_paths)):
+        if manifest is not None:
+            pdf = manifest.store(f"plan_{idx}", keys[idx - 1], pdf)
+        pdf_files[idx - 1] = pdf
+
+    if assembler is not None:
+        for pdf in pdf_files:
+            assembler.add(pdf, "plans")
+        return
 
     merged_pdf_path = os.path.join(output_folder, f"{case_number}_竣工平面圖.pdf")
-    merge_pdfs(output_folder, merged_pdf_path)
+    merge_pdfs_from_list(pdf_files, merged_pdf_path)
 
 
 # 以下為從原 main_helpers.py 移入的 docx 相關函式
@@ -185,97 +227,110 @@ def set_cell_font(cell, font_name="標楷體") -> None:
             run._element.rPr.rFonts.set(qn("w:eastAsia"), font_name)
 
 
-def insert_images_into_9x3_template_left_to_right(template_path: str, images: list, output_prefix: str) -> list:
+VERTICAL_TEXT_DICT = {
+    "埋深照": "二\n、\n深\n度\n相\n片",
+    "銑鋪照": "三\n、\n臨\n時\n修\n復\n後\n全\n景\n照\n片",
+    "測量照": "四\n、\n施\n測\n相\n片",
+    "讀數照": "五\n、\n讀\n數\n相\n片",
+}
+
+
+def image_caption(img_path: str, category: str) -> str:
+    """
+    依檔名產生照片上方的「編號:」標題；空白圖片回傳空字串。
+    埋深照與銑鋪照去除前導零，讀數照去除 app_ 前綴。
+    """
+    if is_blank_image(img_path):
+        return ""
+    basename = os.path.basename(img_path)
+    name_no_ext = os.path.splitext(basename)[0]
+    if category in ["埋深照", "銑鋪照"]:
+        try:
+            name_no_ext = str(int(name_no_ext))
+        except Exception:
+            pass
+    if category == "讀數照" and name_no_ext.startswith("app_"):
+        name_no_ext = name_no_ext[4:]
+    return "編號:" + name_no_ext
+
+
+def fill_9x3_page(template_path: str, group: list, new_categories: list, output_file: str) -> str:
+    """
+    以 9×3 模板產生單一頁（最多 8 張圖片）的 Word 文件，回傳檔案路徑。
+
+    :param group: 本頁的 [(圖片路徑, 類別)]
+    :param new_categories: 於本頁首次出現、需合併儲存格並寫入直式標題的類別
+    :param output_file: 輸出的 Word 檔案路徑
+    """
+    doc, grid = load_table_document(template_path)
+    placed_categories = set()
+
+    for j, (img_path, category) in enumerate(group):
+        abs_col = 1 + j % 2
+        abs_row_fname = 1 + 2 * (j // 2)
+        abs_row_img = abs_row_fname + 1
+
+        fill_text(grid.tc(abs_row_fname, abs_col), image_caption(img_path, category))
+
+        if category in new_categories and category not in placed_categories:
+            # 模板第一欄已兩兩合併，此時不會改變表格結構
+            merged_tc = grid.merge((abs_row_fname, 0), (abs_row_img, 0))
+            fill_text(merged_tc, VERTICAL_TEXT_DICT.get(category, category))
+            set_top_border(merged_tc)
+            placed_categories.add(category)
+
+        fill_picture(grid, abs_row_img, abs_col, prepare_image(img_path, height_cm=5.47), height=Cm(5.47))
+
+    if grid.cell(1, 0).text.strip() == "" and len(group) > 1:
+        category = group[1][1]
+        tc = grid.tc(1, 0)
+        fill_text(tc, VERTICAL_TEXT_DICT.get(category, category))
+        set_top_border(tc)
+
+    doc.save(output_file)
+    print(f"已儲存：{output_file}")
+    return output_file
+
+
+def plan_9x3_pages(images: list) -> list:
+    """
+    將 [(圖片路徑, 類別)] 每 8 張分成一頁，並依序計算每頁首次出現的類別。
+    回傳 [(該頁圖片列表, 首次出現的類別列表)]，使各頁可以獨立產生。
+    """
+    pages = []
+    used_categories = set()
+    for i in range(0, len(images), 8):
+        group = images[i: i+8]
+        new_categories = []
+        for _, category in group:
+            if category not in used_categories:
+                new_categories.append(category)
+                used_categories.add(category)
+        pages.append((group, new_categories))
+    return pages
+
+
+def insert_images_into_9x3_template_left_to_right(template_path: str, images: list, output_prefix: str,
+                                                  workers: int = None) -> list:
     """
     使用 9×3 Word 模板將圖片依規則填入指定儲存格中，
     每份文件最多 8 張圖片，並依據圖片類別插入標題文字。
+    各頁可平行產生，回傳順序固定依頁碼排列。
     
     :param template_path: 模板檔案路徑
     :param images: [(圖片路徑, 類別)] 的列表
     :param output_prefix: 輸出檔案的前置名稱
+    :param workers: 工作行程數，預設使用 config.MAX_WORKERS
     :return: 生成的 Word 檔案路徑列表
     """
-    output_files = []
-    groups = [images[i: i+8] for i in range(0, len(images), 8)]
     out_dir = os.path.dirname(output_prefix)
     base_name = os.path.basename(output_prefix)
     if out_dir and not os.path.exists(out_dir):
         os.makedirs(out_dir)
 
-    used_categories = set()
-    vertical_text_dict = {
-        "埋深照": "二\n、\n深\n度\n相\n片",
-        "銑鋪照": "三\n、\n臨\n時\n修\n復\n後\n全\n景\n照\n片",
-        "測量照": "四\n、\n施\n測\n相\n片",
-        "讀數照": "五\n、\n讀\n數\n相\n片",
-    }
-
-    # 為避免重複引入，內部局部引用
-    import re
-    import docx
-    from docx.shared import Cm
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-
-    for group_idx, group in enumerate(groups, start=1):
-        doc = docx.Document(template_path)
-        table = doc.tables[0]
-
-        for j, (img_path, category) in enumerate(group):
-            row_pair = j // 2
-            effective_col = j % 2
-            abs_col = 1 + effective_col
-            abs_row_fname = 1 + 2 * row_pair
-            abs_row_img = 1 + 2 * row_pair + 1
-
-            fname_cell = table.cell(abs_row_fname, abs_col)
-            basename = os.path.basename(img_path)
-            if basename.startswith("blank"):
-                fname_cell.text = ""
-            else:
-                name_no_ext = os.path.splitext(basename)[0]
-                if category in ["埋深照", "銑鋪照"]:
-                    try:
-                        name_no_ext = str(int(name_no_ext))
-                    except Exception:
-                        pass
-                if category == "讀數照" and name_no_ext.startswith("app_"):
-                    name_no_ext = name_no_ext[4:]
-                fname_cell.text = "編號:" + name_no_ext
-            for para in fname_cell.paragraphs:
-                para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            set_cell_font(fname_cell, "標楷體")
-
-            if category not in used_categories:
-                merged_cell = table.cell(abs_row_fname, 0).merge(table.cell(abs_row_img, 0))
-                vertical_text = vertical_text_dict.get(category, category)
-                merged_cell.text = vertical_text
-                for para in merged_cell.paragraphs:
-                    para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                set_cell_top_border_bold(merged_cell)
-                set_cell_font(merged_cell, "標楷體")
-                used_categories.add(category)
-
-            img_cell = table.cell(abs_row_img, abs_col)
-            img_cell.text = ""
-            paragraph = img_cell.paragraphs[0]
-            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            set_cell_font(img_cell, "標楷體")
-            run = paragraph.add_run()
-            run.add_picture(img_path, height=Cm(5.47))
-
-        if table.cell(1, 0).text.strip() == "" and len(group) > 1:
-            category = group[1][1]
-            vertical_text = vertical_text_dict.get(category, category)
-            cell_to_fill = table.cell(1, 0)
-            cell_to_fill.text = vertical_text
-            for para in cell_to_fill.paragraphs:
-                para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-            set_cell_top_border_bold(cell_to_fill)
-            set_cell_font(cell_to_fill, "標楷體")
-
+    tasks = []
+    for group_idx, (group, new_categories) in enumerate(plan_9x3_pages(images), start=1):
         output_file = os.path.join(out_dir, f"temp_{base_name}_{group_idx}.docx")
-        doc.save(output_file)
-        print(f"已儲存：{output_file}")
-        output_files.append(output_file)
+        tasks.append((template_path, group, new_categories, output_file))
 
-    return output_files
+    return run_parallel(fill_9x3_page, tasks, workers)
@@ -1,23 +1,202 @@
-import tkinter as tk
-from tkinter import filedialog
-import xmltodict
+import sys
 import json
+import argparse
+import xml.etree.ElementTree as ET
 
-# 建立並隱藏主視窗
-root = tk.Tk()
-root.withdraw()
+import numpy as np
 
-# 開啟檔案選取對話框，限制檔案類型為 .gml
-file_path = filedialog.askopenfilename(
-    title="選擇 GML 檔案",
-    filetypes=[("GML files", "*.gml")]
-)
+GML_NAMESPACES = ("http://www.opengis.net/gml", "http://www.opengis.net/gml/3.2")
+# 包住單一要素的容器（featureMember）與包住多個要素的容器（featureMembers）
+MEMBER_TAGS = {"featureMember", "member"}
+MEMBERS_TAGS = {"featureMembers"}
+COORDINATE_TAGS = {"pos", "posList", "coordinates"}
 
-if file_path:
-    with open(file_path, encoding="utf-8") as fd:
-        doc = xmltodict.parse(fd.read())
 
-    json_data = json.dumps(doc, indent=4, ensure_ascii=False)
-    print(json_data)
-else:
-    print("未選擇檔案")
+def _split_tag(tag: str) -> tuple:
+    """將 '{namespace}name' 拆成 (namespace, name)。"""
+    if tag.startswith("{"):
+        ns, _, name = tag[1:].partition("}")
+        return ns, name
+    return "", tag
+
+
+def _parse_coordinates(elem: ET.Element, dimension: int) -> list:
+    """解析 gml:pos / gml:posList / gml:coordinates 為座標 tuple 列表。"""
+    _, name = _split_tag(elem.tag)
+    text = (elem.text or "").strip()
+    if not text:
+        return []
+    if name == "coordinates":
+        # 舊式 GML 2："x,y[,z] x,y[,z] ..."
+        return [tuple(float(v) for v in pair.split(",")) for pair in text.split()]
+    values = [float(v) for v in text.split()]
+    if name == "pos":
+        # gml:pos 必定只有一個點，所有數值即為其座標（未標 srsDimension 時不可套用幾何的預設維度）
+        return [tuple(values)]
+    dimension = int(elem.get("srsDimension") or elem.get("dimension") or dimension)
+    return [tuple(values[i:i + dimension]) for i in range(0, len(values) - dimension + 1, dimension)]
+
+
+def _parse_geometry(prop: ET.Element, geometry: ET.Element) -> dict:
+    """解析一個幾何屬性（例如 <geom><gml:LineString>...</gml:LineString></geom>）。"""
+    dimension = int(geometry.get("srsDimension") or 2)
+    parts = []
+    for elem in geometry.iter():
+        if _split_tag(elem.tag)[1] in COORDINATE_TAGS:
+            coords = _parse_coordinates(elem, dimension)
+            if coords:
+                parts.append(coords)
+    geometry_type = _split_tag(geometry.tag)[1]
+    return {
+        "property": _split_tag(prop.tag)[1],
+        "type": geometry_type,
+        "srs": geometry.get("srsName"),
+        "parts": parts,
+    }
+
+
+def _parse_feature(feature: ET.Element) -> dict:
+    """將單一要素元素轉為 dict：id、type、attributes（文字屬性）與 geometries。"""
+    attributes = {}
+    geometries = []
+    for prop in feature:
+        children = list(prop)
+        gml_child = next((c for c in children if _split_tag(c.tag)[0] in GML_NAMESPACES), None)
+        if gml_child is not None:
+            geometries.append(_parse_geometry(prop, gml_child))
+        elif not children:
+            attributes[_split_tag(prop.tag)[1]] = (prop.text or "").strip()
+    feature_id = None
+    for ns in GML_NAMESPACES:
+        feature_id = feature.get(f"{{{ns}}}id") or feature_id
+    return {
+        "id": feature_id or feature.get("fid"),
+        "type": _split_tag(feature.tag)[1],
+        "attributes": attributes,
+        "geometries": geometries,
+    }
+
+
+def iter_features(gml_path: str):
+    """
+    以 iterparse 串流讀取 GML，逐一產生要素 dict，處理完的元素立即自樹中移除，
+    記憶體用量只與單一要素大小有關，與檔案大小無關。
+    """
+    stack = []
+    for event, elem in ET.iterparse(gml_path, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+        stack.pop()
+        parent = stack[-1] if stack else None
+        name = _split_tag(elem.tag)[1]
+        parent_name = _split_tag(parent.tag)[1] if parent is not None else None
+        if name in MEMBER_TAGS:
+            for feature in elem:
+                yield _parse_feature(feature)
+        elif parent_name in MEMBERS_TAGS:
+            yield _parse_feature(elem)
+        else:
+            continue
+        elem.clear()
+        if parent is not None:
+            parent.remove(elem)
+
+
+def extract_points(features) -> dict:
+    """
+    由要素取出所有點座標，回傳欄位陣列：id、type、x、y、z（無 z 時為 NaN）。
+    features 可為 iter_features 的結果或 GML 路徑。
+    """
+    if isinstance(features, str):
+        features = iter_features(features)
+    ids, types, xs, ys, zs = [], [], [], [], []
+    for feature in features:
+        for geometry in feature["geometries"]:
+            if geometry["type"] not in ("Point", "MultiPoint"):
+                continue
+            for part in geometry["parts"]:
+                for coord in part:
+                    ids.append(feature["id"])
+                    types.append(feature["type"])
+                    xs.append(coord[0])
+                    ys.append(coord[1])
+                    zs.append(coord[2] if len(coord) > 2 else np.nan)
+    return {
+        "id": np.array(ids, dtype=object),
+        "type": np.array(types, dtype=object),
+        "x": np.array(xs, dtype=np.float64),
+        "y": np.array(ys, dtype=np.float64),
+        "z": np.array(zs, dtype=np.float64),
+    }
+
+
+def extract_segments(features) -> list:
+    """
+    由要素取出所有線段（管線）幾何，回傳 [(要素 id, 要素類型, N×2 或 N×3 座標陣列)]。
+    features 可為 iter_features 的結果或 GML 路徑。
+    """
+    if isinstance(features, str):
+        features = iter_features(features)
+    segments = []
+    for feature in features:
+        for geometry in feature["geometries"]:
+            if geometry["type"] in ("Point", "MultiPoint"):
+                continue
+            for part in geometry["parts"]:
+                if len(part) >= 2:
+                    segments.append((feature["id"], feature["type"], np.array(part, dtype=np.float64)))
+    return segments
+
+
+def to_survey_points(points: dict):
+    """
+    將 extract_points 的結果轉為 survey_points.SurveyPoints，
+    使 GML 座標可直接供報表流程使用（全部視為管道點-實測）。
+    """
+    from survey_points import SurveyPoints, COLUMNS
+    n = len(points["x"])
+    raw = {name: np.full(n, None, dtype=object) for name in COLUMNS}
+    raw["Number"][:] = points["id"]
+    raw["Type"][:] = points["type"]
+    raw["Coordinate_X"][:] = points["x"].tolist()
+    raw["Coordinate_Y"][:] = points["y"].tolist()
+    raw["Pipe_Top_Coordinate_Z"][:] = [None if np.isnan(z) else z for z in points["z"].tolist()]
+    return SurveyPoints(raw, np.ones(n, dtype=bool))
+
+
+def _select_gml_file() -> str:
+    """以 Tkinter 對話框選取 GML 檔案。"""
+    import tkinter as tk
+    from tkinter import filedialog
+    root = tk.Tk()
+    root.withdraw()
+    return filedialog.askopenfilename(
+        title="選擇 GML 檔案",
+        filetypes=[("GML files", "*.gml")]
+    )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="串流解析 GML，逐行輸出要素 JSON（JSONL）")
+    parser.add_argument("gml", nargs="?", help="GML 檔案路徑；省略時開啟檔案選取對話框")
+    parser.add_argument("--output", help="輸出 JSONL 檔案（預設為標準輸出）")
+    args = parser.parse_args(argv)
+
+    file_path = args.gml or _select_gml_file()
+    if not file_path:
+        print("未選擇檔案")
+        return 1
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for feature in iter_features(file_path):
+            out.write(json.dumps(feature, ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,291 @@
+import io
+import os
+import csv
+import math
+import argparse
+from collections import defaultdict
+
+import numpy as np
+
+from gml_file_extract import iter_features
+from survey_points import read_survey_points
+from config import GML_MATCH_TOLERANCE, GML_MATCH_TOLERANCE_Z
+
+DISCREPANCY_FIELDS = [
+    "Number", "Type", "Coordinate_X", "Coordinate_Y", "Pipe_Top_Coordinate_Z",
+    "feature_id", "feature_type", "distance", "dz", "status",
+]
+STATUS_LABELS = {
+    "ok": "符合",
+    "out_of_tolerance": "平面位置超出容許誤差",
+    "z_mismatch": "高程超出容許誤差",
+    "no_feature": "GML 無對應要素",
+    "invalid_coordinate": "座標非數值",
+}
+
+
+# 網格索引的最小格寬（公尺）；避免線段共線或沿座標軸排列時格子縮到毫米而數量暴增
+MIN_CELL_SIZE = 1.0
+
+
+class FeatureGridIndex:
+    """
+    以均勻網格索引 GML 的點與線段（點視為長度 0 的線段），
+    查詢時由所在網格向外逐圈搜尋，只計算鄰近候選的距離。
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, z_starts: np.ndarray, z_ends: np.ndarray,
+                 feature_ids: list, feature_types: list, cell_size: float = None):
+        self.a = starts
+        self.b = ends
+        self.za = z_starts
+        self.zb = z_ends
+        self.feature_ids = feature_ids
+        self.feature_types = feature_types
+        n = len(starts)
+        lo = np.minimum(starts, ends)
+        hi = np.maximum(starts, ends)
+        self.origin = lo.min(axis=0) if n else np.zeros(2)
+        extent = (hi.max(axis=0) - self.origin) if n else np.ones(2)
+        if cell_size is None:
+            cell_size = self._default_cell_size(extent, np.hypot(*(ends - starts).T) if n else np.zeros(0))
+        self.cell_size = cell_size
+        self.grid_cells = np.floor(extent / cell_size).astype(np.int64)
+
+        self.cells = defaultdict(list)
+        lo_cells = np.floor((lo - self.origin) / cell_size).astype(np.int64)
+        hi_cells = np.floor((hi - self.origin) / cell_size).astype(np.int64)
+        for i in range(n):
+            for cx in range(lo_cells[i, 0], hi_cells[i, 0] + 1):
+                for cy in range(lo_cells[i, 1], hi_cells[i, 1] + 1):
+                    self.cells[(cx, cy)].append(i)
+
+    @staticmethod
+    def _default_cell_size(extent: np.ndarray, lengths: np.ndarray) -> float:
+        """
+        預設網格大小（公尺）：平均每格約一個項目，且不小於平均線段長度（每條線段只跨少數幾格）。
+        共線或沿座標軸排列時面積趨近 0，改以較長邊長平均分配；最小為 MIN_CELL_SIZE。
+        """
+        n = max(len(lengths), 1)
+        area = float(extent[0]) * float(extent[1])
+        return max(math.sqrt(area / n), float(extent.max()) / n, float(lengths.mean()) if len(lengths) else 0.0,
+                   MIN_CELL_SIZE)
+
+    @classmethod
+    def from_features(cls, features, cell_size: float = None) -> "FeatureGridIndex":
+        """由 iter_features 的結果（或 GML 路徑）建立索引。"""
+        if isinstance(features, str):
+            features = iter_features(features)
+        starts, ends, za, zb, ids, types = [], [], [], [], [], []
+        for feature in features:
+            for geometry in feature["geometries"]:
+                for part in geometry["parts"]:
+                    pairs = zip(part, part[1:]) if len(part) > 1 else [(part[0], part[0])]
+                    for p, q in pairs:
+                        starts.append(p[:2])
+                        ends.append(q[:2])
+                        za.append(p[2] if len(p) > 2 else np.nan)
+                        zb.append(q[2] if len(q) > 2 else np.nan)
+                        ids.append(feature["id"])
+                        types.append(feature["type"])
+        return cls(
+            np.array(starts, dtype=np.float64).reshape(-1, 2),
+            np.array(ends, dtype=np.float64).reshape(-1, 2),
+            np.array(za, dtype=np.float64),
+            np.array(zb, dtype=np.float64),
+            ids, types, cell_size,
+        )
+
+    def __len__(self) -> int:
+        return len(self.a)
+
+    def _ring(self, cx: int, cy: int, r: int) -> set:
+        if r == 0:
+            return set(self.cells.get((cx, cy), ()))
+        found = set()
+        for dx in range(-r, r + 1):
+            for dy in (-r, r):
+                found.update(self.cells.get((cx + dx, cy + dy), ()))
+        for dy in range(-r + 1, r):
+            for dx in (-r, r):
+                found.update(self.cells.get((cx + dx, cy + dy), ()))
+        return found
+
+    def nearest(self, x: float, y: float) -> tuple:
+        """
+        回傳距離 (x, y) 最近的項目：(項目索引, 水平距離, 最近點的內插高程)；
+        索引為空時回傳 (None, inf, nan)。
+        """
+        if not len(self):
+            return None, math.inf, math.nan
+        p = np.array([x, y])
+        cx, cy = np.floor((p - self.origin) / self.cell_size).astype(np.int64)
+        nx, ny = self.grid_cells
+        # 點落在網格外時，直接由最接近網格的那一圈開始搜尋，並搜尋到涵蓋整個網格為止
+        r = max(0, -cx, cx - nx, -cy, cy - ny)
+        r_max = max(abs(cx), abs(cx - nx), abs(cy), abs(cy - ny))
+        best_idx, best_dist, best_t = None, math.inf, 0.0
+        while True:
+            candidates = self._ring(cx, cy, r)
+            if candidates:
+                idx = np.fromiter(candidates, dtype=np.int64)
+                a, b = self.a[idx], self.b[idx]
+                ab = b - a
+                denom = (ab * ab).sum(axis=1)
+                t = np.where(denom > 0, ((p - a) * ab).sum(axis=1) / np.where(denom > 0, denom, 1), 0.0)
+                t = np.clip(t, 0.0, 1.0)
+                dist = np.hypot(*(a + ab * t[:, None] - p).T)
+                k = int(np.argmin(dist))
+                if dist[k] < best_dist:
+                    best_idx, best_dist, best_t = int(idx[k]), float(dist[k]), float(t[k])
+            # 尚未搜尋的網格距離至少為 r 格，已找到更近者即可停止
+            if best_dist <= r * self.cell_size or r >= r_max:
+                break
+            r += 1
+        z = self.za[best_idx] + (self.zb[best_idx] - self.za[best_idx]) * best_t
+        return best_idx, best_dist, float(z)
+
+
+def cross_check(points, index: FeatureGridIndex, tolerance: float = GML_MATCH_TOLERANCE,
+                tolerance_z: float = GML_MATCH_TOLERANCE_Z) -> list:
+    """
+    將每個測量點（survey_points.SurveyPoints）比對至最近的 GML 要素，
+    回傳差異表（每點一列，status 為 STATUS_LABELS 的鍵）。
+    """
+    xs = points.values["Coordinate_X"]
+    ys = points.values["Coordinate_Y"]
+    zs = points.values["Pipe_Top_Coordinate_Z"]
+    rows = []
+    for i in range(len(points)):
+        row = {
+            "Number": points.raw["Number"][i],
+            "Type": points.raw["Type"][i],
+            "Coordinate_X": points.raw["Coordinate_X"][i],
+            "Coordinate_Y": points.raw["Coordinate_Y"][i],
+            "Pipe_Top_Coordinate_Z": points.raw["Pipe_Top_Coordinate_Z"][i],
+            "feature_id": None,
+            "feature_type": None,
+            "distance": None,
+            "dz": None,
+        }
+        if np.isnan(xs[i]) or np.isnan(ys[i]):
+            row["status"] = "invalid_coordinate"
+            rows.append(row)
+            continue
+        idx, dist, feature_z = index.nearest(xs[i], ys[i])
+        if idx is None:
+            row["status"] = "no_feature"
+            rows.append(row)
+            continue
+        row["feature_id"] = index.feature_ids[idx]
+        row["feature_type"] = index.feature_types[idx]
+        row["distance"] = round(dist, 4)
+        if not np.isnan(zs[i]) and not np.isnan(feature_z):
+            row["dz"] = round(float(zs[i]) - feature_z, 4)
+        if dist > tolerance:
+            row["status"] = "out_of_tolerance"
+        elif row["dz"] is not None and abs(row["dz"]) > tolerance_z:
+            row["status"] = "z_mismatch"
+        else:
+            row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def write_discrepancy_csv(rows: list, csv_path: str) -> None:
+    """將差異表寫成 CSV（UTF-8 BOM，可直接以 Excel 開啟）。"""
+    with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=DISCREPANCY_FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({**row, "status": STATUS_LABELS.get(row["status"], row["status"])})
+    print(f"差異表已寫入：{csv_path}")
+
+
+def render_discrepancy_pdf(rows: list, output_pdf=None, only_flagged: bool = True):
+    """
+    以 ReportLab 將差異表繪製成 A4 PDF，可直接加入 PdfAssembler 附在報表後。
+
+    :param output_pdf: 輸出路徑或檔案物件；省略時回傳 BytesIO
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph
+    from reportlab.lib.styles import ParagraphStyle
+    from photo_page_renderer import get_kaiu_font
+
+    font = get_kaiu_font()
+    buffer = output_pdf if output_pdf is not None else io.BytesIO()
+    flagged = [r for r in rows if r["status"] != "ok"] if only_flagged else rows
+    title_style = ParagraphStyle("title", fontName=font, fontSize=14, leading=20)
+    body_style = ParagraphStyle("body", fontName=font, fontSize=10, leading=14)
+
+    data = [["點號", "X", "Y", "Z", "最近要素", "距離", "高差", "結果"]]
+    for r in flagged:
+        data.append([
+            str(r["Number"]), str(r["Coordinate_X"]), str(r["Coordinate_Y"]),
+            str(r["Pipe_Top_Coordinate_Z"]), str(r["feature_id"] or ""),
+            "" if r["distance"] is None else f"{r['distance']:.3f}",
+            "" if r["dz"] is None else f"{r['dz']:.3f}",
+            STATUS_LABELS.get(r["status"], r["status"]),
+        ])
+    table = Table(data, repeatRows=1)
+    table.setStyle(TableStyle([
+        ("FONTNAME", (0, 0), (-1, -1), font),
+        ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.black),
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#BEBEBE")),
+    ]))
+    summary = (f"共比對 {len(rows)} 點，"
+               f"{sum(1 for r in rows if r['status'] == 'ok')} 點符合，{len([r for r in rows if r['status'] != 'ok'])} 點異常"
+               f"（平面容許誤差 {GML_MATCH_TOLERANCE} m，高程容許誤差 {GML_MATCH_TOLERANCE_Z} m）。")
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=1.5 * cm, rightMargin=1.5 * cm,
+                            topMargin=1.5 * cm, bottomMargin=1.5 * cm)
+    story = [Paragraph("GML 與測量點比對差異表", title_style), Paragraph(summary, body_style)]
+    if len(data) > 1:
+        story.append(table)
+    doc.build(story)
+    return buffer
+
+
+def find_gml_file(folder: str) -> str:
+    """回傳資料夾內第一個 .gml 檔案（依檔名排序）；沒有時回傳 None。"""
+    names = sorted(f for f in os.listdir(folder) if f.lower().endswith(".gml"))
+    return os.path.join(folder, names[0]) if names else None
+
+
+def check_case(excel_file_path: str, gml_path: str, survey_point_count,
+               tolerance: float = GML_MATCH_TOLERANCE, tolerance_z: float = GML_MATCH_TOLERANCE_Z) -> list:
+    """讀取案件 Excel 的管道點-實測資料，與 GML 比對後回傳差異表。"""
+    points = read_survey_points(excel_file_path, int(survey_point_count)).simulated_points
+    index = FeatureGridIndex.from_features(gml_path)
+    print(f"GML 索引共 {len(index)} 個點／線段，測量點 {len(points)} 點。")
+    rows = cross_check(points, index, tolerance, tolerance_z)
+    flagged = sum(1 for r in rows if r["status"] != "ok")
+    print(f"超出容許誤差或無法比對：{flagged} 點。")
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="比對 Excel 測量點與 GML 要素，輸出差異表")
+    parser.add_argument("excel", help="含測量點（第 5 列起 A~G 欄）的 Excel")
+    parser.add_argument("gml", help="GML 檔案")
+    parser.add_argument("--count", type=int, required=True, help="測量點數量")
+    parser.add_argument("--tolerance", type=float, default=GML_MATCH_TOLERANCE, help="平面容許誤差（公尺）")
+    parser.add_argument("--tolerance-z", type=float, default=GML_MATCH_TOLERANCE_Z, help="高程容許誤差（公尺）")
+    parser.add_argument("--csv", help="差異表 CSV 輸出路徑")
+    parser.add_argument("--pdf", help="差異表 PDF 輸出路徑")
+    args = parser.parse_args(argv)
+
+    rows = check_case(args.excel, args.gml, args.count, args.tolerance, args.tolerance_z)
+    if args.csv:
+        write_discrepancy_csv(rows, args.csv)
+    if args.pdf:
+        render_discrepancy_pdf(rows, args.pdf)
+        print(f"差異表 PDF 已寫入：{args.pdf}")
+    return 1 if any(r["status"] != "ok" for r in rows) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
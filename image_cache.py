@@ -0,0 +1,150 @@
+import os
+import io
+import time
+import hashlib
+from functools import lru_cache
+from image_inventory import cached_stat
+from config import (IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, IMAGE_CACHE_EVICT_GRACE_SECONDS, IMAGE_DPI,
+                    IMAGE_JPEG_QUALITY)
+
+# 資料夾沒有照片或張數為奇數時補位用的空白圖片；不對應任何檔案，嵌入時改用記憶體中的影像
+BLANK_IMAGE = "<blank>"
+
+# 同一行程內以 (路徑, 大小, 修改時間) 記住內容雜湊，避免重複讀檔
+_hash_memo = {}
+
+
+def file_digest(path: str) -> str:
+    """
+    回傳檔案內容的 SHA-256（同一行程內依大小與修改時間快取）。
+    案件圖片清單已掃描過的檔案直接使用當時的 stat 結果。
+    """
+    st = cached_stat(path)
+    if st is None:
+        st = os.stat(path)
+        st = (st.st_size, st.st_mtime_ns)
+    memo_key = (os.path.abspath(path), *st)
+    digest = _hash_memo.get(memo_key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        _hash_memo[memo_key] = digest
+    return digest
+
+
+def is_blank_image(img_path: str) -> bool:
+    """是否為補位用的空白圖片。"""
+    return img_path == BLANK_IMAGE
+
+
+@lru_cache(maxsize=1)
+def blank_image_bytes() -> bytes:
+    """
+    回傳全白的正方形 JPEG（每個行程只編碼一次）。
+    嵌入時依指定的寬或高縮放，版面與原本 500x500 的空白圖片相同。
+    """
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), "white").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def _target_size(size: tuple, width_cm: float, height_cm: float, dpi: int) -> tuple:
+    """依列印尺寸與 DPI 計算目標像素大小，只縮小不放大。"""
+    w, h = size
+    scale = 1.0
+    if width_cm:
+        scale = min(scale, width_cm / 2.54 * dpi / w)
+    if height_cm:
+        scale = min(scale, height_cm / 2.54 * dpi / h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def prepare_image(img_path: str, width_cm: float = None, height_cm: float = None, dpi: int = IMAGE_DPI):
+    """
+    將照片依 EXIF 方向轉正、縮至列印尺寸所需的像素並重新壓縮，
+    結果依「內容雜湊＋參數」存放於 IMAGE_CACHE_DIR，回傳可直接嵌入的檔案路徑。
+    空白圖片回傳記憶體中的 BytesIO；處理失敗時回傳原始路徑。
+    """
+    if is_blank_image(img_path):
+        return io.BytesIO(blank_image_bytes())
+    from PIL import Image, ImageOps
+
+    params = f"w={width_cm}|h={height_cm}|dpi={dpi}|q={IMAGE_JPEG_QUALITY}"
+    key = hashlib.sha256(f"{file_digest(img_path)}|{params}".encode()).hexdigest()
+    cache_subdir = os.path.join(IMAGE_CACHE_DIR, key[:2])
+    for ext in (".jpg", ".png"):
+        cached = os.path.join(cache_subdir, key + ext)
+        if os.path.exists(cached):
+            # 更新修改時間，作為淘汰時的最近使用紀錄；期間已被淘汰時重新產生
+            try:
+                os.utime(cached)
+            except OSError:
+                break
+            return cached
+
+    try:
+        with Image.open(img_path) as img:
+            img = ImageOps.exif_transpose(img)
+            img = img.resize(_target_size(img.size, width_cm, height_cm, dpi), Image.LANCZOS)
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            os.makedirs(cache_subdir, exist_ok=True)
+            cached = os.path.join(cache_subdir, key + (".png" if has_alpha else ".jpg"))
+            # 先寫入暫存檔再更名，平行執行時不會讀到寫一半的檔案
+            tmp_path = f"{cached}.{os.getpid()}.tmp"
+            if has_alpha:
+                img.save(tmp_path, format="PNG", optimize=True)
+            else:
+                img.convert("RGB").save(tmp_path, format="JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+        os.replace(tmp_path, cached)
+    except Exception as e:
+        print(f"圖片前置處理失敗 {img_path}，改用原始檔案：{e}")
+        return img_path
+    return cached
+
+
+def evict_cache(max_bytes: int = IMAGE_CACHE_MAX_BYTES, grace_seconds: float = IMAGE_CACHE_EVICT_GRACE_SECONDS) -> None:
+    """
+    快取總大小超過 max_bytes 時，依最近使用時間由舊到新刪除檔案。
+    寫入中的暫存檔與 grace_seconds 內剛使用過的檔案不會被刪除；
+    掃描期間被其他行程刪除或更名的檔案直接略過。
+    """
+    if not os.path.isdir(IMAGE_CACHE_DIR):
+        return
+    entries = []
+    total = 0
+    recent = time.time() - grace_seconds
+    for sub in os.scandir(IMAGE_CACHE_DIR):
+        if not sub.is_dir():
+            continue
+        try:
+            children = list(os.scandir(sub.path))
+        except OSError:
+            continue
+        for entry in children:
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            total += st.st_size
+            if st.st_mtime < recent:
+                entries.append((st.st_mtime, st.st_size, entry.path))
+    if total <= max_bytes:
+        return
+    entries.sort()
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            removed += 1
+        except OSError:
+            pass
+    print(f"圖片快取已淘汰 {removed} 個檔案，目前約 {total / 1024 ** 2:.1f} MB。")
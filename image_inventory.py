@@ -0,0 +1,117 @@
+import os
+import re
+from collections import OrderedDict
+from config import VALID_EXTENSIONS, IMAGE_INVENTORY_MAX_CASES
+
+_DIGITS = re.compile(r"(\d+)")
+_VALID = {ext.lower() for ext in VALID_EXTENSIONS}
+
+
+def natural_key(name: str) -> tuple:
+    """自然排序鍵：'img10.jpg' 排在 'img9.jpg' 之後；不分大小寫。"""
+    return tuple((0, int(part), "") if part.isdigit() else (1, 0, part.lower())
+                 for part in _DIGITS.split(name) if part)
+
+
+def number_key(name: str) -> tuple:
+    """依檔名中第一組數字排序；沒有數字的檔名排在最後，再依自然排序。"""
+    match = _DIGITS.search(name)
+    return (0 if match else 1, int(match.group()) if match else 0, natural_key(name))
+
+
+class ImageEntry:
+    """一個圖片檔的路徑、大小、修改時間與預先計算的排序鍵。"""
+
+    __slots__ = ("path", "name", "size", "mtime_ns", "natural_key", "number_key")
+
+    def __init__(self, entry: os.DirEntry):
+        st = entry.stat()
+        self.path = entry.path
+        self.name = entry.name
+        self.size = st.st_size
+        self.mtime_ns = st.st_mtime_ns
+        self.natural_key = natural_key(entry.name)
+        self.number_key = number_key(entry.name)
+
+
+class CaseInventory:
+    """
+    以 os.scandir 一次掃描案件資料夾及其第一層子資料夾，依副檔名（config.VALID_EXTENSIONS）
+    分類圖片並保存 stat 結果；之後各階段查詢此清單，不再逐一讀取資料夾。
+    """
+
+    def __init__(self, case_folder: str):
+        self.case_folder = os.path.abspath(case_folder)
+        self.folders = {}
+        self.stats = {}
+        self._folder_mtimes = {}
+        self.scan()
+
+    def scan(self) -> None:
+        folders = {}
+        mtimes = {}
+        try:
+            with os.scandir(self.case_folder) as it:
+                subdirs = [e for e in it if e.is_dir()]
+        except FileNotFoundError:
+            subdirs = []
+        for subdir in subdirs:
+            mtimes[subdir.name] = subdir.stat().st_mtime_ns
+            with os.scandir(subdir.path) as it:
+                folders[subdir.name] = [
+                    ImageEntry(e) for e in it
+                    if e.is_file() and os.path.splitext(e.name)[1].lower() in _VALID
+                ]
+        self.folders = folders
+        # {絕對路徑: (大小, 修改時間)}；重新掃描時整份替換，已刪除的檔案不會殘留
+        self.stats = {e.path: (e.size, e.mtime_ns) for entries in folders.values() for e in entries}
+        self._folder_mtimes = mtimes
+
+    def is_stale(self) -> bool:
+        """子資料夾新增、刪除或內容變動（資料夾修改時間改變）時回傳 True。"""
+        try:
+            with os.scandir(self.case_folder) as it:
+                current = {e.name: e.stat().st_mtime_ns for e in it if e.is_dir()}
+        except FileNotFoundError:
+            current = {}
+        return current != self._folder_mtimes
+
+    def has_folder(self, folder_name: str) -> bool:
+        return folder_name in self.folders
+
+    def images(self, folder_name: str, order: str = "natural") -> list:
+        """
+        回傳子資料夾內的圖片路徑。order 為 "natural"（自然排序）或 "number"（依檔名第一組數字）。
+        資料夾不存在時回傳空列表。
+        """
+        entries = self.folders.get(folder_name, [])
+        key = (lambda e: e.number_key) if order == "number" else (lambda e: e.natural_key)
+        return [e.path for e in sorted(entries, key=key)]
+
+
+# 同一行程內共用的圖片清單：{案件資料夾絕對路徑: CaseInventory}，依最近使用順序排列
+_inventories = OrderedDict()
+
+
+def cached_stat(path: str) -> tuple:
+    """回傳掃描時保存的 (大小, 修改時間)；未掃描過（或案件已被淘汰）的檔案回傳 None。"""
+    path = os.path.abspath(path)
+    inventory = _inventories.get(os.path.dirname(os.path.dirname(path)))
+    return inventory.stats.get(path) if inventory is not None else None
+
+
+def get_inventory(case_folder: str, refresh: bool = False) -> CaseInventory:
+    """
+    取得案件資料夾的圖片清單（同一行程內共用）；資料夾內容有變動或 refresh 為 True 時重新掃描。
+    """
+    key = os.path.abspath(case_folder)
+    inventory = _inventories.get(key)
+    if inventory is None:
+        inventory = _inventories[key] = CaseInventory(key)
+        while len(_inventories) > IMAGE_INVENTORY_MAX_CASES:
+            _inventories.popitem(last=False)
+    else:
+        _inventories.move_to_end(key)
+        if refresh or inventory.is_stale():
+            inventory.scan()
+    return inventory
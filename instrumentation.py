@@ -0,0 +1,220 @@
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import datetime
+from contextlib import contextmanager
+from config import REPORT_DIR, PROFILE_STAGE
+
+
+def _io_counters() -> tuple:
+    """回傳本行程累計讀取、寫入的位元組數；無法取得時回傳 (None, None)。"""
+    try:
+        import psutil
+        counters = psutil.Process().io_counters()
+        return counters.read_bytes, counters.write_bytes
+    except Exception:
+        pass
+    try:
+        values = {}
+        with open("/proc/self/io") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                values[key] = int(value)
+        return values["read_bytes"], values["write_bytes"]
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def _cpu_seconds() -> float:
+    """本行程加上已結束子行程（工作行程、轉檔程式）的 CPU 時間。"""
+    try:
+        import resource
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return (self_usage.ru_utime + self_usage.ru_stime
+                + child_usage.ru_utime + child_usage.ru_stime)
+    except ImportError:
+        return time.process_time()
+
+
+def _peak_rss_mb() -> float:
+    """本行程至今的最大常駐記憶體（MB）。"""
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux 以 KB 為單位，macOS 以 bytes 為單位
+        return round(rss / 1024 / (1024 if sys.platform == "darwin" else 1), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return round(psutil.Process().memory_info().peak_wset / 1024 ** 2, 1)
+    except Exception:
+        return None
+
+
+def _delta(end, start):
+    return end - start if end is not None and start is not None else None
+
+
+class RunRecorder:
+    """
+    記錄單一案件各階段的牆鐘時間、CPU 時間、讀寫位元組、頁數與最大常駐記憶體，
+    並可對指定階段啟用 cProfile。
+
+    用法：
+        with recorder.stage("plans") as info:
+            ...
+            info["pages"] = 3
+
+    on_stage(階段名稱, "running"／"done"／"failed") 於每個階段開始與結束時呼叫（例如工作佇列記錄進度）。
+    """
+
+    def __init__(self, case_id: str = None, profile_stage: str = None, report_dir: str = REPORT_DIR,
+                 on_stage=None):
+        self.case_id = case_id
+        self.on_stage = on_stage
+        self.report_dir = report_dir
+        self.profile_stage = profile_stage or PROFILE_STAGE or os.environ.get("REPORT_PROFILE_STAGE")
+        self.started_at = datetime.datetime.now()
+        self.stages = []
+        self.status = "running"
+        self.error = None
+
+    @contextmanager
+    def stage(self, name: str):
+        info = {"pages": None}
+        profiler = cProfile.Profile() if name == self.profile_stage else None
+        read_start, write_start = _io_counters()
+        cpu_start = _cpu_seconds()
+        wall_start = time.perf_counter()
+        if self.on_stage:
+            self.on_stage(name, "running")
+        if profiler:
+            profiler.enable()
+        ok = False
+        try:
+            yield info
+            ok = True
+        finally:
+            if profiler:
+                profiler.disable()
+            wall = time.perf_counter() - wall_start
+            read_end, write_end = _io_counters()
+            entry = {
+                "stage": name,
+                "ok": ok,
+                "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(_cpu_seconds() - cpu_start, 4),
+                "bytes_read": _delta(read_end, read_start),
+                "bytes_written": _delta(write_end, write_start),
+                "pages": info.get("pages"),
+                "peak_rss_mb": _peak_rss_mb(),
+            }
+            self.stages.append(entry)
+            print(f"[{name}] {entry['wall_seconds']:.2f}s（CPU {entry['cpu_seconds']:.2f}s）")
+            if profiler:
+                self._dump_profile(name, profiler)
+            if self.on_stage:
+                self.on_stage(name, "done" if ok else "failed")
+
+    def record_substage(self, parent: str, name: str, wall_seconds: float, cpu_seconds: float = None,
+                        units: int = None) -> None:
+        """
+        記錄在其他地方量測的子階段（例如非同步管線中的建置、轉檔與組合）。
+        子階段彼此重疊且已包含在 parent 階段內，因此不計入整體時間與頁數。
+        """
+        entry = {
+            "stage": f"{parent}.{name}",
+            "parent": parent,
+            "ok": True,
+            "wall_seconds": round(wall_seconds, 4),
+            "cpu_seconds": None if cpu_seconds is None else round(cpu_seconds, 4),
+            "bytes_read": None,
+            "bytes_written": None,
+            "pages": None,
+            "units": units,
+            "peak_rss_mb": None,
+        }
+        self.stages.append(entry)
+        print(f"[{entry['stage']}] {entry['wall_seconds']:.2f}s（{units} 個單位）")
+
+    def _dump_profile(self, name: str, profiler: cProfile.Profile) -> None:
+        os.makedirs(self.report_dir, exist_ok=True)
+        prof_path = os.path.join(self.report_dir, f"{self.case_id or 'run'}_{name}.prof")
+        profiler.dump_stats(prof_path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(20)
+        print(out.getvalue())
+        print(f"已輸出 cProfile 結果：{prof_path}")
+
+    def finish(self, status: str = "success", error: str = None) -> None:
+        self.status = status
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {
+            "case_id": None if self.case_id is None else str(self.case_id),
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "status": self.status,
+            "error": self.error,
+            "total_wall_seconds": round(sum(s["wall_seconds"] for s in self.stages if not s.get("parent")), 4),
+            "pages": sum(s["pages"] or 0 for s in self.stages if not s.get("parent")),
+            "peak_rss_mb": max((s["peak_rss_mb"] or 0 for s in self.stages), default=None),
+            "stages": self.stages,
+        }
+
+    def write_jsonl(self, path: str = None) -> str:
+        """
+        將報告寫成 JSONL：每個階段一行，最後一行為整體摘要（type 為 "summary"）。
+        """
+        if path is None:
+            timestamp = self.started_at.strftime("%Y%m%d_%H%M%S")
+            path = os.path.join(self.report_dir, f"{self.case_id or 'run'}_{timestamp}.jsonl")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        report = self.to_dict()
+        with open(path, "w", encoding="utf-8") as f:
+            for entry in self.stages:
+                f.write(json.dumps({"type": "stage", "case_id": report["case_id"], **entry}, ensure_ascii=False) + "\n")
+            summary = {k: v for k, v in report.items() if k != "stages"}
+            f.write(json.dumps({"type": "summary", **summary}, ensure_ascii=False) + "\n")
+        print(f"執行報告已寫入：{path}")
+        return path
+
+
+def aggregate_reports(reports: list) -> dict:
+    """彙總多個案件報告（RunRecorder.to_dict 的結果），依階段統計總和與最大值。"""
+    stages = {}
+    for report in reports:
+        for entry in report.get("stages", []):
+            agg = stages.setdefault(entry["stage"], {
+                "count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0,
+                "bytes_read": 0, "bytes_written": 0, "pages": 0,
+                "max_wall_seconds": 0.0, "peak_rss_mb": 0.0,
+            })
+            agg["count"] += 1
+            agg["wall_seconds"] += entry["wall_seconds"]
+            agg["cpu_seconds"] += entry["cpu_seconds"] or 0
+            agg["bytes_read"] += entry["bytes_read"] or 0
+            agg["bytes_written"] += entry["bytes_written"] or 0
+            agg["pages"] += entry["pages"] or 0
+            agg["max_wall_seconds"] = max(agg["max_wall_seconds"], entry["wall_seconds"])
+            agg["peak_rss_mb"] = max(agg["peak_rss_mb"], entry["peak_rss_mb"] or 0)
+    for agg in stages.values():
+        agg["wall_seconds"] = round(agg["wall_seconds"], 4)
+        agg["cpu_seconds"] = round(agg["cpu_seconds"], 4)
+        agg["mean_wall_seconds"] = round(agg["wall_seconds"] / agg["count"], 4)
+    total_wall = sum(r.get("total_wall_seconds", 0) for r in reports)
+    total_pages = sum(r.get("pages", 0) for r in reports)
+    return {
+        "cases": len(reports),
+        "succeeded": sum(1 for r in reports if r.get("status") == "success"),
+        "total_wall_seconds": round(total_wall, 4),
+        "pages": total_pages,
+        "pages_per_second": round(total_pages / total_wall, 2) if total_wall > 0 else None,
+        "stages": stages,
+    }
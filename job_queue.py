@@ -0,0 +1,287 @@
+import os
+import time
+import socket
+import sqlite3
+import argparse
+from config import JOB_DB_PATH, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_SECONDS, JOB_LEASE_SECONDS, BUILD_CACHE_DIR
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_folder TEXT NOT NULL UNIQUE,
+    supervisor_image TEXT,
+    district_image TEXT,
+    status TEXT NOT NULL,
+    stage TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_run_at REAL NOT NULL,
+    lease_until REAL,
+    worker TEXT,
+    output_pdf TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_stages (
+    job_id INTEGER NOT NULL REFERENCES jobs(id),
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempt INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, stage)
+);
+"""
+
+
+# 重試也不會改變結果的錯誤（Excel 欄位、簽名、圖片損毀等預檢問題），發生時直接標記為 failed
+PERMANENT_ERRORS = {"PreflightError"}
+
+
+class JobQueue:
+    """
+    以 SQLite 保存的案件工作佇列，記錄每個案件目前的階段、嘗試次數與錯誤。
+
+    工作狀態：queued（等待中）→ running → done；失敗時依 JOB_RETRY_BASE_SECONDS 加倍延後重試，
+    超過 max_attempts 次或為 PERMANENT_ERRORS 中的錯誤則為 failed。執行中的工作以租約（lease_until）標記，
+    工作行程當掉後租約過期，其他工作行程會接手。已完成的首頁、平面圖組與照片頁
+    由建置清單（BuildManifest）逐一保存，並於 job_stages 記為 page:<單元>（例如 page:photo_3），
+    接手或重試時只重建尚未完成的部分。
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH, max_attempts: int = JOB_MAX_ATTEMPTS,
+                 retry_base_seconds: float = JOB_RETRY_BASE_SECONDS, lease_seconds: float = JOB_LEASE_SECONDS):
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self.db = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_SCHEMA)
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    def close(self) -> None:
+        self.db.close()
+
+    def add(self, case_folder: str, supervisor_image: str = None, district_image: str = None) -> int:
+        """
+        加入一個案件並回傳工作編號。已在等待或執行中的案件不重複加入；
+        已完成或已放棄的案件重新排入佇列。
+        """
+        case_folder = os.path.abspath(case_folder)
+        now = time.time()
+        row = self.db.execute("SELECT id, status FROM jobs WHERE case_folder = ?", (case_folder,)).fetchone()
+        if row is None:
+            cur = self.db.execute(
+                "INSERT INTO jobs (case_folder, supervisor_image, district_image, status, next_run_at, "
+                "created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (case_folder, supervisor_image, district_image, now, now, now),
+            )
+            return cur.lastrowid
+        if row["status"] in ("done", "failed"):
+            self.db.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, next_run_at = ?, error = NULL, stage = NULL, "
+                "supervisor_image = ?, district_image = ?, updated_at = ? WHERE id = ?",
+                (now, supervisor_image, district_image, now, row["id"]),
+            )
+            self.db.execute("DELETE FROM job_stages WHERE job_id = ?", (row["id"],))
+        return row["id"]
+
+    def claim(self) -> sqlite3.Row:
+        """
+        取出下一個可執行的工作（含租約過期的執行中工作）並標記為執行中；沒有時回傳 None。
+        租約過期的工作若已達嘗試次數上限（例如每次都讓工作行程當掉的案件），直接標記為 failed，不再接手。
+        """
+        now = time.time()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            while True:
+                row = self.db.execute(
+                    "SELECT * FROM jobs WHERE (status = 'queued' AND next_run_at <= ?) "
+                    "OR (status = 'running' AND lease_until < ?) ORDER BY next_run_at, id LIMIT 1",
+                    (now, now),
+                ).fetchone()
+                if row is None or row["status"] != "running" or row["attempts"] < self.max_attempts:
+                    break
+                print(f"工作 {row['id']} 的執行者 {row['worker']} 已無回應，且已嘗試 {row['attempts']} 次，標記為失敗。")
+                self.db.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                    (f"執行者 {row['worker']} 無回應（階段：{row['stage']}），已達嘗試次數上限", now, row["id"]),
+                )
+            if row is not None:
+                if row["status"] == "running":
+                    print(f"工作 {row['id']} 的執行者 {row['worker']} 已無回應，接手繼續（階段：{row['stage']}）。")
+                self.db.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, worker = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (now + self.lease_seconds, self.worker_id, now, row["id"]),
+                )
+                row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return row
+
+    def _update_own(self, job: sqlite3.Row, assignments: str, params: tuple) -> bool:
+        """
+        只在工作仍由本工作行程持有時更新；租約過期後已被其他工作行程接手時不覆寫其狀態，回傳 False。
+        """
+        cur = self.db.execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ? AND status = 'running'",
+                              (*params, job["id"], self.worker_id))
+        if cur.rowcount == 0:
+            print(f"工作 {job['id']} 已不由本工作行程（{self.worker_id}）持有，略過狀態更新。")
+            return False
+        return True
+
+    def record_stage(self, job: sqlite3.Row, stage: str, status: str) -> None:
+        """記錄階段進度，並延長執行中工作的租約。"""
+        now = time.time()
+        if not self._update_own(job, "stage = ?, lease_until = ?, updated_at = ?",
+                                (stage, now + self.lease_seconds, now)):
+            return
+        self.db.execute(
+            "INSERT INTO job_stages (job_id, stage, status, attempt, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (job_id, stage) DO UPDATE SET status = excluded.status, attempt = excluded.attempt, "
+            "updated_at = excluded.updated_at",
+            (job["id"], stage, status, job["attempts"], now),
+        )
+
+    def complete(self, job: sqlite3.Row, output_pdf: str) -> bool:
+        """標記為完成；工作已被其他工作行程接手時回傳 False。"""
+        return self._update_own(job, "status = 'done', output_pdf = ?, error = NULL, lease_until = NULL, "
+                                     "updated_at = ?", (output_pdf, time.time()))
+
+    def fail(self, job: sqlite3.Row, error: str, permanent: bool = False) -> str:
+        """
+        記錄失敗；尚未超過嘗試次數時延後重試（間隔每次加倍），回傳新的狀態。
+        permanent 為 True（重試也不會成功的錯誤）時直接標記為 failed。
+        工作已被其他工作行程接手時不更新，回傳 None。
+        """
+        now = time.time()
+        if permanent or job["attempts"] >= self.max_attempts:
+            status, next_run_at = "failed", now
+        else:
+            status = "queued"
+            next_run_at = now + self.retry_base_seconds * 2 ** (job["attempts"] - 1)
+        if not self._update_own(job, "status = ?, next_run_at = ?, error = ?, lease_until = NULL, updated_at = ?",
+                                (status, next_run_at, error, now)):
+            return None
+        return status
+
+    def release(self, job: sqlite3.Row) -> None:
+        """中斷執行（例如 Ctrl+C）時放回佇列，不計入嘗試次數。"""
+        self._update_own(job, "status = 'queued', attempts = attempts - 1, next_run_at = ?, lease_until = NULL, "
+                              "updated_at = ?", (time.time(), time.time()))
+
+    def jobs(self) -> list:
+        return self.db.execute("SELECT * FROM jobs ORDER BY id").fetchall()
+
+    def stages(self, job_id: int) -> list:
+        return self.db.execute("SELECT * FROM job_stages WHERE job_id = ? ORDER BY updated_at",
+                               (job_id,)).fetchall()
+
+
+def checkpointed_units(case_number) -> list:
+    """回傳建置清單中已保存 PDF 的單元（cover、plan_1、photo_3…），供查看可接續的進度。"""
+    import json
+    manifest_path = os.path.join(BUILD_CACHE_DIR, str(case_number), "manifest.json")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return sorted(json.load(f).get("units", {}))
+    except (OSError, ValueError):
+        return []
+
+
+def run_worker(queue: JobQueue, workers: int = None, poll_seconds: float = 5, once: bool = False) -> None:
+    """
+    持續從佇列取出工作並以批次模式執行；once 為 True 時佇列中沒有可執行的工作即結束。
+    """
+    from batch import run_batch_case
+    from converter import get_converter
+    from instrumentation import RunRecorder
+
+    get_converter()
+    while True:
+        job = queue.claim()
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_seconds)
+            continue
+        print(f"========== 工作 {job['id']}（第 {job['attempts']} 次）：{job['case_folder']} ==========")
+        recorder = RunRecorder(on_stage=lambda stage, status, job=job: queue.record_stage(job, stage, status))
+        case = {
+            "case_folder": job["case_folder"],
+            "supervisor_image": job["supervisor_image"],
+            "district_image": job["district_image"],
+        }
+        try:
+            result = run_batch_case(case, workers, recorder)
+        except BaseException:
+            queue.release(job)
+            raise
+        if result["status"] == "success":
+            queue.complete(job, result["output_pdf"])
+        else:
+            status = queue.fail(job, result["error"], result.get("error_type") in PERMANENT_ERRORS)
+            if status is None:
+                continue
+            units = checkpointed_units(recorder.case_id)
+            if status == "queued":
+                print(f"工作 {job['id']} 失敗，已保存 {len(units)} 個單元，重試時沿用：{result['error']}")
+            else:
+                print(f"工作 {job['id']} 失敗，不再重試：{result['error']}")
+
+
+def print_status(queue: JobQueue) -> None:
+    for job in queue.jobs():
+        line = f"#{job['id']:<4} {job['status']:<8} 第 {job['attempts']} 次  階段：{job['stage'] or '-'}  {job['case_folder']}"
+        if job["status"] == "queued" and job["next_run_at"] > time.time():
+            line += f"（{job['next_run_at'] - time.time():.0f} 秒後重試）"
+        if job["error"]:
+            line += f"\n      錯誤：{job['error']}"
+        print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="自主查核表工作佇列（SQLite），中斷後可接續執行")
+    parser.add_argument("--db", default=JOB_DB_PATH, help=f"佇列資料庫路徑（預設 {JOB_DB_PATH}）")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="加入案件資料夾")
+    add_parser.add_argument("case_folders", nargs="+")
+    add_parser.add_argument("--supervisor-image", help="監工簽名圖片（未指定時依監工名稱取用已登錄的簽名）")
+    add_parser.add_argument("--district-image", help="營業處簽名圖片（未指定時依區處取用已登錄的簽名）")
+    worker_parser = commands.add_parser("worker", help="執行佇列中的工作")
+    worker_parser.add_argument("--workers", type=int, default=None, help="案件內平面圖組與照片頁的工作行程數")
+    worker_parser.add_argument("--once", action="store_true", help="佇列中沒有可執行的工作時結束")
+    commands.add_parser("status", help="列出所有工作")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    queue = JobQueue(args.db)
+    try:
+        if args.command == "add":
+            def absolute(path):
+                return os.path.abspath(path) if path else None
+            for case_folder in args.case_folders:
+                job_id = queue.add(case_folder, absolute(args.supervisor_image), absolute(args.district_image))
+                print(f"已加入工作 {job_id}：{case_folder}")
+        elif args.command == "worker":
+            try:
+                run_worker(queue, args.workers, once=args.once)
+            except KeyboardInterrupt:
+                print("工作行程已停止，未完成的工作已放回佇列。")
+        else:
+            print_status(queue)
+    finally:
+        queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
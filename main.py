@@ -1,84 +1,321 @@
+import io
 import os
-from docx2pdf import convert as docx2pdf_convert
-from PyPDF2 import PdfMerger
+from typing import TYPE_CHECKING
 
-from excel_processor import select_folder_and_excel, process_excel_pandas, create_output_folder
-from doc_generator import generate_records_doc
-from doc_image_processor import process_documents, merge_pdfs_from_list, insert_images_into_9x3_template_left_to_right
-from utils import cleanup_temp_files, overlay_images_to_pdf, process_folder, process_sorted_folder
-from config import TEMPLATE_TABLE
+# pandas、python-docx、ReportLab、PyPDF2 等較重的套件於實際用到的函式內才載入，
+# 啟動（例如先開啟資料夾選取視窗，或 daemon 的 submit 指令）時不必等待
+from build_manifest import BuildManifest
+from image_cache import evict_cache
+from image_inventory import get_inventory
+from instrumentation import RunRecorder
+from scheduler import run_parallel
+from scratch import ScratchWorkspace
+from config import (TEMPLATE_MAIN, TEMPLATE_TABLE, PHOTO_PAGE_RENDERER, ATTACH_GML_DISCREPANCY, AUTO_PLAN_IMAGES,
+                    ASYNC_PIPELINE)
 
-def main():
-    # 1. 選取 Excel 檔案所在資料夾與檔案
-    excel_file_path = select_folder_and_excel()
+if TYPE_CHECKING:
+    from pdf_assembler import PdfAssembler
 
-    # 2. 讀取 Excel 資料
-    df_renamed = process_excel_pandas(excel_file_path)
-    if df_renamed.empty:
-        print("Excel 資料讀取失敗，程式結束。")
-        exit()
-    context_number = df_renamed["case_number"].iloc[0]
+
+def run_case(excel_file_path: str, supervisor_image: str = None, district_image: str = None,
+             workers: int = None, recorder: RunRecorder = None, interactive: bool = True,
+             evict: bool = True) -> str:
+    """
+    針對單一案件執行完整流程（首頁、平面圖、各類照片、合併與清理）。
+
+    :param excel_file_path: 案件 Excel 檔案路徑，其所在資料夾即為案件資料夾
+    :param supervisor_image: 監工簽名圖片路徑；未指定時依 Excel 的監工名稱查詢已登錄的簽名
+    :param district_image: 營業處簽名圖片路徑；未指定時依 Excel 的區處查詢已登錄的簽名
+    :param workers: 平面圖組與照片頁的工作行程數，預設使用 config.MAX_WORKERS
+    :param recorder: 各階段量測紀錄；未指定時自行建立，並於結束時寫出執行報告
+    :param interactive: 找不到已登錄的簽名時是否以 GUI 選取；False 時拋出 ValueError
+    :param evict: 結束時是否整理圖片快取；多個案件平行執行時應為 False，改由呼叫端在全部完成後整理一次
+    :return: 最終 PDF 檔案路徑；找不到任何圖片時回傳 None
+    """
+    from excel_processor import process_excel_pandas
+
+    def stages(rec):
+        # 2. 讀取 Excel 資料
+        with rec.stage("excel_load"):
+            df_renamed = process_excel_pandas(excel_file_path)
+            if df_renamed.empty:
+                raise ValueError(f"Excel 資料讀取失敗：{excel_file_path}")
+            record = df_renamed.to_dict(orient="records")[0]
+        return _run_record_stages(record, os.path.dirname(excel_file_path),
+                                  supervisor_image, district_image, workers, rec, excel_file_path, interactive,
+                                  evict)
+
+    return _run_with_recorder(stages, recorder)
+
+
+def run_case_record(record: dict, case_folder: str = None, supervisor_image: str = None,
+                    district_image: str = None, workers: int = None, recorder: RunRecorder = None,
+                    interactive: bool = True, evict: bool = True) -> str:
+    """
+    以已解析的案件資料（例如 load_case_records 由總表產生的一列）執行完整流程，不再讀取案件基本資料；
+    GML 比對與自動繪製平面圖所需的測量點座標仍由案件資料夾內的 Excel 讀取。
+
+    :param record: 前置處理後的案件資料
+    :param case_folder: 案件圖片資料夾，預設使用 record["case_folder"]
+    :return: 最終 PDF 檔案路徑；找不到任何圖片時回傳 None
+    """
+    from excel_processor import find_excel_file
+
+    case_folder = case_folder or record["case_folder"]
+    record = {k: v for k, v in record.items() if k != "case_folder"}
+    # 測量點座標仍在案件資料夾自己的 Excel 中，GML 比對與自動繪製平面圖需要用到
+    try:
+        survey_excel = find_excel_file(case_folder)
+    except (OSError, ValueError) as e:
+        survey_excel = None
+        print(f"案件資料夾無法取得測量點 Excel（{e}），略過 GML 比對與自動繪製平面圖：{case_folder}")
+    return _run_with_recorder(
+        lambda rec: _run_record_stages(record, case_folder, supervisor_image, district_image, workers, rec,
+                                       survey_excel, interactive, evict),
+        recorder,
+    )
+
+
+def _run_with_recorder(stages, recorder: RunRecorder = None) -> str:
+    """執行 stages(recorder) 並記錄結果；未傳入 recorder 時自行建立並寫出執行報告。"""
+    own_recorder = recorder is None
+    if own_recorder:
+        recorder = RunRecorder()
+    try:
+        final_pdf_path = stages(recorder)
+    except Exception as e:
+        recorder.finish("failed", f"{type(e).__name__}: {e}")
+        raise
+    else:
+        recorder.finish("success" if final_pdf_path else "no_images")
+    finally:
+        if own_recorder:
+            recorder.write_jsonl()
+    return final_pdf_path
+
+
+def _run_record_stages(record: dict, case_folder: str, supervisor_image: str, district_image: str,
+                       workers: int, recorder: RunRecorder, survey_excel: str = None,
+                       interactive: bool = True, evict: bool = True) -> str:
+    from excel_processor import create_output_folder
+    from pdf_assembler import PdfAssembler
+    from signature_stamps import resolve_signatures
+
+    context_number = record["case_number"]
+    recorder.case_id = str(context_number)
+
+    # 每次執行先重新掃描一次案件資料夾，之後各階段查詢同一份圖片清單
+    get_inventory(case_folder, refresh=True)
 
     # 3. 建立輸出資料夾
     output_folder = create_output_folder(context_number)
 
-    # 4. 產生首頁文件與疊加圖片
-    records_pdf = generate_records_doc(df_renamed.to_dict(orient="records")[0], output_folder)
-    overlay_images_to_pdf(
-        os.path.join(output_folder, "temp_自主查核表首頁.pdf"),
-        os.path.join(output_folder, f"temp_{context_number}_自主查核表首頁.pdf")
-    )
+    # 最終 PDF 依首頁、平面圖、照片的順序組合，各階段完成後直接加入
+    assembler = PdfAssembler(["cover", "plans", "photos", "validation"])
+    # 依輸入雜湊判斷哪些頁面需要重建；每存入一頁即回報進度（例如工作佇列的 job_stages）
+    on_store = (lambda unit: recorder.on_stage(f"page:{unit}", "done")) if recorder.on_stage else None
+    manifest = BuildManifest(context_number, on_store=on_store)
 
-    # 5. 處理平面圖文件並合併 PDF
-    main_folder = os.path.dirname(excel_file_path)
-    process_documents(main_folder, TEMPLATE_TABLE, output_folder, context_number)
+    # 依監工名稱與區處取用已登錄的簽名章
+    supervisor_image, district_image = resolve_signatures(record, supervisor_image, district_image, interactive)
 
-    # 6. 處理各類照片
-    base_folder = os.path.dirname(excel_file_path)
-    images = []
-    images.extend(process_folder(base_folder, "埋深照", "埋深照", "0"))
-    images.extend(process_folder(base_folder, "銑鋪照", "銑鋪照", "1"))
-    images.extend(process_sorted_folder(base_folder, "測量照", "測量照"))
-    images.extend(process_sorted_folder(base_folder, "讀數照", "讀數照"))
+    # 中間檔案（docx、轉檔 PDF、自動繪製的平面圖）只寫入本次執行專用的暫存工作區
+    with ScratchWorkspace() as scratch:
+        final_pdf_path = _run_page_stages(record, case_folder, output_folder, scratch.path, assembler, manifest,
+                                          supervisor_image, district_image, workers, recorder, survey_excel)
 
-    if not images:
+    # 10. 整理圖片快取（暫存工作區已於離開時刪除）
+    if evict:
+        with recorder.stage("cleanup"):
+            evict_cache()
+
+    return final_pdf_path
+
+
+def _run_page_stages(record: dict, case_folder: str, output_folder: str, work_folder: str,
+                     assembler: "PdfAssembler", manifest: BuildManifest, supervisor_image: str, district_image: str,
+                     workers: int, recorder: RunRecorder, survey_excel: str = None) -> str:
+    """
+    產生各頁並寫出最終 PDF；中間檔案寫入 work_folder，output_folder 只放最終 PDF 與 GML 比對差異表。
+    找不到任何圖片時回傳 None。
+    """
+    from doc_image_processor import get_image_files
+    from gml_validation import find_gml_file, check_case, write_discrepancy_csv, render_discrepancy_pdf
+    from gml_file_extract import extract_segments
+    from survey_points import read_survey_points
+    from plan_renderer import render_plan_images, plan_font_path
+    from pipeline import run_page_pipeline
+
+    context_number = record["case_number"]
+
+    # 測量點座標需要管線點位數；空白或無法解析時略過自動繪製平面圖與 GML 比對，其餘頁面照常產生
+    point_count = _survey_point_count(record)
+    if survey_excel and point_count is None:
+        print(f"管線點位「{record.get('pipeline_point_count')}」不是有效的點數，略過自動繪製平面圖與 GML 比對。")
+        survey_excel = None
+
+    # 平面圖資料夾沒有圖片時改由測量點座標繪製
+    plan_images = None
+    gml_path = find_gml_file(case_folder) if survey_excel else None
+    if AUTO_PLAN_IMAGES and survey_excel and not get_image_files(os.path.join(case_folder, "平面圖")):
+        if plan_font_path() is None:
+            print("找不到可顯示中文的字型檔（標楷體或 config.CJK_FALLBACK_FONT_PATHS），略過自動繪製平面圖。")
+        else:
+            with recorder.stage("plan_render") as info:
+                points = read_survey_points(survey_excel, point_count).simulated_points
+                segments = extract_segments(gml_path) if gml_path else None
+                plan_images = render_plan_images(points, work_folder, segments)
+                info["pages"] = len(plan_images)
+
+    if ASYNC_PIPELINE:
+        # 4-8. 首頁、平面圖與照片頁以非同步管線重疊產生
+        with recorder.stage("pipeline") as info:
+            pages_before = assembler.page_count
+            photo_count = run_page_pipeline(record, case_folder, work_folder, assembler, manifest,
+                                            supervisor_image, district_image, plan_images, workers, recorder)
+            info["pages"] = assembler.page_count - pages_before
+    else:
+        photo_count = _run_serial_page_stages(record, case_folder, work_folder, assembler, manifest,
+                                              supervisor_image, district_image, plan_images, workers, recorder)
+    if not photo_count:
         print("找不到任何圖片，程式結束。")
-        return
+        return None
 
-    template_path = os.path.join("template", "自主查核表_表格模板.docx")
-    output_prefix = os.path.join(output_folder, str(context_number))
-    word_files = insert_images_into_9x3_template_left_to_right(template_path, images, output_prefix)
-
-    # 7. 轉換所有 Word 檔為 PDF
-    pdf_files = []
-    for word_file in word_files:
-        pdf_file = word_file.replace(".docx", ".pdf")
-        docx2pdf_convert(word_file, pdf_file)
-        print(f"已轉換為 PDF：{pdf_file}")
-        pdf_files.append(pdf_file)
-
-    # 8. 合併其他照片 PDF
-    merger = PdfMerger()
-    for pdf in pdf_files:
-        merger.append(pdf)
-    merged_pdf_path = os.path.join(output_folder, f"temp_{context_number}_其他照片.pdf")
-    merger.write(merged_pdf_path)
-    merger.close()
-    print(f"已合併 PDF：{merged_pdf_path}")
-
-    # 9. 合併最終 PDF
-    merge_pdfs_from_list(
-        [
-            os.path.join(output_folder, f"temp_{context_number}_自主查核表首頁.pdf"),
-            os.path.join(output_folder, f"{context_number}_竣工平面圖.pdf"),
-            os.path.join(output_folder, f"temp_{context_number}_其他照片.pdf"),
-        ],
-        os.path.join(output_folder, f"{context_number}_自主查核表.pdf")
-    )
+    # 8.5 案件資料夾內有 GML 時，比對測量點並附上差異表
+    if gml_path:
+        with recorder.stage("gml_check") as info:
+            rows = check_case(survey_excel, gml_path, point_count)
+            write_discrepancy_csv(rows, os.path.join(output_folder, f"{context_number}_GML比對差異表.csv"))
+            if ATTACH_GML_DISCREPANCY and any(r["status"] != "ok" for r in rows):
+                info["pages"] = assembler.add(render_discrepancy_pdf(rows), "validation")
+
+    # 9. 一次寫出最終 PDF
+    with recorder.stage("merge"):
+        final_pdf_path = os.path.join(output_folder, f"{context_number}_自主查核表.pdf")
+        assembler.write(final_pdf_path)
+        manifest.save()
+
+    return final_pdf_path
+
+
+def _survey_point_count(record: dict) -> int:
+    """回傳 Excel 的管線點位數；空白（"empty"）、非數字或不大於 0 時回傳 None。"""
+    try:
+        count = int(float(record.get("pipeline_point_count")))
+    except (TypeError, ValueError):
+        return None
+    return count if count > 0 else None
+
+
+def _run_serial_page_stages(record: dict, case_folder: str, work_folder: str, assembler: "PdfAssembler",
+                            manifest: BuildManifest, supervisor_image: str, district_image: str,
+                            plan_images: list, workers: int, recorder: RunRecorder) -> int:
+    """依序產生首頁、平面圖與照片頁並加入 assembler，回傳照片張數。"""
+    from doc_generator import generate_records_doc
+    from doc_image_processor import process_documents
+    from signature_stamps import stamp_cover
+    from utils import process_folder, process_sorted_folder
+
+    context_number = record["case_number"]
+
+    # 4. 產生首頁文件，組合時才於記憶體中蓋上簽名章（快取的是未蓋章的首頁）
+    with recorder.stage("cover") as info:
+        cover_key = manifest.input_key(record, [TEMPLATE_MAIN])
+        cover_pdf = manifest.lookup("cover", cover_key)
+        if cover_pdf is None:
+            cover_pdf = manifest.store("cover", cover_key, generate_records_doc(record, work_folder))
+        info["pages"] = assembler.add(stamp_cover(cover_pdf, supervisor_image, district_image, str(context_number)),
+                                      "cover")
+
+    # 5. 處理平面圖文件
+    with recorder.stage("plans") as info:
+        pages_before = assembler.page_count
+        process_documents(case_folder, TEMPLATE_TABLE, work_folder, context_number, workers, assembler, manifest,
+                          plan_images)
+        info["pages"] = assembler.page_count - pages_before
+
+    # 6. 處理各類照片
+    with recorder.stage("photo_scan"):
+        images = []
+        images.extend(process_folder(case_folder, "埋深照", "埋深照"))
+        images.extend(process_folder(case_folder, "銑鋪照", "銑鋪照"))
+        images.extend(process_sorted_folder(case_folder, "測量照", "測量照"))
+        images.extend(process_sorted_folder(case_folder, "讀數照", "讀數照"))
+    if not images:
+        return 0
+
+    # 7-8. 產生照片頁（只重建有變動的頁）並依頁序加入
+    with recorder.stage("photos") as info:
+        pages_before = assembler.page_count
+        for pdf in build_photo_pages(images, work_folder, context_number, manifest, workers):
+            assembler.add(pdf, "photos")
+        info["pages"] = assembler.page_count - pages_before
+    return len(images)
 
-    # 10. 刪除暫存檔案
-    cleanup_temp_files(output_folder, "temp*")
-    cleanup_temp_files(os.getcwd(), "blank*")
+
+def build_photo_pages(images: list, work_folder: str, context_number: str,
+                      manifest: BuildManifest, workers: int = None) -> list:
+    """
+    依 9×3 版面產生照片頁 PDF，輸入（圖片、類別、版面模式）未變動的頁沿用先前的 PDF。
+    回傳依頁序排列的 PDF 路徑。
+    """
+    from doc_image_processor import plan_9x3_pages, fill_9x3_page, photo_page_key, convert_words_to_pdfs
+    from photo_page_renderer import render_planned_pages
+
+    pages = plan_9x3_pages(images)
+    pdf_files = [None] * len(pages)
+    keys = []
+    stale = []
+    for page_idx, (group, new_categories) in enumerate(pages, start=1):
+        key = photo_page_key(manifest, TEMPLATE_TABLE, group, new_categories, PHOTO_PAGE_RENDERER)
+        keys.append(key)
+        cached_pdf = manifest.lookup(f"photo_{page_idx}", key)
+        if cached_pdf:
+            pdf_files[page_idx - 1] = cached_pdf
+        else:
+            stale.append(page_idx)
+    print(f"照片頁共 {len(pages)} 頁，需重建 {len(stale)} 頁。")
+
+    if PHOTO_PAGE_RENDERER == "pdf":
+        # 直接以 ReportLab 繪製照片頁至記憶體，不經 Word 轉檔
+        for page_idx in stale:
+            buffer = io.BytesIO()
+            render_planned_pages([pages[page_idx - 1]], buffer)
+            pdf_files[page_idx - 1] = manifest.store(f"photo_{page_idx}", keys[page_idx - 1], buffer)
+    else:
+        tasks = []
+        for page_idx in stale:
+            group, new_categories = pages[page_idx - 1]
+            word_file = os.path.join(work_folder, f"temp_{context_number}_{page_idx}.docx")
+            tasks.append((TEMPLATE_TABLE, group, new_categories, word_file))
+        word_files = run_parallel(fill_9x3_page, tasks, workers)
+        # 整批交給同一個轉檔後端
+        for page_idx, pdf in zip(stale, convert_words_to_pdfs(word_files)):
+            pdf_files[page_idx - 1] = manifest.store(f"photo_{page_idx}", keys[page_idx - 1], pdf)
+    return pdf_files
+
+
+def main():
+    from excel_processor import select_folder_and_excel
+    from preflight import preflight_case, print_report
+
+    # 1. 選取 Excel 檔案所在資料夾與檔案
+    excel_file_path = select_folder_and_excel()
+
+    # 先檢查整個案件並一次列出問題，有錯誤時不開始產生
+    check = preflight_case(os.path.dirname(excel_file_path), interactive=True)
+    print_report(check)
+    if not check["ok"]:
+        print("預檢未通過，請修正上述錯誤後再執行。")
+        return
+
+    try:
+        final_pdf = run_case(excel_file_path)
+    except ValueError as e:
+        print(f"{e}，程式結束。")
+        exit()
+    if final_pdf is None:
+        return
 
     print("========== 全部流程完成 ==========")
 
@@ -0,0 +1,137 @@
+import io
+import hashlib
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import IndirectObject, DictionaryObject, ArrayObject, NameObject
+
+# 會在各份 PDF 之間去除重複的共用資源類別
+SHARED_RESOURCE_TYPES = ("/Font", "/XObject")
+
+
+def open_pdf(source) -> PdfReader:
+    """
+    以 PdfReader 開啟 PDF 來源。
+
+    :param source: PDF 路徑、bytes、檔案物件或 PdfReader；路徑會立即讀入記憶體，之後可安全刪除
+    """
+    if isinstance(source, PdfReader):
+        return source
+    if isinstance(source, (bytes, bytearray)):
+        return PdfReader(io.BytesIO(source))
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return PdfReader(io.BytesIO(f.read()))
+    source.seek(0)
+    return PdfReader(source)
+
+
+class PdfAssembler:
+    """
+    逐步組合最終 PDF：各階段完成後把頁面加入指定段落（section），
+    最後依段落順序一次寫出。來源以記憶體緩衝保存，不產生中間合併檔；
+    內容完全相同的字型與圖片等共用資源只會寫入一次。
+    """
+
+    def __init__(self, sections: list = None):
+        self.sections = list(sections or ["main"])
+        self._sources = {name: [] for name in self.sections}
+        # 資源內容雜湊 -> 第一次出現時的間接參照
+        self._shared_resources = {}
+        # (來源 PDF, 物件編號) -> 內容雜湊，同一份來源的資源只計算一次
+        self._digests = {}
+
+    def add(self, source, section: str = None) -> int:
+        """
+        加入一份 PDF 的所有頁面，回傳加入的頁數。
+
+        :param source: PDF 路徑、bytes、檔案物件或 PdfReader；路徑會立即讀入記憶體，之後可安全刪除
+        :param section: 段落名稱，預設為第一個段落
+        """
+        section = section or self.sections[0]
+        if section not in self._sources:
+            self.sections.append(section)
+            self._sources[section] = []
+        reader = open_pdf(source)
+        self._sources[section].append(reader)
+        return len(reader.pages)
+
+    @property
+    def page_count(self) -> int:
+        return sum(len(r.pages) for readers in self._sources.values() for r in readers)
+
+    def _dedupe_resources(self, page) -> None:
+        """把頁面資源中與先前內容相同的字型、圖片改指向第一次出現的物件。"""
+        resources = page.get("/Resources")
+        if resources is None:
+            return
+        resources = resources.get_object()
+        for res_type in SHARED_RESOURCE_TYPES:
+            res_dict = resources.get(res_type)
+            if res_dict is None:
+                continue
+            res_dict = res_dict.get_object()
+            for name, ref in list(res_dict.items()):
+                if not isinstance(ref, IndirectObject):
+                    continue
+                key = (id(ref.pdf), ref.idnum)
+                digest = self._digests.get(key)
+                if digest is None:
+                    digest = self._digests[key] = _object_digest(ref)
+                first = self._shared_resources.setdefault(digest, ref)
+                if first is not ref:
+                    res_dict[NameObject(name)] = first
+
+    def write(self, output) -> int:
+        """
+        依段落順序寫出最終 PDF，回傳總頁數。
+
+        :param output: 輸出路徑或可寫入的檔案物件
+        """
+        writer = PdfWriter()
+        for name in self.sections:
+            for reader in self._sources[name]:
+                for page in reader.pages:
+                    self._dedupe_resources(page)
+                    writer.add_page(page)
+        if isinstance(output, str):
+            with open(output, "wb") as f:
+                writer.write(f)
+            print(f"合併完成：{output}")
+        else:
+            writer.write(output)
+        return len(writer.pages)
+
+
+def _object_digest(obj, _seen: set = None) -> str:
+    """遞迴計算 PDF 物件（含串流內容與其參照的物件）的雜湊值。"""
+    h = hashlib.sha256()
+    _seen = set() if _seen is None else _seen
+
+    def feed(o):
+        if isinstance(o, IndirectObject):
+            key = (id(o.pdf), o.idnum)
+            if key in _seen:
+                h.update(b"<cycle>")
+                return
+            _seen.add(key)
+            o = o.get_object()
+        if isinstance(o, DictionaryObject):
+            h.update(b"<<")
+            for k in sorted(o.keys()):
+                h.update(str(k).encode())
+                # 以 dict 取值保留間接參照，避免 /Parent 等循環參照無限遞迴
+                feed(dict.__getitem__(o, k))
+            h.update(b">>")
+            data = getattr(o, "_data", None)
+            if data is not None:
+                h.update(b"stream")
+                h.update(data if isinstance(data, bytes) else str(data).encode())
+        elif isinstance(o, ArrayObject):
+            h.update(b"[")
+            for item in o:
+                feed(item)
+            h.update(b"]")
+        else:
+            h.update(repr(o).encode())
+
+    feed(obj)
+    return h.hexdigest()
@@ -0,0 +1,166 @@
+import os
+from reportlab.pdfgen import canvas
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+from config import KAIU_FONT_PATH
+from doc_image_processor import VERTICAL_TEXT_DICT, image_caption, plan_9x3_pages
+from image_cache import is_blank_image, prepare_image
+
+# 以下尺寸取自「自主查核表_表格模板.docx」（1 twip = 1/20 pt）
+PAGE_WIDTH = 11910 / 20
+PAGE_HEIGHT = 16840 / 20
+TABLE_LEFT = (1200 + 143) / 20
+TABLE_TOP = PAGE_HEIGHT - 1060 / 20
+COLUMN_WIDTHS = [724 / 20, 4330 / 20, 4690 / 20]
+TITLE_ROW_HEIGHT = 305 / 20
+CAPTION_ROW_HEIGHT = 292 / 20
+IMAGE_HEIGHT = 5.47 * cm
+# Word 會以圖片高度撐開列高，因此取模板列高與圖片高度加上下留白的較大值
+IMAGE_ROW_HEIGHT = max(3100 / 20, IMAGE_HEIGHT + 4)
+TITLE_TEXT = "施工與施測相片"
+TITLE_FILL = (0xBE / 255, 0xBE / 255, 0xBE / 255)
+TABLE_LINE_WIDTH = 1.0
+CATEGORY_LINE_WIDTH = 0.75
+
+_font_name = None
+
+
+def get_kaiu_font() -> str:
+    """
+    註冊並回傳標楷體字型名稱；找不到字型檔時使用 ReportLab 內建的 MSung-Light。
+    """
+    global _font_name
+    if _font_name is None:
+        if KAIU_FONT_PATH and os.path.exists(KAIU_FONT_PATH):
+            pdfmetrics.registerFont(TTFont("標楷體", KAIU_FONT_PATH))
+            _font_name = "標楷體"
+        else:
+            print(f"找不到標楷體字型檔 {KAIU_FONT_PATH}，改用 MSung-Light。")
+            pdfmetrics.registerFont(UnicodeCIDFont("MSung-Light"))
+            _font_name = "MSung-Light"
+    return _font_name
+
+
+def _row_top(row_pair: int) -> float:
+    """回傳第 row_pair 組（標題列＋圖片列）上緣的 y 座標。"""
+    return TABLE_TOP - TITLE_ROW_HEIGHT - row_pair * (CAPTION_ROW_HEIGHT + IMAGE_ROW_HEIGHT)
+
+
+def _draw_grid(c: canvas.Canvas, font: str) -> None:
+    """繪製表格外框、標題列與照片欄的格線（第一欄只畫左右框線）。"""
+    table_width = sum(COLUMN_WIDTHS)
+    table_bottom = _row_top(4)
+    c.setLineWidth(TABLE_LINE_WIDTH)
+
+    # 標題列
+    c.setFillColorRGB(*TITLE_FILL)
+    c.rect(TABLE_LEFT, TABLE_TOP - TITLE_ROW_HEIGHT, table_width, TITLE_ROW_HEIGHT, stroke=1, fill=1)
+    c.setFillColorRGB(0, 0, 0)
+    c.setFont(font, 12.5)
+    c.drawCentredString(TABLE_LEFT + table_width / 2, TABLE_TOP - TITLE_ROW_HEIGHT + 3.5, TITLE_TEXT)
+
+    # 外框與欄線
+    body_top = TABLE_TOP - TITLE_ROW_HEIGHT
+    x = TABLE_LEFT
+    for width in [0] + COLUMN_WIDTHS:
+        x += width
+        c.line(x, body_top, x, table_bottom)
+    c.line(TABLE_LEFT, table_bottom, TABLE_LEFT + table_width, table_bottom)
+
+    # 照片欄的橫線
+    photo_left = TABLE_LEFT + COLUMN_WIDTHS[0]
+    for row_pair in range(4):
+        top = _row_top(row_pair)
+        c.line(photo_left, top, TABLE_LEFT + table_width, top)
+        c.line(photo_left, top - CAPTION_ROW_HEIGHT, TABLE_LEFT + table_width, top - CAPTION_ROW_HEIGHT)
+
+
+def _draw_category_header(c: canvas.Canvas, font: str, row_pair: int, category: str) -> None:
+    """於第一欄第 row_pair 組的位置畫上分隔線並寫入直式標題。"""
+    top = _row_top(row_pair)
+    c.setLineWidth(CATEGORY_LINE_WIDTH)
+    c.line(TABLE_LEFT, top, TABLE_LEFT + COLUMN_WIDTHS[0], top)
+    c.setLineWidth(TABLE_LINE_WIDTH)
+
+    c.setFont(font, 12)
+    center_x = TABLE_LEFT + COLUMN_WIDTHS[0] / 2
+    y = top - 14
+    for char in VERTICAL_TEXT_DICT.get(category, category).split("\n"):
+        c.drawCentredString(center_x, y, char)
+        y -= 14
+
+
+def _draw_photo(c: canvas.Canvas, font: str, slot: int, img_path: str, category: str) -> None:
+    """繪製第 slot 格（由左至右、由上至下）的編號標題與照片。"""
+    row_pair = slot // 2
+    col = 1 + slot % 2
+    cell_left = TABLE_LEFT + sum(COLUMN_WIDTHS[:col])
+    cell_width = COLUMN_WIDTHS[col]
+    center_x = cell_left + cell_width / 2
+    top = _row_top(row_pair)
+
+    caption = image_caption(img_path, category)
+    if caption:
+        c.setFont(font, 12)
+        c.drawCentredString(center_x, top - CAPTION_ROW_HEIGHT + 3, caption)
+
+    if is_blank_image(img_path):
+        return
+    image = ImageReader(prepare_image(img_path, height_cm=IMAGE_HEIGHT / cm))
+    img_w, img_h = image.getSize()
+    draw_h = IMAGE_HEIGHT
+    draw_w = img_w * draw_h / img_h
+    max_w = cell_width - 4
+    if draw_w > max_w:
+        draw_h = draw_h * max_w / draw_w
+        draw_w = max_w
+    img_top = top - CAPTION_ROW_HEIGHT
+    y = img_top - (IMAGE_ROW_HEIGHT + draw_h) / 2
+    c.drawImage(image, center_x - draw_w / 2, y, width=draw_w, height=draw_h)
+
+
+def render_photo_pages(images: list, output_pdf) -> int:
+    """
+    不經 Word，直接以 ReportLab 依 9×3 模板版面繪製照片頁。
+    版面規則與 insert_images_into_9x3_template_left_to_right 相同：
+    每頁 8 張、由左至右排列，類別首次出現時於第一欄寫入直式標題。
+
+    :param images: [(圖片路徑, 類別)] 的列表
+    :param output_pdf: 輸出 PDF 路徑或可寫入的檔案物件
+    :return: 產生的頁數
+    """
+    return render_planned_pages(plan_9x3_pages(images), output_pdf)
+
+
+def render_planned_pages(pages: list, output_pdf) -> int:
+    """
+    繪製 plan_9x3_pages 規劃好的頁面（可只傳入其中幾頁，供增量重建使用）。
+
+    :param pages: [(該頁圖片列表, 首次出現的類別列表)]
+    :param output_pdf: 輸出 PDF 路徑或可寫入的檔案物件
+    :return: 產生的頁數
+    """
+    font = get_kaiu_font()
+    c = canvas.Canvas(output_pdf, pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+    for group, new_categories in pages:
+        _draw_grid(c, font)
+        placed_categories = set()
+        headed_rows = set()
+        for slot, (img_path, category) in enumerate(group):
+            if category in new_categories and category not in placed_categories:
+                _draw_category_header(c, font, slot // 2, category)
+                placed_categories.add(category)
+                headed_rows.add(slot // 2)
+            _draw_photo(c, font, slot, img_path, category)
+        # 與 Word 版相同：本頁開頭延續前頁類別時，於第一格補上第二張圖片的類別標題
+        if 0 not in headed_rows and len(group) > 1:
+            _draw_category_header(c, font, 0, group[1][1])
+        c.showPage()
+    c.save()
+    if isinstance(output_pdf, str):
+        print(f"已直接產生照片頁 PDF：{output_pdf}（共 {len(pages)} 頁）")
+    return len(pages)
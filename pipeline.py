@@ -0,0 +1,320 @@
+import io
+import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from reportlab.lib.units import cm
+
+from doc_generator import render_records_docx
+from doc_image_processor import (get_image_files, insert_images_in_template, fill_9x3_page, plan_9x3_pages,
+                                 plan_group_key, photo_page_key)
+from photo_page_renderer import render_planned_pages, IMAGE_HEIGHT
+from image_cache import prepare_image
+from converter import get_converter
+import scheduler
+from scheduler import resolve_workers, _mark_worker
+from utils import process_folder, process_sorted_folder
+from signature_stamps import stamp_cover
+from config import TEMPLATE_MAIN, TEMPLATE_TABLE, PHOTO_PAGE_RENDERER, PIPELINE_QUEUE_SIZE
+
+# 佇列結束標記
+_DONE = None
+
+
+class PageUnit:
+    """
+    管線中依輸出順序編號的一個單位：首頁、一組平面圖或一頁照片。
+
+    build_func(*build_args) 回傳 Word 路徑（需轉檔）或 PDF 來源（可直接組合）；
+    finish 於組合前對 PDF 來源做後處理（例如首頁蓋上簽名章），結果不寫入建置快取。
+    """
+
+    def __init__(self, seq: int, section: str, unit: str, images: list, key_func,
+                 build_func, build_args: tuple, prefetch: dict = None, finish=None):
+        self.seq = seq
+        self.section = section
+        self.unit = unit
+        self.images = images
+        self.key_func = key_func
+        self.build_func = build_func
+        self.build_args = build_args
+        self.prefetch = prefetch
+        self.finish = finish
+        self.key = None
+
+
+def _build_plan_group(template_path: str, group: list, word_path: str) -> str:
+    insert_images_in_template(template_path, group, word_path)
+    return word_path
+
+
+def _render_photo_page(page: tuple) -> bytes:
+    buffer = io.BytesIO()
+    render_planned_pages([page], buffer)
+    return buffer.getvalue()
+
+
+def _timed_call(func, *args):
+    """
+    執行 func(*args) 並回傳 (結果, 牆鐘秒數, CPU 秒數)。於建置用的工作行程／執行緒內量測，
+    CPU 時間只計該執行緒，主行程因此能統計建置階段實際花費的時間。
+    """
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    result = func(*args)
+    return result, time.perf_counter() - wall_start, time.thread_time() - cpu_start
+
+
+def _init_converter_thread() -> None:
+    """Word（COM）必須在呼叫的執行緒內初始化。"""
+    try:
+        import pythoncom
+        pythoncom.CoInitialize()
+    except ImportError:
+        pass
+
+
+class PagePipeline:
+    """
+    以 asyncio 將單一案件的頁面產生拆成以有限佇列串接的生產者／消費者階段：
+
+        掃描 → 快取比對與圖片前置處理 → 建置 docx／PDF → 轉檔 → 依序組合
+
+    轉檔在專用執行緒中進行，等待 Word／LibreOffice 時其他頁面持續建置；
+    佇列長度為 PIPELINE_QUEUE_SIZE，尚未組合的頁面數量因此有上限。
+    """
+
+    def __init__(self, record: dict, case_folder: str, work_folder: str, assembler, manifest,
+                 supervisor_image: str, district_image: str, plan_images: list = None,
+                 workers: int = None, queue_size: int = PIPELINE_QUEUE_SIZE, recorder=None):
+        self.record = record
+        self.case_folder = case_folder
+        self.work_folder = work_folder
+        self.assembler = assembler
+        self.manifest = manifest
+        self.supervisor_image = supervisor_image
+        self.district_image = district_image
+        self.plan_images = plan_images
+        self.workers = resolve_workers(workers)
+        self.queue_size = max(1, queue_size)
+        self.recorder = recorder
+        self.photo_count = 0
+        self.total = 0
+        self.rebuilt = 0
+        # 子階段 -> [牆鐘秒數, CPU 秒數, 單位數]；各階段彼此重疊，數值為該階段實際忙碌的時間
+        self.timings = {name: [0.0, 0.0, 0] for name in ("prepare", "build", "convert", "assemble")}
+        self._timings_lock = threading.Lock()
+
+    def _add_timing(self, name: str, wall: float, cpu: float, units: int = 1) -> None:
+        with self._timings_lock:
+            timing = self.timings[name]
+            timing[0] += wall
+            timing[1] += cpu
+            timing[2] += units
+
+    # ---- 單位規劃 ----
+
+    def _cover_unit(self) -> PageUnit:
+        record = self.record
+        files = [TEMPLATE_MAIN]
+
+        def finish(source):
+            return stamp_cover(source, self.supervisor_image, self.district_image, str(record["case_number"]))
+
+        return PageUnit(0, "cover", "cover", [], lambda m: m.input_key(record, files),
+                        render_records_docx, (record, self.work_folder), finish=finish)
+
+    def _plan_units(self, seq: int) -> list:
+        images = self.plan_images
+        if images is None:
+            images = get_image_files(os.path.join(self.case_folder, "平面圖"))
+        units = []
+        for idx, group in enumerate((images[i:i + 2] for i in range(0, len(images), 2)), start=1):
+            word_path = os.path.join(self.work_folder, f"temp_modified_template_group_{idx}.docx")
+            units.append(PageUnit(
+                seq + idx - 1, "plans", f"plan_{idx}", group,
+                lambda m, g=group: plan_group_key(m, TEMPLATE_TABLE, g),
+                _build_plan_group, (TEMPLATE_TABLE, group, word_path),
+                prefetch={"width_cm": 15.91},
+            ))
+        return units
+
+    def _photo_units(self, seq: int) -> list:
+        images = []
+        images.extend(process_folder(self.case_folder, "埋深照", "埋深照"))
+        images.extend(process_folder(self.case_folder, "銑鋪照", "銑鋪照"))
+        images.extend(process_sorted_folder(self.case_folder, "測量照", "測量照"))
+        images.extend(process_sorted_folder(self.case_folder, "讀數照", "讀數照"))
+        self.photo_count = len(images)
+        context_number = self.record["case_number"]
+        units = []
+        for page_idx, page in enumerate(plan_9x3_pages(images), start=1):
+            group, new_categories = page
+            if PHOTO_PAGE_RENDERER == "pdf":
+                build = (_render_photo_page, (page,), {"height_cm": IMAGE_HEIGHT / cm})
+            else:
+                word_file = os.path.join(self.work_folder, f"temp_{context_number}_{page_idx}.docx")
+                build = (fill_9x3_page, (TEMPLATE_TABLE, group, new_categories, word_file), {"height_cm": 5.47})
+            units.append(PageUnit(
+                seq + page_idx - 1, "photos", f"photo_{page_idx}", [img for img, _ in group],
+                lambda m, g=group, n=new_categories: photo_page_key(m, TEMPLATE_TABLE, g, n, PHOTO_PAGE_RENDERER),
+                build[0], build[1], prefetch=build[2],
+            ))
+        return units
+
+    # ---- 各階段 ----
+
+    async def _scan(self, out_q: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        await out_q.put(self._cover_unit())
+        plan_units = await loop.run_in_executor(self.io_pool, self._plan_units, 1)
+        for unit in plan_units:
+            await out_q.put(unit)
+        photo_units = await loop.run_in_executor(self.io_pool, self._photo_units, 1 + len(plan_units))
+        for unit in photo_units:
+            await out_q.put(unit)
+        self.total = 1 + len(plan_units) + len(photo_units)
+        print(f"管線共 {self.total} 個單位（平面圖 {len(plan_units)} 組、照片 {len(photo_units)} 頁）。")
+        await out_q.put(_DONE)
+
+    def _prepare_sync(self, unit: PageUnit):
+        """計算輸入雜湊；需重建時預先縮圖，使建置階段直接讀取快取。"""
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        unit.key = unit.key_func(self.manifest)
+        cached = self.manifest.lookup(unit.unit, unit.key)
+        if cached is None and unit.prefetch:
+            for img in unit.images:
+                prepare_image(img, **unit.prefetch)
+        self._add_timing("prepare", time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+        return cached
+
+    async def _prepare(self, in_q: asyncio.Queue, build_q: asyncio.Queue, merge_q: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        while (unit := await in_q.get()) is not _DONE:
+            cached = await loop.run_in_executor(self.io_pool, self._prepare_sync, unit)
+            if cached is not None:
+                await merge_q.put((unit, cached))
+            else:
+                self.rebuilt += 1
+                await build_q.put(unit)
+        await build_q.put(_DONE)
+
+    async def _build(self, build_q: asyncio.Queue, convert_q: asyncio.Queue, merge_q: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        pending = set()
+
+        async def build_one(unit):
+            result, wall, cpu = await loop.run_in_executor(self.build_pool, _timed_call, unit.build_func,
+                                                           *unit.build_args)
+            self._add_timing("build", wall, cpu)
+            if isinstance(result, str) and result.lower().endswith(".docx"):
+                await convert_q.put((unit, result))
+            else:
+                source = io.BytesIO(result) if isinstance(result, bytes) else result
+                await merge_q.put((unit, self.manifest.store(unit.unit, unit.key, source)))
+
+        # 同時建置的單位數以工作行程數為上限
+        while (unit := await build_q.get()) is not _DONE:
+            if len(pending) >= self.workers:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            pending.add(asyncio.ensure_future(build_one(unit)))
+        for task in pending:
+            await task
+        await convert_q.put(_DONE)
+
+    def _convert_sync(self, batch: list) -> list:
+        pairs = [(docx_path, os.path.splitext(docx_path)[0] + ".pdf") for _, docx_path in batch]
+        pdfs, wall, cpu = _timed_call(get_converter().convert_many, pairs)
+        self._add_timing("convert", wall, cpu, len(pairs))
+        return pdfs
+
+    async def _convert(self, convert_q: asyncio.Queue, merge_q: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            item = await convert_q.get()
+            if item is _DONE:
+                break
+            # 一次轉換佇列中已就緒的全部文件，讓 Word 批次模式發揮作用
+            batch = [item]
+            while not convert_q.empty():
+                item = convert_q.get_nowait()
+                if item is _DONE:
+                    finished = True
+                    break
+                batch.append(item)
+            pdfs = await loop.run_in_executor(self.convert_pool, self._convert_sync, batch)
+            for (unit, _), pdf in zip(batch, pdfs):
+                await merge_q.put((unit, self.manifest.store(unit.unit, unit.key, pdf)))
+        await merge_q.put(_DONE)
+
+    async def _merge(self, merge_q: asyncio.Queue) -> None:
+        """依序號組合：先完成的單位暫存，直到前面的單位都已加入。"""
+        ready = {}
+        next_seq = 0
+        while (item := await merge_q.get()) is not _DONE:
+            unit, source = item
+            ready[unit.seq] = unit, source
+            while next_seq in ready:
+                unit, source = ready.pop(next_seq)
+                wall_start, cpu_start = time.perf_counter(), time.thread_time()
+                if unit.finish:
+                    source = unit.finish(source)
+                self.assembler.add(source, unit.section)
+                self._add_timing("assemble", time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+                next_seq += 1
+        if ready:
+            raise RuntimeError(f"管線結束時仍有 {len(ready)} 個單位未能依序組合")
+
+    async def run_async(self) -> int:
+        size = self.queue_size
+        scan_q, build_q = asyncio.Queue(size), asyncio.Queue(size)
+        convert_q = asyncio.Queue(size)
+        # 快取命中的單位直接送往組合，不經轉檔，因此組合佇列不設上限以免互相等待
+        merge_q = asyncio.Queue()
+        tasks = [
+            asyncio.ensure_future(self._scan(scan_q)),
+            asyncio.ensure_future(self._prepare(scan_q, build_q, merge_q)),
+            asyncio.ensure_future(self._build(build_q, convert_q, merge_q)),
+            asyncio.ensure_future(self._convert(convert_q, merge_q)),
+            asyncio.ensure_future(self._merge(merge_q)),
+        ]
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            task.result()
+        print(f"管線完成：{self.total} 個單位中重建 {self.rebuilt} 個。")
+        if self.recorder is not None:
+            for name, (wall, cpu, units) in self.timings.items():
+                self.recorder.record_substage("pipeline", name, wall, cpu, units)
+        return self.photo_count
+
+    def run(self) -> int:
+        """執行管線並回傳照片張數（0 表示沒有任何照片）。"""
+        self.io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pipeline_io")
+        self.convert_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline_convert",
+                                               initializer=_init_converter_thread)
+        # 已在工作行程內（批次平行處理案件）時不再開行程池
+        if self.workers > 1 and not scheduler._IN_WORKER:
+            self.build_pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_mark_worker)
+        else:
+            self.build_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline_build")
+        try:
+            return asyncio.run(self.run_async())
+        finally:
+            for pool in (self.io_pool, self.convert_pool, self.build_pool):
+                pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_page_pipeline(record: dict, case_folder: str, work_folder: str, assembler, manifest,
+                      supervisor_image: str, district_image: str, plan_images: list = None,
+                      workers: int = None, recorder=None) -> int:
+    """
+    以非同步管線產生首頁、平面圖與照片頁並依序加入 assembler，回傳照片張數。
+    有傳入 recorder（RunRecorder）時，將準備、建置、轉檔與組合各自花費的時間記為 "pipeline" 的子階段。
+    """
+    return PagePipeline(record, case_folder, work_folder, assembler, manifest, supervisor_image,
+                        district_image, plan_images, workers, recorder=recorder).run()
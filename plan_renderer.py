@@ -0,0 +1,228 @@
+import os
+import math
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from config import KAIU_FONT_PATH, CJK_FALLBACK_FONT_PATHS, IMAGE_DPI, PLAN_POINTS_PER_SHEET
+
+# 平面圖插入「自主查核表_表格模板.docx」第 2~5 列（或 6~9 列）合併儲存格，寬 15.91 cm；
+# 高度取四列列高（約 12 cm）扣除上下留白
+PLAN_WIDTH_CM = 15.91
+PLAN_HEIGHT_CM = 11.5
+MARGIN_PX = 40
+POINT_RADIUS_PX = 4
+LABEL_CELL_PX = (90, 30)
+PIPE_PATTERN = r"^\s*(\d+)管道點(\d+)-實測\s*$"
+
+PIPE_COLOR = (0, 90, 200)
+GML_COLOR = (150, 150, 150)
+POINT_COLOR = (200, 0, 0)
+TEXT_COLOR = (0, 0, 0)
+DEPTH_COLOR = (0, 120, 0)
+TILE_COLOR = (230, 120, 0)
+
+
+def _sheet_size(dpi: int) -> tuple:
+    return round(PLAN_WIDTH_CM / 2.54 * dpi), round(PLAN_HEIGHT_CM / 2.54 * dpi)
+
+
+@lru_cache(maxsize=1)
+def plan_font_path() -> str:
+    """
+    回傳繪圖用的中文字型檔：優先使用標楷體，找不到時依序嘗試 CJK_FALLBACK_FONT_PATHS；
+    都找不到時回傳 None（PIL 內建字型沒有中文字，標題與標註會變成方框，呼叫端應略過自動繪製）。
+    """
+    for path in [KAIU_FONT_PATH] + list(CJK_FALLBACK_FONT_PATHS):
+        if path and os.path.exists(path):
+            if path != KAIU_FONT_PATH:
+                print(f"找不到標楷體字型檔 {KAIU_FONT_PATH}，平面圖改用 {path}。")
+            return path
+    return None
+
+
+def _load_font(size: int):
+    from PIL import ImageFont
+    path = plan_font_path()
+    if path is None:
+        raise FileNotFoundError(
+            f"找不到可顯示中文的字型檔（{KAIU_FONT_PATH} 或 config.CJK_FALLBACK_FONT_PATHS），無法繪製平面圖"
+        )
+    return ImageFont.truetype(path, size)
+
+
+class ViewTransform:
+    """將 TWD97 座標（公尺，y 向北）等比例縮放至圖片像素座標（y 向下）。"""
+
+    def __init__(self, lo: np.ndarray, hi: np.ndarray, size: tuple, margin: int = MARGIN_PX):
+        span = np.maximum(hi - lo, 1.0)
+        usable = np.array(size, dtype=np.float64) - 2 * margin
+        self.scale = float(np.min(usable / span))
+        self.center = (lo + hi) / 2
+        self.pixel_center = np.array(size, dtype=np.float64) / 2
+
+    def __call__(self, xy: np.ndarray) -> np.ndarray:
+        """將 N×2 座標陣列一次轉為像素座標。"""
+        px = (xy - self.center) * self.scale
+        px[:, 1] = -px[:, 1]
+        return px + self.pixel_center
+
+
+def _split_tiles(xy: np.ndarray, indices: np.ndarray, limit: int) -> list:
+    """沿較長的軸以中位數遞迴切分，使每張圖的點數不超過 limit，回傳各圖的點索引。"""
+    if len(indices) <= limit:
+        return [indices]
+    pts = xy[indices]
+    axis = int(np.argmax(np.ptp(pts, axis=0)))
+    order = indices[np.argsort(pts[:, axis], kind="stable")]
+    half = len(order) // 2
+    return _split_tiles(xy, order[:half], limit) + _split_tiles(xy, order[half:], limit)
+
+
+def _pipe_polylines(types: np.ndarray) -> list:
+    """依「N管道點M-實測」的管線編號 N 分組、點序 M 排序，回傳各管線的點索引陣列。"""
+    parts = pd.Series(types).fillna("").astype(str).str.extract(PIPE_PATTERN)
+    valid = parts[0].notna().to_numpy()
+    if not valid.any():
+        return []
+    frame = pd.DataFrame({
+        "pipe": parts[0][valid].astype(int).to_numpy(),
+        "seq": parts[1][valid].astype(int).to_numpy(),
+        "idx": np.flatnonzero(valid),
+    }).sort_values(["pipe", "seq"], kind="stable")
+    return [group["idx"].to_numpy() for _, group in frame.groupby("pipe", sort=True) if len(group) > 1]
+
+
+def _label_mask(px: np.ndarray, size: tuple) -> np.ndarray:
+    """
+    以標籤大小的網格篩選要標註的點：每格只標第一個點，避免數千點時文字互相重疊。
+    """
+    inside = (px[:, 0] >= 0) & (px[:, 0] < size[0]) & (px[:, 1] >= 0) & (px[:, 1] < size[1])
+    cells = np.floor(px / np.array(LABEL_CELL_PX)).astype(np.int64)
+    cells[~inside] = -1
+    _, first = np.unique(cells, axis=0, return_index=True)
+    mask = np.zeros(len(px), dtype=bool)
+    mask[first] = True
+    return mask & inside
+
+
+def _nice_length(max_length: float) -> float:
+    """比例尺長度取 1、2、5 × 10^n 中不超過 max_length 的最大值。"""
+    exponent = math.floor(math.log10(max_length))
+    for step in (5, 2, 1):
+        if step * 10 ** exponent <= max_length:
+            return step * 10 ** exponent
+    return 10 ** exponent
+
+
+def _draw_scale_bar(draw, transform: ViewTransform, size: tuple, font) -> None:
+    length_m = _nice_length(size[0] * 0.25 / transform.scale)
+    length_px = length_m * transform.scale
+    x0, y0 = MARGIN_PX, size[1] - MARGIN_PX // 2
+    draw.line([(x0, y0), (x0 + length_px, y0)], fill=TEXT_COLOR, width=3)
+    for x in (x0, x0 + length_px):
+        draw.line([(x, y0 - 6), (x, y0 + 6)], fill=TEXT_COLOR, width=2)
+    label = f"{length_m:g} m"
+    draw.text((x0 + length_px + 8, y0 - 12), label, fill=TEXT_COLOR, font=font)
+    # 指北針
+    nx, ny = size[0] - MARGIN_PX, MARGIN_PX
+    draw.polygon([(nx, ny - 25), (nx - 8, ny), (nx + 8, ny)], fill=TEXT_COLOR)
+    draw.text((nx - 6, ny + 2), "N", fill=TEXT_COLOR, font=font)
+
+
+def _draw_sheet(xy: np.ndarray, labels: np.ndarray, depths: np.ndarray, polylines: list,
+                gml_parts: list, lo: np.ndarray, hi: np.ndarray, size: tuple, title: str,
+                draw_labels: bool = True, tiles: list = None):
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    font = _load_font(18)
+    small_font = _load_font(14)
+    transform = ViewTransform(lo, hi, size)
+
+    for part in gml_parts:
+        if len(part) > 1:
+            draw.line([tuple(p) for p in transform(part)], fill=GML_COLOR, width=2)
+
+    px = transform(xy)
+    for line in polylines:
+        draw.line([tuple(p) for p in px[line]], fill=PIPE_COLOR, width=3)
+
+    # 只繪製落在圖面內的點
+    inside = ((px[:, 0] >= -POINT_RADIUS_PX) & (px[:, 0] <= size[0] + POINT_RADIUS_PX)
+              & (px[:, 1] >= -POINT_RADIUS_PX) & (px[:, 1] <= size[1] + POINT_RADIUS_PX))
+    r = POINT_RADIUS_PX
+    for x, y in px[inside]:
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=POINT_COLOR)
+
+    if draw_labels:
+        for i in np.flatnonzero(_label_mask(px, size)):
+            x, y = px[i]
+            draw.text((x + r + 2, y - 18), str(labels[i]), fill=TEXT_COLOR, font=small_font)
+            if not np.isnan(depths[i]):
+                draw.text((x + r + 2, y), f"深{depths[i]:.2f}", fill=DEPTH_COLOR, font=small_font)
+
+    for tile_no, (tile_lo, tile_hi) in enumerate(tiles or [], start=1):
+        corners = transform(np.array([[tile_lo[0], tile_hi[1]], [tile_hi[0], tile_lo[1]]]))
+        draw.rectangle([tuple(corners[0]), tuple(corners[1])], outline=TILE_COLOR, width=2)
+        draw.text(tuple(corners[0] + 4), str(tile_no), fill=TILE_COLOR, font=font)
+
+    draw.text((MARGIN_PX, 8), title, fill=TEXT_COLOR, font=font)
+    _draw_scale_bar(draw, transform, size, small_font)
+    return img
+
+
+def render_plan_images(points, output_folder: str, gml_segments: list = None, dpi: int = IMAGE_DPI,
+                       points_per_sheet: int = PLAN_POINTS_PER_SHEET, prefix: str = "temp_plan_auto") -> list:
+    """
+    由測量點（survey_points.SurveyPoints）繪製竣工平面圖 PNG，尺寸對應模板中 15.91 cm 寬的儲存格，
+    可直接作為 process_documents 的平面圖。
+
+    點數超過 points_per_sheet 時，依空間分布切成多張分圖，並在第一張總圖標示各分圖範圍。
+
+    :param gml_segments: gml_file_extract.extract_segments 的結果，以灰色線繪製於底圖
+    :return: 依順序排列的圖片路徑
+    """
+    xs = points.values["Coordinate_X"]
+    ys = points.values["Coordinate_Y"]
+    valid = ~(np.isnan(xs) | np.isnan(ys))
+    if not valid.any():
+        print("測量點沒有可用的座標，無法產生平面圖。")
+        return []
+    xy = np.column_stack([xs[valid], ys[valid]])
+    labels = points.raw["Number"][valid]
+    depths = points.values["Pipe_Burial_Depth"][valid]
+    polylines = _pipe_polylines(points.raw["Type"][valid])
+    gml_parts = [seg[:, :2] for _, _, seg in (gml_segments or [])]
+    gml_lo = np.array([p.min(axis=0) for p in gml_parts]) if gml_parts else np.empty((0, 2))
+    gml_hi = np.array([p.max(axis=0) for p in gml_parts]) if gml_parts else np.empty((0, 2))
+
+    size = _sheet_size(dpi)
+    tiles = _split_tiles(xy, np.arange(len(xy)), max(1, points_per_sheet))
+    bounds = [(xy[t].min(axis=0), xy[t].max(axis=0)) for t in tiles]
+
+    def parts_in(lo, hi):
+        if not gml_parts:
+            return []
+        overlap = np.all(gml_lo <= hi, axis=1) & np.all(gml_hi >= lo, axis=1)
+        return [gml_parts[i] for i in np.flatnonzero(overlap)]
+
+    os.makedirs(output_folder, exist_ok=True)
+    sheets = []
+    if len(tiles) > 1:
+        lo, hi = xy.min(axis=0), xy.max(axis=0)
+        sheets.append(_draw_sheet(xy, labels, depths, polylines, parts_in(lo, hi), lo, hi, size,
+                                  f"竣工平面圖（總圖，共 {len(tiles)} 張分圖）", draw_labels=False, tiles=bounds))
+    for tile_no, (lo, hi) in enumerate(bounds, start=1):
+        title = "竣工平面圖" if len(tiles) == 1 else f"竣工平面圖（分圖 {tile_no}/{len(tiles)}）"
+        sheets.append(_draw_sheet(xy, labels, depths, polylines, parts_in(lo, hi), lo, hi, size, title))
+
+    paths = []
+    for i, img in enumerate(sheets, start=1):
+        path = os.path.join(output_folder, f"{prefix}_{i:03d}.png")
+        img.save(path, format="PNG", dpi=(dpi, dpi))
+        paths.append(path)
+    print(f"已由 {len(xy)} 個測量點產生 {len(paths)} 張平面圖。")
+    return paths
@@ -0,0 +1,307 @@
+import os
+import argparse
+
+from image_inventory import get_inventory
+from config import AUTO_PLAN_IMAGES
+
+PHOTO_FOLDERS = ["平面圖", "埋深照", "銑鋪照", "測量照", "讀數照"]
+# 依檔名中的數字排序的資料夾（見 utils.process_sorted_folder）
+NUMBERED_FOLDERS = ["測量照", "讀數照"]
+# 四位數代號欄位（見 utils.transform_measurement_method）
+CODE_COLUMNS = ["施測方式", "施測儀器"]
+COUNT_COLUMNS = ["管線點位", "孔蓋點位", "設施物點位"]
+# 空白時視為錯誤的欄位（其餘欄位空白只是警告）；單一案件與總表兩種模式使用相同的等級
+REQUIRED_COLUMNS = ["施測日期"]
+
+ERROR = "error"
+WARNING = "warning"
+
+
+class PreflightError(ValueError):
+    """預檢發現錯誤；訊息列出所有錯誤，result 為 preflight_case 的完整結果。"""
+
+    def __init__(self, result: dict):
+        self.result = result
+        errors = [issue["message"] for issue in result["issues"] if issue["level"] == ERROR]
+        super().__init__(f"預檢發現 {len(errors)} 個錯誤：" + "；".join(errors))
+
+
+def _issue(level: str, check: str, message: str) -> dict:
+    return {"level": level, "check": check, "message": message}
+
+
+def check_excel_row(row: dict) -> list:
+    """
+    檢查 Excel 首列（原始欄位名稱）：欄位是否齊全、是否空白，以及日期、代號與點位數能否解析。
+    """
+    import pandas as pd
+    from excel_processor import COLUMN_MAPPING
+
+    issues = []
+    for column in COLUMN_MAPPING:
+        if column not in row:
+            issues.append(_issue(ERROR, "excel_column", f"缺少欄位「{column}」，首頁將顯示 empty"))
+        elif pd.isnull(row[column]) or str(row[column]).strip() == "":
+            level = ERROR if column in REQUIRED_COLUMNS else WARNING
+            issues.append(_issue(level, "excel_value", f"欄位「{column}」為空白，首頁將顯示 empty"))
+
+    value = row.get("施測日期")
+    if value is not None and not pd.isnull(value) and pd.isnull(pd.to_datetime(value, errors="coerce")):
+        issues.append(_issue(ERROR, "excel_date", f"施測日期無法解析為日期：{value!r}"))
+
+    for column in CODE_COLUMNS:
+        value = row.get(column)
+        if value is None or pd.isnull(value):
+            continue
+        number = pd.to_numeric(value, errors="coerce")
+        if pd.isnull(number) or number != int(number) or not 0 <= number <= 9999:
+            issues.append(_issue(ERROR, "excel_code", f"「{column}」應為 4 位數以內的整數代號：{value!r}（將變成 0000）"))
+
+    for column in COUNT_COLUMNS:
+        value = row.get(column)
+        if value is None or pd.isnull(value):
+            continue
+        number = pd.to_numeric(value, errors="coerce")
+        if pd.isnull(number) or number != int(number) or number < 0:
+            issues.append(_issue(ERROR, "excel_count", f"「{column}」應為非負整數：{value!r}"))
+    return issues
+
+
+def check_record(record: dict) -> list:
+    """檢查已前置處理的案件資料（例如由總表讀出的一列）：前置處理後為 empty 的欄位。"""
+    from excel_processor import COLUMN_MAPPING
+
+    issues = []
+    for column, key in COLUMN_MAPPING.items():
+        if key not in record:
+            issues.append(_issue(ERROR, "excel_column", f"缺少欄位「{column}」，首頁將顯示 empty"))
+        elif record[key] == "empty":
+            level = ERROR if column in REQUIRED_COLUMNS else WARNING
+            issues.append(_issue(level, "excel_value", f"欄位「{column}」為空白或無法解析，首頁將顯示 empty"))
+    return issues
+
+
+def check_image_header(path: str) -> str:
+    """
+    只讀取檔頭確認圖片可被辨識（不解碼像素），JPEG 另檢查結尾標記以發現未傳完的檔案。
+    正常時回傳 None，否則回傳問題說明。
+    """
+    from PIL import Image
+
+    try:
+        if os.path.getsize(path) == 0:
+            return "檔案大小為 0"
+        with Image.open(path) as img:
+            width, height = img.size
+            image_format = img.format
+    except Exception as e:
+        return f"無法辨識的圖片：{type(e).__name__}: {e}"
+    if width <= 0 or height <= 0:
+        return f"圖片尺寸異常：{width}x{height}"
+    if image_format == "JPEG" and not _has_jpeg_end_marker(path):
+        return "JPEG 缺少結尾標記，檔案可能不完整"
+    return None
+
+
+def _jpeg_scan_offset(f) -> int:
+    """
+    依長度欄位逐一跳過 SOS 之前的標記區段（APPn 內的 EXIF 縮圖有自己的結尾標記，不可計入），
+    回傳第一個 SOS 之後、壓縮影像資料開始的位置；檔案在此之前就結束時回傳 None。
+    """
+    f.seek(0)
+    if f.read(2) != b"\xff\xd8":
+        return None
+    while True:
+        byte = f.read(1)
+        if byte != b"\xff":
+            return None
+        marker = f.read(1)
+        while marker == b"\xff":
+            marker = f.read(1)
+        if not marker:
+            return None
+        code = marker[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        if code == 0xD9:
+            return None
+        length = f.read(2)
+        if len(length) < 2:
+            return None
+        f.seek(int.from_bytes(length, "big") - 2, os.SEEK_CUR)
+        if code == 0xDA:
+            return f.tell()
+
+
+def _has_jpeg_end_marker(path: str, chunk_size: int = 1024 * 1024) -> bool:
+    """
+    JPEG 的壓縮影像資料之後是否有結尾標記（FFD9）。影像資料中的 FF 都會被填補，不會誤判；
+    多數檔案的標記就在最後 1 KB，動態照片等在標記後附加其他資料的檔案則往後逐塊搜尋。
+    """
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        start = _jpeg_scan_offset(f)
+        if start is None or start > size:
+            return False
+        f.seek(max(start, size - 1024))
+        if b"\xff\xd9" in f.read():
+            return True
+        f.seek(start)
+        tail = b""
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            if b"\xff\xd9" in tail + chunk:
+                return True
+            tail = chunk[-1:]
+    return False
+
+
+def check_folders(case_folder: str) -> list:
+    """檢查照片資料夾是否存在、編號檔名是否含數字且不重複，以及每張圖片的檔頭。"""
+    from image_inventory import number_key
+
+    inventory = get_inventory(case_folder, refresh=True)
+    issues = []
+    for folder in PHOTO_FOLDERS:
+        if not inventory.has_folder(folder):
+            if folder == "平面圖":
+                hint = "將由測量點座標自動繪製" if AUTO_PLAN_IMAGES else "將沒有竣工平面圖"
+            elif folder in NUMBERED_FOLDERS:
+                hint = "該類照片將不會出現"
+            else:
+                hint = "將以空白圖片代替"
+            issues.append(_issue(WARNING, "folder", f"找不到資料夾「{folder}」，{hint}"))
+            continue
+        images = inventory.images(folder)
+        if not images:
+            issues.append(_issue(WARNING, "folder", f"資料夾「{folder}」沒有圖片"))
+
+        if folder in NUMBERED_FOLDERS:
+            seen = {}
+            for path in images:
+                name = os.path.basename(path)
+                missing_number, number, _ = number_key(name)
+                if missing_number:
+                    issues.append(_issue(WARNING, "filename", f"{folder}/{name} 檔名沒有數字，將排在最後"))
+                elif number in seen:
+                    issues.append(_issue(WARNING, "filename",
+                                         f"{folder}/{name} 與 {seen[number]} 編號重複（{number}），排序可能不如預期"))
+                else:
+                    seen[number] = name
+
+        for path in images:
+            problem = check_image_header(path)
+            if problem:
+                issues.append(_issue(ERROR, "image", f"{folder}/{os.path.basename(path)}：{problem}"))
+    return issues
+
+
+def check_signatures(record: dict, supervisor_image: str = None, district_image: str = None,
+                     interactive: bool = False) -> list:
+    """確認簽名圖片存在且可辨識；未指定時確認依監工名稱與區處可找到已登錄的簽名。"""
+    from signature_stamps import SUPERVISOR, DISTRICT, find_signature, signature_name
+
+    issues = []
+    for kind, image_path, key in ((SUPERVISOR, supervisor_image, "supervisor_name"),
+                                  (DISTRICT, district_image, "district")):
+        name = signature_name(record.get(key)) if record else None
+        path = image_path or find_signature(kind, name)
+        if path is None:
+            if not interactive:
+                issues.append(_issue(ERROR, "signature", f"找不到{kind}簽名圖片（{name or '未填名稱'}）"))
+            continue
+        if not os.path.isfile(path):
+            issues.append(_issue(ERROR, "signature", f"找不到{kind}簽名圖片：{path}"))
+            continue
+        problem = check_image_header(path)
+        if problem:
+            issues.append(_issue(ERROR, "signature", f"{kind}簽名圖片 {path}：{problem}"))
+    return issues
+
+
+def preflight_case(case_folder: str, record: dict = None, supervisor_image: str = None,
+                   district_image: str = None, interactive: bool = False) -> dict:
+    """
+    在產生任何頁面之前檢查整個案件，一次列出所有問題。
+    只讀取 Excel 首列與圖片檔頭，不解碼圖片也不轉檔。
+
+    :param record: 已解析的案件資料（總表模式）；未傳入時讀取案件資料夾內的 Excel
+    :return: {"case_folder", "ok", "issues": [{"level", "check", "message"}]}
+    """
+    issues = []
+    if record is None:
+        import pandas as pd
+        from excel_processor import find_excel_file, prepare_case_frame
+        try:
+            excel_file_path = find_excel_file(case_folder)
+            df = pd.read_excel(excel_file_path, sheet_name=0, usecols="A:Z", nrows=2)
+        except Exception as e:
+            issues.append(_issue(ERROR, "excel", f"無法讀取 Excel：{e}"))
+        else:
+            if df.empty:
+                issues.append(_issue(ERROR, "excel", f"Excel 沒有資料列：{excel_file_path}"))
+            else:
+                issues.extend(check_excel_row(df.to_dict(orient="records")[0]))
+                try:
+                    record = prepare_case_frame(df).to_dict(orient="records")[0]
+                except Exception:
+                    # 欄位缺漏時前置處理會失敗，問題已由 check_excel_row 列出
+                    pass
+    else:
+        issues.extend(check_record(record))
+
+    if os.path.isdir(case_folder):
+        issues.extend(check_folders(case_folder))
+    else:
+        issues.append(_issue(ERROR, "folder", f"找不到案件資料夾：{case_folder}"))
+    issues.extend(check_signatures(record, supervisor_image, district_image, interactive))
+    return {
+        "case_folder": case_folder,
+        "ok": not any(issue["level"] == ERROR for issue in issues),
+        "issues": issues,
+    }
+
+
+def preflight_cases(cases: list, workers: int = None) -> list:
+    """以行程池平行檢查多個案件（batch 的案件字典），回傳與 cases 相同順序的結果。"""
+    from scheduler import run_parallel
+
+    tasks = [(case["case_folder"], case.get("record"), case.get("supervisor_image"), case.get("district_image"))
+             for case in cases]
+    return run_parallel(preflight_case, tasks, workers)
+
+
+def print_report(result: dict) -> None:
+    errors = sum(1 for issue in result["issues"] if issue["level"] == ERROR)
+    warnings = len(result["issues"]) - errors
+    print(f"[{'通過' if result['ok'] else '未通過'}] {result['case_folder']}（錯誤 {errors}、警告 {warnings}）")
+    for issue in result["issues"]:
+        print(f"  {'錯誤' if issue['level'] == ERROR else '警告'} [{issue['check']}] {issue['message']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="產生報告前檢查案件資料夾（Excel 欄位、資料夾、檔名、圖片檔頭與簽名）")
+    parser.add_argument("case_folders", nargs="*", help="案件資料夾")
+    parser.add_argument("--root", help="案件根目錄，檢查每個含 Excel 的子資料夾")
+    parser.add_argument("--supervisor-image", help="監工簽名圖片（未指定時檢查依監工名稱登錄的簽名）")
+    parser.add_argument("--district-image", help="營業處簽名圖片（未指定時檢查依區處登錄的簽名）")
+    parser.add_argument("--workers", type=int, default=None, help="同時檢查的案件數（0 表示使用全部 CPU 核心）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    cases = [{"case_folder": folder, "supervisor_image": args.supervisor_image,
+              "district_image": args.district_image} for folder in args.case_folders]
+    if args.root:
+        from batch import discover_cases
+        cases.extend(discover_cases(args.root, args.supervisor_image, args.district_image))
+    results = preflight_cases(cases, args.workers)
+    for result in results:
+        print_report(result)
+    failed = sum(1 for r in results if not r["ok"])
+    print(f"共檢查 {len(results)} 個案件，{failed} 個未通過。")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,41 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from config import MAX_WORKERS
+
+# 在工作行程內為 True，避免巢狀建立行程池
+_IN_WORKER = False
+
+
+def _mark_worker() -> None:
+    global _IN_WORKER
+    _IN_WORKER = True
+
+
+def _call(packed: tuple):
+    func, args = packed
+    return func(*args)
+
+
+def resolve_workers(workers: int = None) -> int:
+    """將 None／0 轉換為實際的工作行程數。"""
+    if workers is None:
+        workers = MAX_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def run_parallel(func, tasks: list, workers: int = None) -> list:
+    """
+    以行程池平行執行 func(*args)，tasks 為參數 tuple 的列表。
+    回傳結果的順序與 tasks 相同，與各工作完成的先後無關。
+
+    工作數只有 1 個、workers 為 1，或目前已在工作行程內時，改為依序執行，
+    因此案件層級平行時，內層的平面圖組與照片頁不會再各自開行程池。
+    func 必須是可被 pickle 的模組層級函式。
+    """
+    workers = resolve_workers(workers)
+    if _IN_WORKER or workers <= 1 or len(tasks) <= 1:
+        return [func(*args) for args in tasks]
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_mark_worker) as executor:
+        return list(executor.map(_call, [(func, args) for args in tasks]))
@@ -0,0 +1,67 @@
+import os
+import time
+import shutil
+import tempfile
+from config import SCRATCH_DIR, SCRATCH_STALE_HOURS
+
+_PREFIX = "report_scratch_"
+_RAM_DIR = "/dev/shm"
+
+
+def resolve_scratch_root(root: str = None) -> str:
+    """
+    決定暫存工作區的上層資料夾：指定 root（或 config.SCRATCH_DIR）時使用該路徑，
+    否則優先使用可寫入的 /dev/shm（tmpfs），最後使用系統暫存資料夾。
+    """
+    root = root or SCRATCH_DIR
+    if root:
+        os.makedirs(root, exist_ok=True)
+        return root
+    if os.path.isdir(_RAM_DIR) and os.access(_RAM_DIR, os.W_OK):
+        return _RAM_DIR
+    return tempfile.gettempdir()
+
+
+def sweep_stale_workspaces(root: str, max_age_hours: float = SCRATCH_STALE_HOURS) -> int:
+    """刪除 root 下超過 max_age_hours 未更動的工作區（前次執行中斷時留下），回傳刪除數量。"""
+    cutoff = time.time() - max_age_hours * 3600
+    removed = 0
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.name.startswith(_PREFIX) and entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+class ScratchWorkspace:
+    """
+    單次執行專用的暫存資料夾，中間檔案一律寫在這裡，不寫入 output/ 或目前工作目錄。
+    平行執行的案件各自使用不同的資料夾，不會互相覆寫；離開 with 區塊時（含發生例外）整個刪除。
+
+        with ScratchWorkspace() as scratch:
+            word_path = os.path.join(scratch.path, "temp_group_1.docx")
+    """
+
+    def __init__(self, root: str = None):
+        self.root = resolve_scratch_root(root)
+        self.path = None
+
+    def __enter__(self) -> "ScratchWorkspace":
+        sweep_stale_workspaces(self.root)
+        self.path = tempfile.mkdtemp(prefix=f"{_PREFIX}{os.getpid()}_", dir=self.root)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+    def cleanup(self) -> None:
+        if self.path:
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path = None
@@ -0,0 +1,151 @@
+import os
+import io
+import copy
+import random
+import shutil
+from PyPDF2 import PdfReader, Transformation
+from reportlab.pdfgen import canvas
+
+from image_cache import file_digest
+from pdf_assembler import open_pdf
+from config import SIGNATURE_DIR, VALID_EXTENSIONS
+
+SUPERVISOR = "監工"
+DISTRICT = "營業處"
+
+# 各簽名章在首頁上的尺寸（pt）與中心位置，旋轉角度與位移在範圍內隨機
+STAMP_LAYOUT = {
+    SUPERVISOR: {"size": (177 * 0.6, 52 * 0.6), "center": (200, 60)},
+    DISTRICT: {"size": (277 * 0.55, 181 * 0.55), "center": (457, 80)},
+}
+MAX_ANGLE = 3
+MAX_OFFSET = 5
+
+# (圖片內容雜湊, 寬, 高) -> 只含該圖片的單頁 PDF 頁面，同一行程內重複使用
+_stamp_pages = {}
+
+
+def find_signature(kind: str, name, signature_dir: str = SIGNATURE_DIR) -> str:
+    """回傳已登錄的簽名圖片路徑（kind 為 SUPERVISOR 或 DISTRICT），沒有時回傳 None。"""
+    if not name:
+        return None
+    folder = os.path.join(signature_dir, kind)
+    for ext in VALID_EXTENSIONS:
+        path = os.path.join(folder, f"{name}{ext}")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def register_signature(kind: str, name, image_path: str, signature_dir: str = SIGNATURE_DIR) -> str:
+    """將簽名圖片複製到登錄資料夾，之後同名的監工或區處不必再選取，回傳登錄後的路徑。"""
+    folder = os.path.join(signature_dir, kind)
+    os.makedirs(folder, exist_ok=True)
+    ext = os.path.splitext(image_path)[1].lower()
+    for old_ext in VALID_EXTENSIONS:
+        old_path = os.path.join(folder, f"{name}{old_ext}")
+        if old_ext != ext and os.path.isfile(old_path):
+            os.remove(old_path)
+    path = os.path.join(folder, f"{name}{ext}")
+    shutil.copyfile(image_path, path)
+    print(f"已登錄{kind}簽名：{name} -> {path}")
+    return path
+
+
+def resolve_signatures(record: dict, supervisor_image: str = None, district_image: str = None,
+                       interactive: bool = True) -> tuple:
+    """
+    決定案件使用的簽名圖片：優先使用傳入的路徑，其次依 record 的 supervisor_name、district 查詢登錄資料夾；
+    仍缺少時，interactive 為 True 則以 GUI 選取並登錄，否則拋出 ValueError。
+    """
+    supervisor_name = signature_name(record.get("supervisor_name"))
+    district = signature_name(record.get("district"))
+    supervisor_image = supervisor_image or find_signature(SUPERVISOR, supervisor_name)
+    district_image = district_image or find_signature(DISTRICT, district)
+    if supervisor_image and district_image:
+        return supervisor_image, district_image
+    if not interactive:
+        raise ValueError(f"找不到已登錄的簽名圖片（監工：{supervisor_name}，區處：{district}）")
+
+    from utils import select_signature_images
+    selected_supervisor, selected_district = select_signature_images()
+    if not selected_supervisor:
+        raise ValueError("未選取簽名圖片")
+    if not supervisor_image:
+        supervisor_image = selected_supervisor
+        if supervisor_name:
+            register_signature(SUPERVISOR, supervisor_name, selected_supervisor)
+    if not district_image:
+        district_image = selected_district
+        if district:
+            register_signature(DISTRICT, district, selected_district)
+    return supervisor_image, district_image
+
+
+def signature_name(value) -> str:
+    """將 Excel 的監工名稱或區處轉成登錄用的檔名；空值回傳 None。"""
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    name = str(value).strip()
+    # prepare_case_frame 以 "empty" 填補空白欄位
+    if name == "empty":
+        return None
+    for char in '\\/:*?"<>|':
+        name = name.replace(char, "_")
+    return name or None
+
+
+def stamp_page(image_path: str, width: float, height: float):
+    """
+    回傳只含一張簽名圖片、大小為 width×height 的 PDF 頁面。
+    圖片只解碼與壓縮一次，之後依內容雜湊重複使用同一個 XObject。
+    """
+    key = (file_digest(image_path), width, height)
+    page = _stamp_pages.get(key)
+    if page is None:
+        buffer = io.BytesIO()
+        c = canvas.Canvas(buffer, pagesize=(width, height))
+        c.drawImage(image_path, 0, 0, width=width, height=height, mask="auto")
+        c.save()
+        page = PdfReader(buffer).pages[0]
+        _stamp_pages[key] = page
+    return page
+
+
+def stamp_cover(source, supervisor_image: str, district_image: str, seed=None) -> PdfReader:
+    """
+    將監工與營業處簽名章疊加到 PDF 第一頁，於記憶體中完成並回傳 PdfReader（可直接加入 PdfAssembler）。
+    旋轉角度與位移由 seed 決定，同一案件每次產生的結果相同；seed 為 None 時每次不同。
+
+    :param source: 首頁 PDF 路徑、bytes、檔案物件或 PdfReader
+    """
+    reader = open_pdf(source)
+    page = reader.pages[0]
+    rng = random.Random(seed)
+    for kind, image_path in ((SUPERVISOR, supervisor_image), (DISTRICT, district_image)):
+        width, height = STAMP_LAYOUT[kind]["size"]
+        center_x, center_y = STAMP_LAYOUT[kind]["center"]
+        angle = rng.uniform(-MAX_ANGLE, MAX_ANGLE)
+        center_x += rng.uniform(-MAX_OFFSET, MAX_OFFSET)
+        center_y += rng.uniform(-MAX_OFFSET, MAX_OFFSET)
+        ctm = Transformation().translate(-width / 2, -height / 2).rotate(angle).translate(center_x, center_y)
+        # add_transformation 會改寫頁面的內容串流，因此套用在淺層複本上，快取的簽名章頁面維持原狀
+        stamp = copy.copy(stamp_page(image_path, width, height))
+        stamp.add_transformation(ctm)
+        page.merge_page(stamp)
+    return reader
+
+
+def main(argv=None) -> int:
+    import argparse
+    parser = argparse.ArgumentParser(description="登錄監工或營業處簽名圖片，供批次模式依名稱取用")
+    parser.add_argument("kind", choices=[SUPERVISOR, DISTRICT], help="簽名類別")
+    parser.add_argument("name", help="監工名稱或區處（與 Excel 欄位內容相同）")
+    parser.add_argument("image", help="簽名圖片路徑")
+    args = parser.parse_args(argv)
+    register_signature(args.kind, signature_name(args.name), args.image)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
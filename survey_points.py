@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+# A~G 欄依序對應的欄位名稱
+COLUMNS = [
+    "Number",
+    "Type",
+    "Coordinate_X",
+    "Coordinate_Y",
+    "Ground_Elevation",
+    "Pipe_Burial_Depth",
+    "Pipe_Top_Coordinate_Z",
+]
+# 管道點-實測資料各數值欄位的小數位數
+ROUNDING = {
+    "Coordinate_X": 4,
+    "Coordinate_Y": 4,
+    "Ground_Elevation": 3,
+    "Pipe_Burial_Depth": 2,
+    "Pipe_Top_Coordinate_Z": 4,
+}
+SIMULATED_PATTERN = r"^\s*\d+管道點\d+-實測\s*$"
+
+
+class SurveyPoints:
+    """
+    以欄為單位保存的測量點資料。
+
+    raw[欄位] 為原始儲存格值（object 陣列），values[欄位] 為數值欄位的 float64 陣列
+    （非數值為 NaN），is_number[欄位] 標示原始值是否為數字，simulated 為符合
+    「管道點-實測」格式的列。
+    """
+
+    def __init__(self, raw: dict, simulated: np.ndarray):
+        self.raw = raw
+        self.simulated = simulated
+        self.is_number = {}
+        self.values = {}
+        for name in ROUNDING:
+            column = raw[name]
+            is_number = np.fromiter(
+                (isinstance(v, (int, float)) and not isinstance(v, bool) for v in column),
+                dtype=bool, count=len(column),
+            )
+            values = np.full(len(column), np.nan)
+            values[is_number] = column[is_number].astype(np.float64)
+            self.is_number[name] = is_number
+            self.values[name] = values
+
+    def __len__(self) -> int:
+        return len(self.simulated)
+
+    def subset(self, mask: np.ndarray) -> "SurveyPoints":
+        return SurveyPoints({name: col[mask] for name, col in self.raw.items()}, self.simulated[mask])
+
+    @property
+    def simulated_points(self) -> "SurveyPoints":
+        return self.subset(self.simulated)
+
+    @property
+    def reserved_points(self) -> "SurveyPoints":
+        return self.subset(~self.simulated)
+
+    def rounded(self, name: str) -> np.ndarray:
+        """回傳依 ROUNDING 四捨五入後的數值欄位（非數值為 NaN），結果與逐值呼叫內建 round() 相同。"""
+        return round_like_builtin(self.values[name], ROUNDING[name])
+
+    def to_records(self, rounded: bool = True) -> list:
+        """
+        轉回模板使用的 list-of-dicts。rounded 為 True 時數值儲存格與內建 round() 相同地四捨五入
+        （整數維持 int），非數值儲存格維持原值，與逐格讀取時的結果相同。
+        """
+        columns = {}
+        for name in COLUMNS:
+            raw = self.raw[name].tolist()
+            if rounded and name in ROUNDING:
+                digits = ROUNDING[name]
+                values = self.rounded(name).tolist()
+                raw = [r if isinstance(v, float) else round(v, digits) if isinstance(v, int) else v
+                       for v, r in zip(raw, values)]
+            columns[name] = raw
+        return [dict(zip(COLUMNS, row)) for row in zip(*(columns[name] for name in COLUMNS))]
+
+
+def round_like_builtin(values: np.ndarray, digits: int) -> np.ndarray:
+    """
+    整欄四捨五入到 digits 位小數，結果與逐值 round(v, digits) 相同。
+
+    np.round 先乘以 10 的次方再取整，乘積的誤差會讓接近 .5 的值進位方向與 round() 不同
+    （例如 round(2.675, 2) 為 2.67，np.round 為 2.68）。乘積離 .5 夠遠時整欄以 np.rint 計算，
+    其結果 k / 10**digits 即為 round() 的結果；接近 .5 或數值過大的少數項目才逐值呼叫 round()。
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** digits
+    scaled = values * scale
+    result = np.rint(scaled) / scale
+    with np.errstate(invalid="ignore"):
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= np.abs(scaled) * 2.0 ** -50 + 1e-9
+        fallback = near_half | (np.abs(scaled) >= 2.0 ** 52)
+    if fallback.any():
+        result[fallback] = [round(v, digits) for v in values[fallback].tolist()]
+    return result
+
+
+def read_survey_points(excel_file_path: str, survey_point_count: int, start_row: int = 5) -> SurveyPoints:
+    """
+    以 openpyxl 唯讀模式逐列串流讀取 A~G 欄的測量點，不載入整個工作表，
+    並以整欄運算判斷「管道點-實測」格式。
+    """
+    import openpyxl
+    wb = openpyxl.load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.active
+        end_row = start_row + int(survey_point_count) - 1
+        columns = [[] for _ in COLUMNS]
+        for row in ws.iter_rows(min_row=start_row, max_row=end_row, max_col=len(COLUMNS), values_only=True):
+            for i, column in enumerate(columns):
+                column.append(row[i] if i < len(row) else None)
+    finally:
+        wb.close()
+
+    raw = {}
+    for name, column in zip(COLUMNS, columns):
+        array = np.empty(len(column), dtype=object)
+        array[:] = column
+        raw[name] = array
+    types = pd.Series(raw["Type"]).fillna("").astype(str)
+    simulated = types.str.match(SIMULATED_PATTERN).to_numpy(dtype=bool)
+    return SurveyPoints(raw, simulated)
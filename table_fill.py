@@ -0,0 +1,117 @@
+import copy
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml.simpletypes import ST_Merge
+from docx.table import _Cell
+from docx.text.paragraph import Paragraph
+
+from template_cache import derived, load_document, load_prepared_document
+
+FONT_NAME = "標楷體"
+
+# 置中、標楷體的段落；填寫文字或圖片時複製一份，不再逐一設定對齊與字型
+_CENTER_PARAGRAPH = parse_xml(
+    f'<w:p {nsdecls("w")}><w:pPr><w:jc w:val="center"/></w:pPr>'
+    f'<w:r><w:rPr><w:rFonts w:ascii="{FONT_NAME}" w:hAnsi="{FONT_NAME}" w:eastAsia="{FONT_NAME}"/></w:rPr></w:r>'
+    f'</w:p>'
+)
+# 3/4pt 的單線上邊框
+_TOP_BORDER = parse_xml(f'<w:top {nsdecls("w")} w:val="single" w:sz="6" w:space="0" w:color="000000"/>')
+
+
+def grid_layout(table) -> tuple:
+    """
+    計算表格的格線配置 (欄數, 各格對應的 w:tc 序號)，規則與 python-docx 的 table.cell 相同：
+    水平合併（gridSpan）的格重複同一個序號，垂直合併的延續格沿用上方的序號。
+    """
+    col_count = table._tbl.col_count
+    index = []
+    for i, tc in enumerate(table._tbl.iter_tcs()):
+        for span_idx in range(tc.grid_span):
+            if tc.vMerge == ST_Merge.CONTINUE:
+                index.append(index[-col_count])
+            elif span_idx > 0:
+                index.append(index[-1])
+            else:
+                index.append(i)
+    return col_count, index
+
+
+class TableGrid:
+    """
+    以預先算好的格線配置存取表格：每份文件只列出一次 w:tc，
+    之後以 (列, 欄) 直接取得元素，不像 table.cell 每次呼叫都重建整張格線。
+    """
+
+    def __init__(self, table, layout: tuple = None):
+        self.table = table
+        self.col_count, self.index = layout or grid_layout(table)
+        self.tcs = list(table._tbl.iter_tcs())
+
+    def tc(self, row: int, col: int):
+        return self.tcs[self.index[row * self.col_count + col]]
+
+    def cell(self, row: int, col: int) -> _Cell:
+        return _Cell(self.tc(row, col), self.table)
+
+    def merge(self, top_left: tuple, bottom_right: tuple):
+        """
+        合併兩格之間的範圍並回傳左上角的 w:tc。模板中已合併好的範圍不再重新合併；
+        確實改變了表格結構時重新計算格線。
+        """
+        tc = self.tc(*top_left)
+        if tc is self.tc(*bottom_right):
+            return tc
+        merged = self.cell(*top_left).merge(self.cell(*bottom_right))
+        self.col_count, self.index = grid_layout(self.table)
+        self.tcs = list(self.table._tbl.iter_tcs())
+        return merged._tc
+
+
+def load_table_document(template_path: str, name: str = None, prepare=None) -> tuple:
+    """
+    回傳模板副本與其第一個表格的 TableGrid。有傳入 prepare 時使用以 name 區分、
+    預先處理過的模板（例如先合併好儲存格）；預先處理與格線計算每個行程只做一次。
+    """
+    if prepare is None:
+        doc = load_document(template_path)
+    else:
+        doc = load_prepared_document(template_path, name, prepare)
+
+    def build(template):
+        if prepare is not None:
+            prepare(template)
+        return grid_layout(template.tables[0])
+
+    table = doc.tables[0]
+    return doc, TableGrid(table, derived(template_path, ("grid", name), build))
+
+
+def fill_text(tc, text: str) -> None:
+    """將儲存格內容換成一個置中、標楷體的段落；文字中的換行轉為 w:br。"""
+    tc.clear_content()
+    paragraph = copy.deepcopy(_CENTER_PARAGRAPH)
+    paragraph[-1].text = text
+    tc.append(paragraph)
+
+
+def fill_picture(grid: TableGrid, row: int, col: int, image, **size) -> None:
+    """將儲存格內容換成置中的圖片；image 為路徑或檔案物件，size 為 width 或 height（docx 長度）。"""
+    tc = grid.tc(row, col)
+    tc.clear_content()
+    paragraph = copy.deepcopy(_CENTER_PARAGRAPH)
+    tc.append(paragraph)
+    Paragraph(paragraph, _Cell(tc, grid.table)).add_run().add_picture(image, **size)
+
+
+def set_top_border(tc) -> None:
+    """將儲存格的上邊框設為 3/4pt 單線，取代原有的上邊框設定。"""
+    tcPr = tc.get_or_add_tcPr()
+    borders = tcPr.find(qn("w:tcBorders"))
+    if borders is None:
+        borders = OxmlElement("w:tcBorders")
+        tcPr.append(borders)
+    else:
+        for top in borders.findall(qn("w:top")):
+            borders.remove(top)
+    borders.append(copy.deepcopy(_TOP_BORDER))
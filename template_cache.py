@@ -0,0 +1,80 @@
+import io
+import os
+import copy
+import docx
+from docxtpl import DocxTemplate
+
+# 絕對路徑 -> (修改時間, 檔案大小, 原始位元組, 已解析的 Document)
+_cache = {}
+# (絕對路徑, 名稱) -> (修改時間, 檔案大小, 由模板衍生的結果)
+_derived = {}
+
+
+def _load_entry(template_path: str) -> tuple:
+    """取得模板的快取；檔案修改時間或大小改變時重新解析。"""
+    key = os.path.abspath(template_path)
+    st = os.stat(key)
+    entry = _cache.get(key)
+    if entry is None or entry[0] != st.st_mtime_ns or entry[1] != st.st_size:
+        with open(key, "rb") as f:
+            data = f.read()
+        entry = (st.st_mtime_ns, st.st_size, data, docx.Document(io.BytesIO(data)))
+        _cache[key] = entry
+    return entry
+
+
+def load_document(template_path: str) -> "docx.document.Document":
+    """
+    回傳模板的獨立副本。每個行程只解壓與解析一次模板，
+    之後以深層複製已解析的文件樹取代重新解析；複製失敗時改由記憶體中的位元組重新解析。
+    """
+    _, _, data, document = _load_entry(template_path)
+    try:
+        return copy.deepcopy(document)
+    except Exception:
+        return docx.Document(io.BytesIO(data))
+
+
+def derived(template_path: str, name, build):
+    """
+    回傳由模板衍生、每個行程只需計算一次的結果（例如表格格線、預先合併好儲存格的文件）。
+    build 接收模板的獨立副本；模板修改時間或大小改變時重新計算。
+    """
+    mtime, size, _, _ = _load_entry(template_path)
+    key = (os.path.abspath(template_path), name)
+    entry = _derived.get(key)
+    if entry is None or entry[0] != mtime or entry[1] != size:
+        entry = (mtime, size, build(load_document(template_path)))
+        _derived[key] = entry
+    return entry[2]
+
+
+def load_prepared_document(template_path: str, name: str, prepare) -> "docx.document.Document":
+    """
+    回傳經 prepare(doc) 預先處理過的模板副本。prepare 每個行程、每個名稱只執行一次，
+    之後深層複製處理後的文件樹；複製失敗時改為重新載入模板並再執行一次 prepare。
+    """
+    def build(doc):
+        prepare(doc)
+        # 處理時快取的 body 等物件會被各自深層複製成脫離文件樹的副本，因此改以新的 Document 包裝
+        return docx.document.Document(doc.element, doc.part)
+
+    document = derived(template_path, ("prepared", name), build)
+    try:
+        return copy.deepcopy(document)
+    except Exception:
+        doc = load_document(template_path)
+        prepare(doc)
+        return doc
+
+
+def load_docx_template(template_path: str) -> DocxTemplate:
+    """回傳以快取副本初始化、可直接 render 的 DocxTemplate。"""
+    tpl = DocxTemplate(template_path)
+    tpl.docx = load_document(template_path)
+    return tpl
+
+
+def clear_cache() -> None:
+    _cache.clear()
+    _derived.clear()
@@ -0,0 +1,62 @@
+import os
+
+from build_manifest import BuildManifest
+
+
+def _photo(tmp_path, name, data):
+    path = os.path.join(tmp_path, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_incremental_rebuild(tmp_path):
+    cache_dir = str(tmp_path / "builds")
+    photo = _photo(str(tmp_path), "1.jpg", b"first")
+    stored = []
+
+    manifest = BuildManifest("C001", cache_dir, on_store=stored.append)
+    keys = {"cover": BuildManifest.input_key({"unit": "cover"}, [])}
+    keys.update({unit: BuildManifest.input_key({"unit": unit}, [photo]) for unit in ("photo_1", "photo_2")})
+    for unit, key in keys.items():
+        assert manifest.lookup(unit, key) is None
+        manifest.store(unit, key, f"%PDF {unit}".encode())
+    manifest.save()
+    assert stored == ["cover", "photo_1", "photo_2"]
+
+    # 第二次執行：輸入未變動的單元沿用 PDF，照片內容變動的單元需重建，少掉的頁被移除
+    _photo(str(tmp_path), "1.jpg", b"second")
+    manifest = BuildManifest("C001", cache_dir)
+    assert manifest.lookup("cover", BuildManifest.input_key({"unit": "cover"}, [])) == manifest.artifact_path("cover")
+    changed = BuildManifest.input_key({"unit": "photo_1"}, [photo])
+    assert changed != keys["photo_1"]
+    assert manifest.lookup("photo_1", changed) is None
+    manifest.store("photo_1", changed, b"%PDF photo_1 v2")
+    manifest.save()
+
+    assert not os.path.exists(manifest.artifact_path("photo_2"))
+    manifest = BuildManifest("C001", cache_dir)
+    assert set(manifest.units) == {"cover", "photo_1"}
+    with open(manifest.lookup("photo_1", changed), "rb") as f:
+        assert f.read() == b"%PDF photo_1 v2"
+
+
+def test_unchanged_inputs_are_reused(tmp_path):
+    cache_dir = str(tmp_path / "builds")
+    photo = _photo(str(tmp_path), "1.jpg", b"same")
+    key = BuildManifest.input_key({"row": 1}, [photo])
+    BuildManifest("C002", cache_dir).store("photo_1", key, b"%PDF")
+
+    manifest = BuildManifest("C002", cache_dir)
+    assert manifest.lookup("photo_1", BuildManifest.input_key({"row": 1}, [photo])) == manifest.artifact_path("photo_1")
+    os.remove(manifest.artifact_path("photo_1"))
+    assert manifest.lookup("photo_1", key) is None
+
+
+def test_corrupt_manifest_rebuilds_everything(tmp_path):
+    cache_dir = str(tmp_path / "builds")
+    manifest = BuildManifest("C003", cache_dir)
+    manifest.store("cover", "k", b"%PDF")
+    with open(manifest.path, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    assert BuildManifest("C003", cache_dir).lookup("cover", "k") is None
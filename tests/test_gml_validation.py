@@ -0,0 +1,50 @@
+import math
+import time
+
+import numpy as np
+import pytest
+
+from gml_validation import MIN_CELL_SIZE, FeatureGridIndex
+
+
+def _index(starts, ends):
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    n = len(starts)
+    return FeatureGridIndex(starts, ends, np.zeros(n), np.ones(n), list(range(n)), ["pipe"] * n)
+
+
+def test_straight_pipe_keeps_grid_small():
+    # 一條 2 公里、沿 x 軸的直管：面積為 0，網格不可縮到毫米
+    started = time.perf_counter()
+    index = _index([[300000.0, 2770000.0]], [[302000.0, 2770000.0]])
+    assert len(index.cells) <= 4
+    idx, dist, z = index.nearest(301000.0, 2770003.0)
+    assert idx == 0 and dist == pytest.approx(3.0) and z == pytest.approx(0.5)
+    idx, dist, _ = index.nearest(250000.0, 2700000.0)
+    assert idx == 0 and dist == pytest.approx(math.hypot(50000.0, 70000.0))
+    assert time.perf_counter() - started < 0.5
+
+
+def test_collinear_points():
+    xs = np.linspace(300000.0, 302000.0, 501)
+    points = np.column_stack([xs, np.full(len(xs), 2770000.0)])
+    index = _index(points, points)
+    assert index.cell_size >= MIN_CELL_SIZE
+    assert len(index.cells) <= len(points)
+    idx, dist, _ = index.nearest(301001.0, 2770000.5)
+    assert idx == 250 and dist == pytest.approx(math.hypot(1.0, 0.5))
+    idx, _, _ = index.nearest(299000.0, 2769000.0)
+    assert idx == 0
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    starts = rng.uniform(0, 500, size=(200, 2))
+    ends = starts + rng.uniform(-20, 20, size=(200, 2))
+    index = _index(starts, ends)
+    for x, y in rng.uniform(-100, 600, size=(50, 2)):
+        ab = ends - starts
+        t = np.clip(((np.array([x, y]) - starts) * ab).sum(axis=1) / (ab * ab).sum(axis=1), 0, 1)
+        expected = np.hypot(*(starts + ab * t[:, None] - [x, y]).T).min()
+        assert index.nearest(x, y)[1] == pytest.approx(expected)
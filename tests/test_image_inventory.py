@@ -0,0 +1,36 @@
+import os
+
+import image_inventory
+from image_inventory import cached_stat, get_inventory
+
+
+def _case(root, name, photos=("1.jpg", "2.jpg")):
+    folder = os.path.join(root, name, "照片")
+    os.makedirs(folder)
+    for photo in photos:
+        with open(os.path.join(folder, photo), "wb") as f:
+            f.write(b"x" * 10)
+    return os.path.join(root, name)
+
+
+def test_cached_stat_follows_rescan(tmp_path):
+    case = _case(str(tmp_path), "A")
+    photo = os.path.join(case, "照片", "1.jpg")
+    assert get_inventory(case).images("照片") == [os.path.join(case, "照片", n) for n in ("1.jpg", "2.jpg")]
+    assert cached_stat(photo)[0] == 10
+    os.remove(photo)
+    get_inventory(case, refresh=True)
+    assert cached_stat(photo) is None
+
+
+def test_inventories_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_inventory, "IMAGE_INVENTORY_MAX_CASES", 2)
+    monkeypatch.setattr(image_inventory, "_inventories", image_inventory.OrderedDict())
+    a, b, c = (_case(str(tmp_path), name) for name in "ABC")
+    get_inventory(a)
+    get_inventory(b)
+    get_inventory(a)  # A 最近使用過，加入 C 時淘汰 B
+    get_inventory(c)
+    assert list(image_inventory._inventories) == [a, c]
+    assert cached_stat(os.path.join(b, "照片", "1.jpg")) is None
+    assert cached_stat(os.path.join(a, "照片", "1.jpg")) is not None
@@ -0,0 +1,17 @@
+from instrumentation import RunRecorder, aggregate_reports
+
+
+def test_substages_are_reported_but_not_double_counted(tmp_path):
+    recorder = RunRecorder("case", report_dir=str(tmp_path))
+    with recorder.stage("pipeline") as info:
+        info["pages"] = 4
+    pipeline_wall = recorder.stages[-1]["wall_seconds"]
+    recorder.record_substage("pipeline", "build", 1.5, 1.2, units=3)
+    recorder.record_substage("pipeline", "convert", 2.0, 0.1, units=2)
+
+    report = recorder.to_dict()
+    assert [s["stage"] for s in report["stages"]] == ["pipeline", "pipeline.build", "pipeline.convert"]
+    assert report["total_wall_seconds"] == pipeline_wall
+    assert report["pages"] == 4
+    aggregate = aggregate_reports([report])
+    assert aggregate["stages"]["pipeline.convert"]["wall_seconds"] == 2.0
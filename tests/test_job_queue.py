@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from job_queue import JobQueue
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+def _queue(db_path, worker, **kwargs):
+    queue = JobQueue(db_path, **kwargs)
+    queue.worker_id = worker
+    return queue
+
+
+def test_claim_marks_job_running_and_counts_attempts(db_path, tmp_path):
+    queue = _queue(db_path, "a")
+    job_id = queue.add(str(tmp_path / "case"))
+    job = queue.claim()
+    assert (job["id"], job["status"], job["attempts"], job["worker"]) == (job_id, "running", 1, "a")
+    assert queue.claim() is None
+
+
+def test_transient_failure_is_retried_with_backoff(db_path, tmp_path):
+    queue = _queue(db_path, "a", retry_base_seconds=60)
+    queue.add(str(tmp_path / "case"))
+    job = queue.claim()
+    assert queue.fail(job, "OSError: busy") == "queued"
+    row = queue.jobs()[0]
+    assert row["status"] == "queued" and row["next_run_at"] > time.time() + 50
+    assert queue.claim() is None
+
+
+def test_permanent_failure_is_not_retried(db_path, tmp_path):
+    queue = _queue(db_path, "a")
+    queue.add(str(tmp_path / "case"))
+    job = queue.claim()
+    assert queue.fail(job, "PreflightError: bad excel", permanent=True) == "failed"
+    assert queue.jobs()[0]["status"] == "failed"
+
+
+def test_expired_lease_is_taken_over_until_max_attempts(db_path, tmp_path):
+    queue = _queue(db_path, "a", max_attempts=2, lease_seconds=-1)
+    queue.add(str(tmp_path / "case"))
+    assert queue.claim()["attempts"] == 1
+    assert queue.claim()["attempts"] == 2
+    assert queue.claim() is None
+    row = queue.jobs()[0]
+    assert row["status"] == "failed" and "無回應" in row["error"]
+
+
+def test_stale_worker_cannot_overwrite_new_owner(db_path, tmp_path):
+    stale = _queue(db_path, "stale", lease_seconds=-1)
+    stale.add(str(tmp_path / "case"))
+    old_job = stale.claim()
+    owner = _queue(db_path, "owner")
+    new_job = owner.claim()
+    assert new_job["worker"] == "owner"
+
+    stale.record_stage(old_job, "page:photo_1", "done")
+    assert stale.complete(old_job, "stale.pdf") is False
+    assert stale.fail(old_job, "boom") is None
+    assert owner.stages(new_job["id"]) == []
+
+    owner.record_stage(new_job, "page:cover", "done")
+    assert owner.complete(new_job, "ok.pdf") is True
+    row = owner.jobs()[0]
+    assert (row["status"], row["output_pdf"]) == ("done", "ok.pdf")
+    assert [s["stage"] for s in owner.stages(new_job["id"])] == ["page:cover"]
@@ -0,0 +1,29 @@
+import pytest
+
+import plan_renderer
+from main import _survey_point_count
+
+
+@pytest.mark.parametrize("value, expected", [
+    (120, 120),
+    (120.0, 120),
+    ("45", 45),
+    ("empty", None),
+    (float("nan"), None),
+    (0, None),
+    (None, None),
+])
+def test_survey_point_count(value, expected):
+    assert _survey_point_count({"pipeline_point_count": value}) == expected
+
+
+def test_plan_font_path_is_none_without_cjk_font(monkeypatch, tmp_path):
+    monkeypatch.setattr(plan_renderer, "KAIU_FONT_PATH", str(tmp_path / "kaiu.ttf"))
+    monkeypatch.setattr(plan_renderer, "CJK_FALLBACK_FONT_PATHS", [str(tmp_path / "missing.ttc")])
+    plan_renderer.plan_font_path.cache_clear()
+    try:
+        assert plan_renderer.plan_font_path() is None
+        with pytest.raises(FileNotFoundError):
+            plan_renderer._load_font(12)
+    finally:
+        plan_renderer.plan_font_path.cache_clear()
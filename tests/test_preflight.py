@@ -0,0 +1,60 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from preflight import ERROR, _has_jpeg_end_marker, check_excel_row, check_image_header, check_record
+
+
+def _jpeg(size=(320, 240), **save_args) -> bytes:
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 60).convert("RGB").save(buffer, format="JPEG", **save_args)
+    return buffer.getvalue()
+
+
+def _with_thumbnail(data: bytes) -> bytes:
+    """在 SOI 之後插入含完整 JPEG 縮圖（有自己的 FFD9）的 APP1 區段，模擬相機的 EXIF。"""
+    payload = b"Exif\x00\x00" + _jpeg((160, 120))
+    segment = b"\xff\xe1" + (len(payload) + 2).to_bytes(2, "big") + payload
+    return data[:2] + segment + data[2:]
+
+
+def _write(tmp_path, name, data) -> str:
+    path = os.path.join(tmp_path, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+@pytest.mark.parametrize("save_args", [{}, {"progressive": True}])
+def test_complete_jpeg_has_end_marker(tmp_path, save_args):
+    assert _has_jpeg_end_marker(_write(tmp_path, "ok.jpg", _with_thumbnail(_jpeg(**save_args))))
+
+
+def test_truncated_jpeg_with_thumbnail_is_detected(tmp_path):
+    data = _with_thumbnail(_jpeg())
+    path = _write(tmp_path, "truncated.jpg", data[:len(data) * 2 // 3])
+    assert not _has_jpeg_end_marker(path)
+    assert check_image_header(path) is not None
+
+
+def test_appended_data_after_end_marker_is_accepted(tmp_path):
+    trailer = os.urandom(4096).replace(b"\xff", b"\x00")
+    path = _write(tmp_path, "motion.jpg", _with_thumbnail(_jpeg()) + trailer)
+    assert _has_jpeg_end_marker(path)
+    assert check_image_header(path) is None
+
+
+def test_blank_date_has_same_level_in_both_modes():
+    from excel_processor import COLUMN_MAPPING
+
+    row = {column: "x" for column in COLUMN_MAPPING}
+    row["施測日期"] = None
+    record = {key: "x" for key in COLUMN_MAPPING.values()}
+    record["measurement_date"] = "empty"
+
+    def date_levels(issues):
+        return [issue["level"] for issue in issues if "施測日期" in issue["message"]]
+
+    assert date_levels(check_excel_row(row)) == date_levels(check_record(record)) == [ERROR]
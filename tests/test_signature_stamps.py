@@ -0,0 +1,48 @@
+import io
+
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader
+from reportlab.pdfgen import canvas
+
+from signature_stamps import stamp_cover, stamp_page, STAMP_LAYOUT, SUPERVISOR
+from pdf_assembler import PdfAssembler
+
+
+@pytest.fixture
+def signatures(tmp_path):
+    supervisor = tmp_path / "監工.png"
+    district = tmp_path / "營業處.png"
+    Image.new("RGBA", (177, 52), (0, 0, 160, 255)).save(supervisor)
+    Image.new("RGBA", (277, 181), (200, 0, 0, 255)).save(district)
+    return str(supervisor), str(district)
+
+
+def _cover_pdf() -> bytes:
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer)
+    c.drawString(100, 700, "cover")
+    c.save()
+    return buffer.getvalue()
+
+
+def test_stamp_cover_draws_both_signatures(signatures, tmp_path):
+    reader = stamp_cover(_cover_pdf(), *signatures, seed="11301001")
+
+    content = reader.pages[0].get_contents().get_data()
+    assert content.count(b" Do") == 2
+    assembler = PdfAssembler(["cover"])
+    assembler.add(reader, "cover")
+    output = tmp_path / "out.pdf"
+    assert assembler.write(str(output)) == 1
+    assert len(PdfReader(str(output)).pages) == 1
+
+
+def test_stamp_cover_leaves_cached_stamp_untouched(signatures):
+    width, height = STAMP_LAYOUT[SUPERVISOR]["size"]
+    before = stamp_page(signatures[0], width, height).get_contents().get_data()
+
+    stamp_cover(_cover_pdf(), *signatures, seed=1)
+    stamp_cover(_cover_pdf(), *signatures, seed=2)
+
+    assert stamp_page(signatures[0], width, height).get_contents().get_data() == before
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from survey_points import COLUMNS, ROUNDING, SurveyPoints, round_like_builtin
+
+
+@pytest.mark.parametrize("digits", sorted(set(ROUNDING.values())))
+def test_round_like_builtin_matches_round(digits):
+    rng = np.random.default_rng(digits)
+    values = np.concatenate([
+        np.round(rng.uniform(-1e6, 1e6, 20000), digits + 1),  # 大量剛好落在 .5 的值
+        rng.uniform(-10, 10, 20000),
+        [2.675, -2.675, 0.125, -0.00001, 1e20, np.inf, np.nan],
+    ])
+    expected = np.array([round(v, digits) for v in values.tolist()])
+    result = round_like_builtin(values, digits)
+    np.testing.assert_array_equal(result, expected)
+    assert np.array_equal(np.signbit(result), np.signbit(expected))
+
+
+def test_to_records_rounds_like_per_cell_reader():
+    cells = [2.675, 7, "N/A", None]
+    raw = {}
+    for name in COLUMNS:
+        array = np.empty(len(cells), dtype=object)
+        array[:] = cells if name in ROUNDING else ["x"] * len(cells)
+        raw[name] = array
+    points = SurveyPoints(raw, np.zeros(len(cells), dtype=bool))
+    records = points.to_records(rounded=True)
+    depth = [record["Pipe_Burial_Depth"] for record in records]
+    assert depth == [2.67, 7, "N/A", None]
+    assert type(depth[1]) is int
+    assert points.to_records(rounded=False)[0]["Coordinate_X"] == 2.675
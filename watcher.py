@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import argparse
+import threading
+
+from batch import is_case_folder
+from config import WATCH_SETTLE_SECONDS, WATCH_POLL_SECONDS, WATCH_STATE_PATH
+
+# 上傳中的檔案：Office 開啟中的鎖定檔與常見的未完成下載／複製副檔名
+_PARTIAL_PREFIXES = ("~$",)
+_PARTIAL_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload", ".filepart")
+
+
+def folder_signature(folder: str) -> list:
+    """
+    以 [檔案數, 總大小, 最新修改時間] 代表案件資料夾（含子資料夾）目前的內容；
+    仍有上傳中的檔案時回傳 None。
+    """
+    count = total = latest = 0
+    stack = [folder]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                name = entry.name.lower()
+                if name.startswith(_PARTIAL_PREFIXES) or name.endswith(_PARTIAL_SUFFIXES):
+                    return None
+                st = entry.stat()
+                count += 1
+                total += st.st_size
+                latest = max(latest, st.st_mtime_ns)
+    return [count, total, latest]
+
+
+class FolderWatcher:
+    """
+    監看 root 下的案件資料夾，回傳新增或內容有變動、且已連續 settle_seconds 秒沒有變動的案件。
+
+    有安裝 watchdog 時以檔案系統事件（Linux 為 inotify）得知哪些資料夾有變動，
+    否則每次輪詢都掃描整個根目錄。已產生報告時的資料夾狀態記錄於 state_path。
+    """
+
+    def __init__(self, root: str, settle_seconds: float = WATCH_SETTLE_SECONDS,
+                 state_path: str = WATCH_STATE_PATH, use_events: bool = True):
+        self.root = os.path.abspath(root)
+        self.settle_seconds = settle_seconds
+        self.state_path = state_path
+        self.state = {}
+        if os.path.exists(state_path):
+            try:
+                with open(state_path, encoding="utf-8") as f:
+                    self.state = json.load(f)
+            except (OSError, ValueError):
+                print(f"監看狀態檔損毀，將重新產生所有案件：{state_path}")
+        # 資料夾 -> (最近一次看到的內容狀態, 開始維持此狀態的時間)
+        self._pending = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._full_scan_due = True
+        self._observer = self._start_observer() if use_events else None
+
+    def _start_observer(self):
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print("未安裝 watchdog，改為定期掃描。")
+            return None
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                for path in (event.src_path, getattr(event, "dest_path", None)):
+                    if path:
+                        watcher._mark_dirty(path)
+
+        observer = Observer()
+        observer.schedule(Handler(), self.root, recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def _mark_dirty(self, path: str) -> None:
+        """將事件路徑對應到 root 下第一層的案件資料夾。"""
+        top = os.path.relpath(path, self.root).split(os.sep)[0]
+        if top in ("", ".", ".."):
+            return
+        with self._lock:
+            self._dirty.add(os.path.join(self.root, top))
+
+    def _candidates(self) -> set:
+        if self._observer is None or self._full_scan_due:
+            self._full_scan_due = False
+            with self._lock:
+                self._dirty.clear()
+            folders = {entry.path for entry in os.scandir(self.root) if entry.is_dir()}
+        else:
+            with self._lock:
+                folders, self._dirty = self._dirty, set()
+        # 等待穩定中的資料夾即使沒有新事件也要再檢查一次
+        return folders | set(self._pending)
+
+    def poll(self) -> list:
+        """回傳已上傳完成、需要產生報告的 [(案件資料夾, 內容狀態)]。"""
+        now = time.monotonic()
+        ready = []
+        for folder in sorted(self._candidates()):
+            try:
+                if not os.path.isdir(folder) or not is_case_folder(folder):
+                    self._pending.pop(folder, None)
+                    continue
+                signature = folder_signature(folder)
+            except OSError:
+                # 上傳過程中檔案可能剛好被移動或刪除，下次再檢查
+                self._pending[folder] = (None, now)
+                continue
+            done = self.state.get(folder)
+            if signature is not None and done and done.get("signature") == signature:
+                self._pending.pop(folder, None)
+                continue
+            previous = self._pending.get(folder)
+            if signature is None or previous is None or previous[0] != signature:
+                self._pending[folder] = (signature, now)
+            elif now - previous[1] >= self.settle_seconds:
+                del self._pending[folder]
+                ready.append((folder, signature))
+        return ready
+
+    def mark_done(self, folder: str, signature: list, result: dict) -> None:
+        """記錄案件以哪個內容狀態產生過報告（失敗也記錄，內容再變動時才重試）。"""
+        self.state[folder] = {
+            "signature": signature,
+            "status": result["status"],
+            "output_pdf": result.get("output_pdf"),
+            "error": result.get("error"),
+        }
+        state_dir = os.path.dirname(self.state_path)
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def close(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+
+
+def watch(root: str, supervisor_image: str = None, district_image: str = None, workers: int = None,
+          settle_seconds: float = WATCH_SETTLE_SECONDS, poll_seconds: float = WATCH_POLL_SECONDS,
+          use_events: bool = True) -> None:
+    """持續監看 root，案件資料夾上傳完成後依序以批次模式產生報告，直到 Ctrl+C。"""
+    from batch import run_batch_case
+    from converter import get_converter
+
+    watcher = FolderWatcher(root, settle_seconds, use_events=use_events)
+    get_converter()
+    print(f"開始監看：{watcher.root}（內容 {settle_seconds:g} 秒未變動後產生報告）")
+    try:
+        while True:
+            for folder, signature in watcher.poll():
+                result = run_batch_case({
+                    "case_folder": folder,
+                    "supervisor_image": supervisor_image,
+                    "district_image": district_image,
+                }, workers)
+                watcher.mark_done(folder, signature, result)
+                detail = result["output_pdf"] if result["status"] == "success" else result["error"]
+                print(f"[{result['status']}] {folder}（{result['seconds']}s）{detail}")
+            time.sleep(poll_seconds)
+    except KeyboardInterrupt:
+        print("停止監看。")
+    finally:
+        watcher.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="監看案件根目錄，案件資料夾上傳完成後自動產生自主查核表")
+    parser.add_argument("root", help="案件根目錄，每個含 Excel 的子資料夾視為一個案件")
+    parser.add_argument("--supervisor-image", help="監工簽名圖片（未指定時依監工名稱取用已登錄的簽名）")
+    parser.add_argument("--district-image", help="營業處簽名圖片（未指定時依區處取用已登錄的簽名）")
+    parser.add_argument("--workers", type=int, default=None, help="案件內平面圖組與照片頁的工作行程數")
+    parser.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                        help=f"內容連續幾秒未變動才視為上傳完成（預設 {WATCH_SETTLE_SECONDS}）")
+    parser.add_argument("--interval", type=float, default=WATCH_POLL_SECONDS,
+                        help=f"檢查間隔秒數（預設 {WATCH_POLL_SECONDS}）")
+    parser.add_argument("--polling", action="store_true", help="不使用檔案系統事件，一律定期掃描（網路磁碟適用）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    watch(args.root, args.supervisor_image, args.district_image, args.workers,
+          args.settle, args.interval, not args.polling)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())